@@ -3,46 +3,499 @@ Assistente de IA para o Sistema de Motoboys
 Versão 2026 - Otimizada para Google GenAI SDK
 Correção: Ajuste de ID de modelo para evitar 404
 """
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
 import streamlit as st
 from google import genai
 
-def get_gemini_response(pergunta, kpis_hoje, relatorio_semanal, config_atual):
+import instrumentacao
+import utils
+
+# ALTERAÇÃO: Usando o ID padrão 'gemini-1.5-flash' que é o mais compatível
+# Se este falhar, você pode tentar 'gemini-2.0-flash'
+MODELO_GEMINI = 'gemini-1.5-flash'
+
+
+@st.cache_resource
+def get_gemini_client():
     """
-    Consulta o Gemini Flash para análise de dados logísticos.
+    Cria e retorna cliente Gemini (cached para reutilização)
+    Falhas não são cacheadas: a próxima pergunta tenta de novo
+    """
+    api_key = st.secrets["google"]["api_key"]
+    return genai.Client(api_key=api_key)
+
+
+class CacheRespostas:
+    """
+    Cache LRU de respostas chaveado por (pergunta, impressão digital dos dados)
+    Pergunta repetida sobre os mesmos dados não chama a API de novo
+    """
+
+    def __init__(self, max_entradas=128):
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._respostas = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            resposta = self._respostas.get(chave)
+            if resposta is None:
+                self.falhas += 1
+                return None
+            self._respostas.move_to_end(chave)
+            self.acertos += 1
+            return resposta
+
+    def guardar(self, chave, resposta):
+        with self._lock:
+            self._respostas[chave] = resposta
+            self._respostas.move_to_end(chave)
+            while len(self._respostas) > self.max_entradas:
+                self._respostas.popitem(last=False)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "entradas": len(self._respostas)
+            }
+
+
+@st.cache_resource
+def get_cache_respostas():
+    """
+    Cache de respostas compartilhado entre as sessões
+    """
+    return CacheRespostas()
+
+
+def impressao_dados(kpis_hoje, relatorio_semanal, config_atual):
+    """
+    Hash estável dos dados enviados à IA (muda sempre que algum valor muda)
+    """
+    dados = json.dumps(
+        [kpis_hoje, relatorio_semanal, config_atual],
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(dados.encode("utf-8")).hexdigest()
+
+
+# ==================== CONTEXTO ====================
+
+ORCAMENTO_TOKENS_PADRAO = 2000
+CARACTERES_POR_TOKEN = 4
+DESTAQUES = 3
+
+
+def get_orcamento_tokens():
+    """
+    Orçamento de tokens do contexto de dados
+
+    Configuração opcional em secrets.toml:
+        [google]
+        orcamento_tokens = 2000
     """
     try:
-        # 1. Configuração do Cliente
-        api_key = st.secrets["google"]["api_key"]
-        client = genai.Client(api_key=api_key)
-
-        # 2. Preparação do Contexto
-        contexto_dados = f"""
-        Você é o 'Assistente Motoboy AI'.
-        
-        DADOS ATUAIS:
-        - Diária: {config_atual.get('valor_diaria', 0)}
-        - Corrida: {config_atual.get('valor_corrida', 0)}
-        - Hoje: {kpis_hoje}
-        - Semana: {relatorio_semanal}
-
-        Responda de forma breve e profissional. 🏍️
-        """
-
-        # 3. Chamada da API
-        # ALTERAÇÃO: Usando o ID padrão 'gemini-1.5-flash' que é o mais compatível
-        # Se este falhar, você pode tentar 'gemini-2.0-flash'
-        response = client.models.generate_content(
-            model='gemini-1.5-flash',
-            contents=f"{contexto_dados}\n\nPergunta: {pergunta}"
+        return int(st.secrets["google"].get("orcamento_tokens", ORCAMENTO_TOKENS_PADRAO))
+    except Exception:
+        return ORCAMENTO_TOKENS_PADRAO
+
+
+def estimar_tokens(texto):
+    """
+    Estimativa de tokens (~4 caracteres por token), sem chamar a API
+    """
+    return -(-len(texto) // CARACTERES_POR_TOKEN)
+
+
+def _numero(valor):
+    return f"{float(valor or 0):.2f}".rstrip("0").rstrip(".")
+
+
+def _linha_tabela(linha):
+    return "|".join([
+        str(linha.get("nome", "")),
+        str(linha.get("tipo", "")),
+        str(linha.get("dias_trabalhados", 0)),
+        str(linha.get("total_entregas", 0)),
+        _numero(linha.get("valor_devido", 0))
+    ])
+
+
+def montar_contexto(kpis_hoje, relatorio_semanal, config_atual, orcamento_tokens=None):
+    """
+    Contexto compacto para o prompt: totais pré-calculados, destaques e uma
+    tabela (nome|tipo|dias|entregas|valor) ordenada por entregas. Linhas que
+    não cabem no orçamento são somadas em uma linha agregada.
+
+    Returns:
+        Tupla (texto, metadados) com tokens estimados e motoboys listados/total
+    """
+    orcamento = orcamento_tokens or get_orcamento_tokens()
+    kpis_hoje = kpis_hoje or {}
+    config_atual = config_atual or {}
+    linhas = sorted(
+        relatorio_semanal or [],
+        key=lambda r: (-int(r.get("total_entregas") or 0), str(r.get("nome", "")))
+    )
+
+    total_entregas = sum(int(r.get("total_entregas") or 0) for r in linhas)
+    total_devido = sum(float(r.get("valor_devido") or 0) for r in linhas)
+    custo_entrega = total_devido / total_entregas if total_entregas else 0
+
+    partes = [
+        f"Valores: diária={_numero(config_atual.get('valor_diaria'))}; "
+        f"corrida={_numero(config_atual.get('valor_corrida'))}",
+        f"Hoje: entregas={kpis_hoje.get('total_entregas', 0)}; "
+        f"motoboys={kpis_hoje.get('total_motoboys', 0)}; "
+        f"custo={_numero(kpis_hoje.get('custo_total'))}; "
+        f"custo/entrega={_numero(kpis_hoje.get('custo_medio_entrega'))}",
+        f"Semana: motoboys={len(linhas)}; entregas={total_entregas}; "
+        f"a pagar={_numero(total_devido)}; custo/entrega={_numero(custo_entrega)}",
+    ]
+    if linhas:
+        partes.append("Mais entregas: " + ", ".join(
+            f"{r['nome']} ({r.get('total_entregas', 0)})" for r in linhas[:DESTAQUES]
+        ))
+        if len(linhas) > DESTAQUES:
+            partes.append("Menos entregas: " + ", ".join(
+                f"{r['nome']} ({r.get('total_entregas', 0)})" for r in linhas[-DESTAQUES:][::-1]
+            ))
+        partes.append("Tabela semana (nome|tipo|dias|entregas|valor):")
+
+    # Tabela até o orçamento; o restante vira uma linha agregada
+    limite = orcamento * CARACTERES_POR_TOKEN - 80  # reserva para a linha agregada
+    tamanho = sum(len(p) + 1 for p in partes)
+    listados = 0
+    for linha in linhas:
+        candidata = _linha_tabela(linha)
+        if tamanho + len(candidata) + 1 > limite:
+            break
+        partes.append(candidata)
+        tamanho += len(candidata) + 1
+        listados += 1
+    texto = "\n".join(partes)
+
+    restantes = linhas[listados:]
+    if restantes:
+        texto += (
+            f"\n+{len(restantes)} outros|-|-|"
+            f"{sum(int(r.get('total_entregas') or 0) for r in restantes)}|"
+            f"{_numero(sum(float(r.get('valor_devido') or 0) for r in restantes))}"
         )
 
-        return response.text
+    return texto, {
+        "tokens": estimar_tokens(texto),
+        "orcamento": orcamento,
+        "motoboys_listados": listados,
+        "motoboys_total": len(linhas),
+    }
+
+
+def montar_prompt(pergunta, kpis_hoje, relatorio_semanal, config_atual):
+    """
+    Monta o prompt com o contexto de dados e a pergunta
+
+    Returns:
+        Tupla (prompt, metadados do contexto)
+    """
+    contexto, metadados = montar_contexto(kpis_hoje, relatorio_semanal, config_atual)
+    prompt = (
+        "Você é o 'Assistente Motoboy AI'. Valores em reais.\n\n"
+        f"DADOS ATUAIS:\n{contexto}\n\n"
+        "Responda de forma breve e profissional. 🏍️\n\n"
+        f"Pergunta: {pergunta}"
+    )
+    metadados["tokens_prompt"] = estimar_tokens(prompt)
+    return prompt, metadados
+
+
+class MedidorPrompts:
+    """
+    Tamanho dos prompts enviados (tokens estimados) para acompanhar custo e latência
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chamadas = 0
+        self.tokens_total = 0
+        self.tokens_max = 0
+        self.ultimo = None
+
+    def registrar(self, metadados):
+        with self._lock:
+            self.chamadas += 1
+            self.tokens_total += metadados["tokens_prompt"]
+            self.tokens_max = max(self.tokens_max, metadados["tokens_prompt"])
+            self.ultimo = dict(metadados)
 
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "chamadas": self.chamadas,
+                "tokens_medio": round(self.tokens_total / self.chamadas, 1) if self.chamadas else 0.0,
+                "tokens_max": self.tokens_max,
+                "ultimo": self.ultimo
+            }
+
+
+@st.cache_resource
+def get_medidor_prompts():
+    return MedidorPrompts()
+
+
+# ==================== RESPOSTAS LOCAIS ====================
+# Perguntas cuja resposta sai direto dos KPIs/relatório: respondidas sem chamar a IA
+
+def _normalizar_pergunta(pergunta):
+    texto = unicodedata.normalize("NFKD", str(pergunta or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[a-z0-9/]+", texto))
+
+
+def _tem_termo(texto, termo):
+    # Palavra inteira: "dia" não casa com "diaria" nem "diario"
+    return re.search(rf"\b{re.escape(termo)}\b", texto) is not None
+
+
+def _contem(texto, *grupos):
+    """
+    True se o texto contém ao menos um termo de cada grupo (palavras inteiras)
+    """
+    return all(any(_tem_termo(texto, termo) for termo in grupo) for grupo in grupos)
+
+
+# Recortes que as respostas locais não fazem (todos os motoboys, os dois
+# turnos, só hoje ou só esta semana): perguntas com eles seguem para o Gemini
+TERMOS_TURNO = ("manha", "noite", "tarde", "turno", "turnos", "periodo")
+TERMOS_TIPO = ("fixo", "fixos", "freelancer", "freelancers", "freela", "freelas")
+TERMOS_COMPARACAO = (
+    "compare", "comparar", "compara", "comparado", "comparando", "comparacao",
+    "versus", "vs", "diferenca", "em relacao", "evolucao",
+)
+TERMOS_OUTRA_DATA = (
+    "ontem", "anteontem", "amanha", "mes", "meses", "mensal", "ano", "anos", "anual",
+    "passada", "passado", "anterior", "ultima", "ultimo", "ultimas", "ultimos",
+    "proxima", "proximo", "segunda", "terca", "quarta", "quinta", "sexta", "sabado", "domingo",
+    "janeiro", "fevereiro", "marco", "abril", "maio", "junho", "julho", "agosto",
+    "setembro", "outubro", "novembro", "dezembro",
+)
+TERMOS_HOJE = ("hoje", "do dia")
+TERMOS_SEMANA = ("semana", "semanal")
+
+
+def _menciona_motoboy(texto, nomes):
+    """
+    True se a pergunta cita algum motoboy (nome ou sobrenome com 3+ letras)
+    """
+    palavras = set(texto.split())
+    for nome in nomes:
+        if any(len(parte) >= 3 and parte in palavras for parte in _normalizar_pergunta(nome).split()):
+            return True
+    return False
+
+
+def _fora_do_escopo(texto, nomes):
+    """
+    True se a pergunta pede um recorte que as respostas locais não cobrem:
+    um motoboy, um turno ou tipo, outra data ou uma comparação
+    """
+    if re.search(r"\d", texto):
+        return True
+    if _contem(texto, TERMOS_TURNO + TERMOS_TIPO + TERMOS_COMPARACAO + TERMOS_OUTRA_DATA):
+        return True
+    return _menciona_motoboy(texto, nomes)
+
+
+def _resumo_hoje(kpis_hoje, relatorio_semanal, config_atual):
+    if not kpis_hoje.get("total_motoboys"):
+        return "📭 Ainda não há registros hoje."
+    return (
+        f"💰 **Resumo de hoje:** {kpis_hoje.get('total_entregas', 0)} entregas feitas por "
+        f"{kpis_hoje.get('total_motoboys', 0)} motoboys "
+        f"(média de {kpis_hoje.get('media_entregas_moto', 0)} por motoboy). "
+        f"Custo total de {utils.formatar_moeda(kpis_hoje.get('custo_total'))}, "
+        f"ou {utils.formatar_moeda(kpis_hoje.get('custo_medio_entrega'))} por entrega."
+    )
+
+
+def _ranking(relatorio_semanal, maiores):
+    if not relatorio_semanal:
+        return "📭 Não há registros nesta semana."
+    ordenado = sorted(
+        relatorio_semanal,
+        key=lambda r: (int(r.get("total_entregas") or 0), -int(r.get("dias_trabalhados") or 0)),
+        reverse=maiores
+    )
+    primeiro = ordenado[0]
+    dias = int(primeiro.get("dias_trabalhados") or 0)
+    por_dia = int(primeiro.get("total_entregas") or 0) / dias if dias else 0
+    titulo = "🏆 Mais produtivo" if maiores else "🐢 Menos entregas"
+    resposta = (
+        f"{titulo} da semana: **{primeiro['nome']}**, com {primeiro.get('total_entregas', 0)} "
+        f"entregas em {dias} dia(s) ({por_dia:.1f} por dia)."
+    )
+    seguintes = ordenado[1:3]
+    if seguintes:
+        resposta += " Em seguida: " + ", ".join(
+            f"{r['nome']} ({r.get('total_entregas', 0)})" for r in seguintes
+        ) + "."
+    return resposta
+
+
+def _reduzir_custo(kpis_hoje, relatorio_semanal, config_atual):
+    fixos = [r for r in relatorio_semanal if int(r.get("dias_fixo") or 0) > 0]
+    if not fixos:
+        return "📭 Não há motoboys fixos nesta semana para analisar o custo médio."
+
+    valor_diaria = float(config_atual.get("valor_diaria") or 0)
+    custo_total = sum(float(r.get("valor_devido") or 0) for r in fixos)
+    custo_diarias = sum(int(r.get("dias_fixo") or 0) for r in fixos) * valor_diaria
+    entregas = sum(int(r.get("entregas_fixo") or 0) for r in fixos)
+    parcela_diarias = custo_diarias / custo_total * 100 if custo_total else 0
+
+    # Custo por entrega de cada fixo: quem entrega pouco por dia dilui mal a diária
+    caros = sorted(
+        (
+            (float(r.get("valor_devido") or 0) / int(r.get("entregas_fixo") or 0), r["nome"])
+            for r in fixos if int(r.get("entregas_fixo") or 0) > 0
+        ),
+        reverse=True
+    )[:3]
+
+    resposta = (
+        f"📉 Custo médio dos fixos na semana: "
+        f"{utils.formatar_moeda(custo_total / entregas if entregas else 0)} por entrega; "
+        f"as diárias são {parcela_diarias:.0f}% do custo."
+    )
+    if caros:
+        resposta += " Maior custo por entrega: " + ", ".join(
+            f"{nome} ({utils.formatar_moeda(custo)})" for custo, nome in caros
+        ) + "."
+    resposta += (
+        " Para reduzir: concentre as entregas nos fixos com mais demanda, "
+        "escale freelancers nos turnos de pouco movimento e revise as diárias "
+        "dos dias com poucas entregas."
+    )
+    return resposta
+
+
+def _total_semana(kpis_hoje, relatorio_semanal, config_atual):
+    if not relatorio_semanal:
+        return "📭 Não há registros nesta semana."
+    total = sum(float(r.get("valor_devido") or 0) for r in relatorio_semanal)
+    entregas = sum(int(r.get("total_entregas") or 0) for r in relatorio_semanal)
+    return (
+        f"🧾 A pagar na semana: **{utils.formatar_moeda(total)}** para "
+        f"{len(relatorio_semanal)} motoboys ({entregas} entregas)."
+    )
+
+
+# (grupos de termos, termos que a excluem, função) — a primeira intenção
+# reconhecida responde
+INTENCOES = [
+    ((("reduzir", "diminuir", "baixar", "economizar"), ("custo", "custos", "gasto", "gastos")),
+     TERMOS_HOJE, _reduzir_custo),
+    ((("mais produtivo", "mais entregas", "melhor motoboy", "entregou mais"),),
+     TERMOS_HOJE, lambda k, r, c: _ranking(r, maiores=True)),
+    ((("menos produtivo", "menos entregas", "entregou menos", "pior motoboy"),),
+     TERMOS_HOJE, lambda k, r, c: _ranking(r, maiores=False)),
+    ((("pagar", "folha", "devido", "pagamento"), TERMOS_SEMANA),
+     TERMOS_HOJE, _total_semana),
+    ((("resumo", "financeiro", "custo", "gasto", "quantas entregas", "quantos motoboys"), TERMOS_HOJE),
+     TERMOS_SEMANA, _resumo_hoje),
+]
+
+
+def responder_localmente(pergunta, kpis_hoje, relatorio_semanal, config_atual, nomes=()):
+    """
+    Responde perguntas analíticas conhecidas a partir dos dados, sem chamar a IA
+
+    Args:
+        nomes: Motoboys cadastrados; perguntas que citam um deles seguem para o Gemini
+
+    Returns:
+        Texto da resposta ou None (pergunta aberta: segue para o Gemini)
+    """
+    texto = _normalizar_pergunta(pergunta)
+    for grupos, excluidos, responder in INTENCOES:
+        if _contem(texto, *grupos) and not _contem(texto, excluidos):
+            if _fora_do_escopo(texto, nomes):
+                return None
+            return responder(kpis_hoje or {}, relatorio_semanal or [], config_atual or {})
+    return None
+
+
+def _mensagem_erro(e):
+    # Caso o erro 404 persista, vamos tentar um fallback automático
+    if "404" in str(e):
+        return "⚠️ O modelo de IA está sendo atualizado. Por favor, tente novamente em alguns minutos ou verifique se o serviço está ativo no seu Google AI Studio."
+    return f"❌ Erro na IA: {str(e)}"
+
+
+@instrumentacao.medir()
+def stream_gemini_response(pergunta, kpis_hoje, relatorio_semanal, config_atual, nomes=()):
+    """
+    Consulta o Gemini Flash e devolve a resposta em partes, à medida que chega
+    (use com st.write_stream). Respostas completas vão para o cache; erros não.
+    Perguntas reconhecidas por responder_localmente não chegam à API.
+
+    Args:
+        nomes: Motoboys cadastrados (ver responder_localmente)
+
+    Yields:
+        Trechos de texto da resposta
+    """
+    resposta = responder_localmente(pergunta, kpis_hoje, relatorio_semanal, config_atual, nomes)
+    if resposta is not None:
+        yield resposta
+        return
+
+    chave = (pergunta.strip().lower(), impressao_dados(kpis_hoje, relatorio_semanal, config_atual))
+    cache = get_cache_respostas()
+    resposta = cache.obter(chave)
+    if resposta is not None:
+        yield resposta
+        return
+
+    partes = []
+    try:
+        client = get_gemini_client()
+        prompt, metadados = montar_prompt(pergunta, kpis_hoje, relatorio_semanal, config_atual)
+        get_medidor_prompts().registrar(metadados)
+        stream = client.models.generate_content_stream(model=MODELO_GEMINI, contents=prompt)
+        for trecho in stream:
+            if trecho.text:
+                partes.append(trecho.text)
+                yield trecho.text
     except Exception as e:
-        # Caso o erro 404 persista, vamos tentar um fallback automático
-        if "404" in str(e):
-            return "⚠️ O modelo de IA está sendo atualizado. Por favor, tente novamente em alguns minutos ou verifique se o serviço está ativo no seu Google AI Studio."
-        return f"❌ Erro na IA: {str(e)}"
+        instrumentacao.registrar_erro()
+        yield _mensagem_erro(e)
+        return
+
+    if partes:
+        cache.guardar(chave, "".join(partes))
+
+
+@instrumentacao.medir()
+def get_gemini_response(pergunta, kpis_hoje, relatorio_semanal, config_atual, nomes=()):
+    """
+    Consulta o Gemini Flash para análise de dados logísticos.
+    Retorna a resposta completa (ver stream_gemini_response)
+    """
+    return "".join(stream_gemini_response(pergunta, kpis_hoje, relatorio_semanal, config_atual, nomes))
+
 
 def sugerir_perguntas():
     return [
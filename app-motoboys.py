@@ -7,13 +7,20 @@ Versão 2026 - Otimizada para Streamlit Cloud
 - Supabase 2.x
 - Correção Definitiva de Largura (width='stretch')
 """
+import itertools
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, date
+import plotly.graph_objects as go
+from datetime import datetime, date, timedelta
 import database as db
 import utils
 import ai_assistant
+import instrumentacao
+import importador
+import exportacao
+import fila_escrita
+import indice_nomes
 
 # Configuração da página
 st.set_page_config(
@@ -25,7 +32,7 @@ st.set_page_config(
 
 # Verificar configuração de secrets
 try:
-    if "supabase" not in st.secrets or "google" not in st.secrets:
+    if "google" not in st.secrets or (db.get_tipo_backend() == "supabase" and "supabase" not in st.secrets):
         st.error("""
         ⚠️ **Configuração Necessária**
         Por favor, configure os secrets no Streamlit Cloud (Settings > Secrets).
@@ -50,6 +57,14 @@ st.markdown("""
 
 st.markdown('<h1 class="main-header">🏍️ Sistema de Controle de Motoboys</h1>', unsafe_allow_html=True)
 
+# Estado da conexão com o banco (disjuntor aberto: as consultas falham na hora)
+saude = db.saude_conexao()
+if saude and saude["estado"] != "fechado":
+    st.warning(
+        f"⚠️ **Banco de dados indisponível** — nova tentativa em {saude['reabre_em']:.0f}s. "
+        f"Último erro: {saude['ultimo_erro']}"
+    )
+
 # Inicializar session state
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
@@ -57,11 +72,33 @@ if 'chat_history' not in st.session_state:
 if 'editando_registro' not in st.session_state:
     st.session_state.editando_registro = None
 
-# Criar tabs principais
-tab_operacional, tab_gerencial = st.tabs(["📋 OPERACIONAL", "📊 GERENCIAL"])
+# Navegação entre as áreas
+# Ao contrário de st.tabs (que executa as duas abas a cada rerun), só a área
+# selecionada é calculada; dentro dela, cada painel é um fragmento que reroda sozinho
+AREAS = ["📋 OPERACIONAL", "📊 GERENCIAL"]
+area = st.segmented_control(
+    "Área", AREAS, default=AREAS[0], key="area_ativa", label_visibility="collapsed"
+) or AREAS[0]
+
 
 # ==================== ABA OPERACIONAL ====================
-with tab_operacional:
+def registrar(nome, data_registro, periodo, tipo, entregas):
+    """
+    Grava o registro; o nome é gravado na grafia já cadastrada (se houver)
+    """
+    inserido = db.inserir_registro(nome, data_registro, periodo, tipo, entregas)
+    if inserido:
+        # O cache já foi corrigido com a linha gravada: a lista abaixo
+        # é desenhada neste mesmo rerun, sem nova consulta
+        st.success(f"✅ Registro de {inserido['nome']} adicionado!")
+
+
+@st.fragment
+@db.por_rerun
+def painel_operacional():
+    """
+    Formulário e lista do dia; ações do operador reexecutam só este fragmento
+    """
     st.header("Gestão Operacional Diária")
     col1, col2 = st.columns([1, 1])
 
@@ -91,35 +128,106 @@ with tab_operacional:
             submitted = st.form_submit_button("✅ Registrar", width='stretch')
 
             if submitted and nome:
-                if db.inserir_registro(nome.strip(), data_registro, periodo, tipo, entregas):
-                    st.success(f"✅ Registro de {nome} adicionado!")
-                    st.rerun()
+                sugestoes = db.buscar_nomes_semelhantes(nome)
+                if sugestoes:
+                    # Nome novo parecido com um cadastrado: confirmar antes de gravar
+                    st.session_state["confirmar_registro"] = {
+                        "nome": nome.strip(), "data": data_registro, "periodo": periodo,
+                        "tipo": tipo, "entregas": entregas, "sugestoes": sugestoes
+                    }
+                else:
+                    st.session_state.pop("confirmar_registro", None)
+                    registrar(nome.strip(), data_registro, periodo, tipo, entregas)
+
+        pendente = st.session_state.get("confirmar_registro")
+        if pendente:
+            aviso = st.empty()
+            with aviso.container():
+                st.warning(f"⚠️ **{pendente['nome']}** é parecido com motoboys já cadastrados. É um deles?")
+                escolhido = None
+                for i, sugestao in enumerate(pendente["sugestoes"]):
+                    if st.button(f"✔️ {sugestao}", key=f"confirmar_nome_{i}"):
+                        escolhido = sugestao
+                c_novo, c_cancelar = st.columns(2)
+                if c_novo.button(f"➕ Cadastrar {pendente['nome']}", key="confirmar_nome_novo"):
+                    escolhido = pendente["nome"]
+                cancelar = c_cancelar.button("Cancelar", key="confirmar_nome_cancelar")
+            if escolhido or cancelar:
+                aviso.empty()
+                del st.session_state["confirmar_registro"]
+            if escolhido:
+                registrar(escolhido, pendente["data"], pendente["periodo"], pendente["tipo"], pendente["entregas"])
 
     with col2:
         st.subheader("📅 Registros de Hoje")
-        registros_hoje = db.buscar_registros_dia(date.today())
-        if registros_hoje:
-            for registro in registros_hoje:
-                col_info, col_actions = st.columns([3, 1])
-                with col_info:
-                    st.write(f"**{registro['nome']}** | {registro['periodo']} | 📦 {registro['entregas']} ent.")
-                with col_actions:
-                    c_edit, c_del = st.columns(2)
-                    if c_edit.button("✏️", key=f"edit_{registro['id']}"):
-                        st.session_state.editando_registro = registro
-                    if c_del.button("🗑️", key=f"del_{registro['id']}"):
-                        if db.excluir_registro(registro['id']): st.rerun()
-                st.divider()
-        else:
-            st.info("ℹ️ Nenhum registro hoje.")
+        lista_registros_hoje()
+
+
+CONFIG_TEMPO_REAL = db.get_config_tempo_real()
+# Reexecução periódica: deltas de tempo real e/ou ⏳ → ✅ da fila de gravação
+INTERVALO_LISTA = (
+    CONFIG_TEMPO_REAL["intervalo"]
+    if CONFIG_TEMPO_REAL["ativo"] or db.get_config_fila_escrita()["ativo"] else None
+)
 
-# ==================== ABA GERENCIAL ====================
-with tab_gerencial:
-    st.header("Análise Gerencial e IA")
-    config_atual = db.buscar_configuracao_ativa()
-    kpis_hoje = db.calcular_kpis_dia(date.today())
-    relatorio_semanal = db.gerar_relatorio_semanal()
 
+@st.fragment(run_every=INTERVALO_LISTA)
+@db.por_rerun
+def lista_registros_hoje():
+    """
+    Lista do dia servida do espelho em memória: mudanças feitas em qualquer
+    terminal chegam como deltas e aparecem na próxima verificação, sem recarregar a lista.
+    Com a fila de gravação, registros ainda não enviados aparecem com ⏳ e os gravados com ✅
+    """
+    pendentes = db.registros_pendentes_dia(date.today())
+    registros_hoje = db.registros_dia_tempo_real(date.today())
+
+    fila = db.estado_fila_escrita()
+    if fila and fila["pendentes"]:
+        aviso = f"⏳ {fila['pendentes']} registro(s) aguardando envio ao banco"
+        if fila["ultimo_erro"]:
+            aviso += f" — nova tentativa em instantes ({fila['ultimo_erro'][:80]})"
+        st.caption(aviso)
+
+    # Situação de cada linha no diário: ⏳ enquanto o envio não foi confirmado
+    situacao = db.status_fila_escrita(pendentes + registros_hoje) if fila else {}
+    no_banco = {registro.get("chave_idempotencia") for registro in registros_hoje}
+
+    # Pendentes: aceitos na fila local, ainda sem id no banco (sem ações);
+    # enviados mas ainda não confirmados já aparecem abaixo, com a linha do banco
+    for registro in reversed(pendentes):
+        if registro["chave_idempotencia"] in no_banco:
+            continue
+        st.write(f"⏳ **{registro['nome']}** | {registro['periodo']} | 📦 {registro['entregas']} ent.")
+        st.divider()
+
+    if registros_hoje:
+        for registro in registros_hoje:
+            col_info, col_actions = st.columns([3, 1])
+            with col_info:
+                marca = ""
+                if fila:
+                    pendente = situacao.get(registro.get("chave_idempotencia")) == fila_escrita.PENDENTE
+                    marca = "⏳ " if pendente else "✅ "
+                st.write(f"{marca}**{registro['nome']}** | {registro['periodo']} | 📦 {registro['entregas']} ent.")
+            with col_actions:
+                c_edit, c_del = st.columns(2)
+                if c_edit.button("✏️", key=f"edit_{registro['id']}"):
+                    st.session_state.editando_registro = registro
+                # Exclui antes do rerun do fragmento, que já encontra o cache corrigido
+                c_del.button("🗑️", key=f"del_{registro['id']}", on_click=db.excluir_registro, args=(registro['id'],))
+            st.divider()
+    elif not pendentes:
+        st.info("ℹ️ Nenhum registro hoje.")
+
+
+# ==================== ABA GERENCIAL ====================
+@st.fragment
+@db.por_rerun
+def painel_configuracao(config_atual):
+    """
+    Edição de valores; só o salvamento reexecuta a área gerencial inteira
+    """
     with st.expander("🔧 Gerenciar Valores", expanded=False):
         col_c1, col_c2, col_c3 = st.columns([2, 2, 1])
         v_diaria = col_c1.text_input("Diária (R$)", value=f"{config_atual.get('valor_diaria', 0):.2f}".replace('.', ','))
@@ -128,9 +236,56 @@ with tab_gerencial:
         # CORREÇÃO: width='stretch'
         if col_c3.button("💾 Salvar", width='stretch'):
             if db.salvar_configuracao(utils.parse_moeda(v_diaria), utils.parse_moeda(v_corrida)):
+                # KPIs e relatório dependem dos valores: rerun completo
                 st.rerun()
 
-    # KPIs
+
+@st.fragment
+@db.por_rerun
+def painel_importacao():
+    """
+    Importação de planilhas históricas em lotes, com progresso e retomada
+    """
+    with st.expander("📥 Importar Planilha (XLSX/CSV)", expanded=False):
+        st.caption("Colunas: nome, data, periodo, tipo, entregas. Reimportar o mesmo arquivo não duplica registros.")
+        arquivo = st.file_uploader("Planilha", type=["xlsx", "csv"], key="arquivo_importacao")
+        col_i1, col_i2 = st.columns([2, 1])
+        a_partir_de = col_i1.number_input("Retomar a partir da linha", min_value=0, value=0, step=1)
+
+        if arquivo and col_i2.button("📥 Importar", width='stretch'):
+            barra = st.progress(0.0, text="Importando...")
+
+            def atualizar(resultado):
+                # Sem total conhecido em streaming: avanço aproximado pelo arquivo lido
+                fracao = min(arquivo.tell() / max(arquivo.size, 1), 1.0)
+                barra.progress(fracao, text=f"Linha {resultado['ultima_linha']}: {resultado['inseridas']} inseridos")
+
+            try:
+                resultado = importador.importar(
+                    importador.ler_planilha(arquivo, arquivo.name),
+                    db.get_backend(),
+                    a_partir_de=a_partir_de,
+                    progresso=atualizar
+                )
+                barra.progress(1.0, text="Concluído")
+                st.success(
+                    f"✅ {resultado['inseridas']} inseridos, {resultado['duplicadas']} já existentes, "
+                    f"{resultado['invalidas']} inválidos"
+                )
+                for erro in resultado["erros"]:
+                    st.warning(f"Linha {erro['linha']}: {erro['erro']}")
+            except importador.ErroImportacao as e:
+                st.error(f"Erro na importação: {e}. Retome a partir da linha {e.resultado['ultima_linha'] + 1}.")
+            except Exception as e:
+                st.error(f"Erro na importação: {e}")
+            finally:
+                importador.concluir_importacao()
+
+
+def painel_indicadores(kpis_hoje, relatorio_semanal):
+    """
+    KPIs do dia, tabela e gráficos da semana
+    """
     st.subheader("📈 Indicadores de Hoje")
     c1, c2, c3, c4, c5 = st.columns(5)
     c1.metric("📦 Entregas", kpis_hoje['total_entregas'])
@@ -155,38 +310,338 @@ with tab_gerencial:
             fig_entregas = px.bar(df_relatorio, x='nome', y='total_entregas', color='tipo', title='Entregas/Semana')
             st.plotly_chart(fig_entregas, width='stretch')
         with col_g2:
-            df_fixos = df_relatorio[df_relatorio['tipo'] == 'Fixo']
+            df_fixos = df_relatorio[df_relatorio['valor_devido'] > 0]
             if not df_fixos.empty:
                 fig_valores = px.bar(df_fixos, x='nome', y='valor_devido', title='Valores/Fixos', color_discrete_sequence=['#2ca02c'])
                 st.plotly_chart(fig_valores, width='stretch')
 
-    st.divider()
 
-    # Assistente de IA
+@st.fragment
+@db.por_rerun
+def painel_periodo():
+    """
+    Relatório de qualquer período (mês, trimestre, datas livres)
+    """
+    st.subheader("📆 Relatório por Período")
+    col_p1, col_p2 = st.columns([1, 2])
+    escolha = col_p1.selectbox("Período", utils.PERIODOS_PREDEFINIDOS, key="periodo_relatorio")
+
+    if escolha == "Personalizado":
+        intervalo = col_p2.date_input(
+            "Datas", value=(utils.get_inicio_semana(), date.today()), format="DD/MM/YYYY"
+        )
+        if len(intervalo) != 2:
+            st.info("ℹ️ Selecione a data inicial e a final.")
+            return
+        data_inicio, data_fim = intervalo
+    else:
+        data_inicio, data_fim = utils.get_periodo_predefinido(escolha)
+        col_p2.write(f"{utils.formatar_data_br(data_inicio)} a {utils.formatar_data_br(data_fim)}")
+
+    relatorio_periodo = db.gerar_relatorio_periodo(data_inicio, data_fim)
+    if not relatorio_periodo:
+        st.info("ℹ️ Nenhum registro no período.")
+        return
+
+    df_periodo = pd.DataFrame(relatorio_periodo)
+    df_periodo['valor_devido'] = df_periodo['valor_devido'].apply(utils.formatar_moeda)
+    st.dataframe(df_periodo, width='stretch', hide_index=True)
+
+    with st.expander("⬇️ Exportar período", expanded=False):
+        col_e1, col_e2, col_e3 = st.columns([2, 2, 1])
+        conteudo = col_e1.radio(
+            "Conteúdo", ["registros", "folha"], horizontal=True, key="exportar_conteudo",
+            format_func=lambda c: "Registros (todos os turnos)" if c == "registros" else "Folha de pagamento"
+        )
+        formato = col_e2.radio("Formato", list(exportacao.FORMATOS), horizontal=True, key="exportar_formato")
+        if col_e3.button("📦 Gerar arquivo", width='stretch'):
+            dados, total = db.exportar_periodo(data_inicio, data_fim, conteudo, formato)
+            if dados is not None:
+                st.download_button(
+                    f"⬇️ Baixar ({total} linhas)",
+                    dados,
+                    file_name=exportacao.nome_arquivo(conteudo, data_inicio, data_fim, formato),
+                    mime=exportacao.FORMATOS[formato][1],
+                )
+
+    if st.toggle("Mostrar registros do período", key="mostrar_registros_periodo"):
+        # Só a primeira página é buscada: o gerador não carrega o período inteiro
+        limite = 500
+        registros = list(itertools.islice(
+            db.iterar_registros(data_inicio, data_fim, tamanho_pagina=limite + 1), limite + 1
+        ))
+        if len(registros) > limite:
+            st.caption(f"Exibindo os primeiros {limite} registros do período.")
+        if registros:
+            df_registros = pd.DataFrame(registros[:limite])
+            st.dataframe(
+                df_registros[['data', 'nome', 'periodo', 'tipo', 'entregas']],
+                width='stretch', hide_index=True
+            )
+
+
+INTERVALOS_TENDENCIA = {"Últimos 90 dias": 89, "Últimos 12 meses": 364, "Últimos 2 anos": 729, "Últimos 5 anos": 1825}
+DIMENSOES_TENDENCIA = {
+    "Total": "total", "Por período": "periodo", "Por dia da semana": "dia_semana", "Por motoboy (top 5)": "motoboy"
+}
+NOMES_GRANULARIDADE = {"automático": "automático", "dia": "dia", "semana": "semana", "mes": "mês", "trimestre": "trimestre", "ano": "ano"}
+METRICAS_TENDENCIA = {
+    "Entregas": "entregas", "Custo": "custo", "Custo por motoboy": "custo_por_motoboy",
+    "Custo por entrega": "custo_por_entrega"
+}
+
+
+@st.fragment
+@db.por_rerun
+def painel_tendencias():
+    """
+    Tendências de meses/anos: o servidor reamostra resumo_diario e só
+    algumas centenas de pontos chegam ao navegador (traços WebGL)
+    """
+    st.subheader("📉 Tendências")
+    col_t1, col_t2, col_t3, col_t4 = st.columns(4)
+    intervalo = col_t1.selectbox("Intervalo", list(INTERVALOS_TENDENCIA), index=1, key="tendencia_intervalo")
+    dimensao = col_t2.selectbox("Séries", list(DIMENSOES_TENDENCIA), key="tendencia_dimensao")
+    metrica = col_t3.selectbox("Métrica", list(METRICAS_TENDENCIA), key="tendencia_metrica")
+    granularidade = col_t4.selectbox(
+        "Agrupar por", ["automático"] + utils.GRANULARIDADES, key="tendencia_granularidade",
+        format_func=NOMES_GRANULARIDADE.get
+    )
+
+    data_fim = date.today()
+    data_inicio = data_fim - timedelta(days=INTERVALOS_TENDENCIA[intervalo])
+    serie = db.buscar_serie_tendencia(
+        data_inicio, data_fim, DIMENSOES_TENDENCIA[dimensao],
+        None if granularidade == "automático" else granularidade
+    )
+    if not serie["linhas"]:
+        st.info("ℹ️ Nenhum registro no intervalo.")
+        return
+
+    coluna = METRICAS_TENDENCIA[metrica]
+    df_serie = pd.DataFrame(serie["linhas"])
+    fig = go.Figure()
+    for grupo, df_grupo in df_serie.groupby("grupo", sort=False):
+        fig.add_trace(go.Scattergl(
+            x=df_grupo["intervalo"], y=df_grupo[coluna], name=str(grupo),
+            mode="lines+markers" if len(df_grupo) <= 60 else "lines"
+        ))
+    fig.update_layout(
+        title=f"{metrica} por {NOMES_GRANULARIDADE[serie['granularidade']]}", hovermode="x unified",
+        yaxis_tickprefix="R$ " if coluna != "entregas" else None
+    )
+    st.plotly_chart(fig, width='stretch')
+    aviso = "" if granularidade in ("automático", serie["granularidade"]) else " (ajustado para caber no gráfico)"
+    st.caption(
+        f"{len(df_serie)} pontos agrupados por {NOMES_GRANULARIDADE[serie['granularidade']]}{aviso} no servidor. "
+        "Custos calculados com os valores atuais de diária e corrida."
+    )
+
+
+@st.fragment
+@db.por_rerun
+def painel_assistente(kpis_hoje, relatorio_semanal, config_atual):
+    """
+    Chat com a IA; perguntas reexecutam só este fragmento (sem recalcular KPIs e gráficos)
+    """
     st.subheader("🤖 Assistente de IA - Gemini 1.5 Flash")
     col_chat, col_sugestoes = st.columns([2, 1])
+    pergunta = None
 
     with col_sugestoes:
         st.write("**💡 Sugestões:**")
         for p in ai_assistant.sugerir_perguntas():
             # CORREÇÃO: width='stretch'
             if st.button(p, key=f"sug_{p[:15]}", width='stretch'):
-                st.session_state.chat_history.append({"role": "user", "message": p})
-                res = ai_assistant.get_gemini_response(p, kpis_hoje, relatorio_semanal, config_atual)
-                st.session_state.chat_history.append({"role": "assistant", "message": res})
-                st.rerun()
+                pergunta = p
 
     with col_chat:
-        for msg in st.session_state.chat_history:
-            st.chat_message(msg["role"]).write(msg["message"])
-        
+        mensagens = st.container()
         user_input = st.chat_input("Pergunte sobre os dados...")
-        if user_input:
-            st.session_state.chat_history.append({"role": "user", "message": user_input})
-            with st.spinner("🤔 Analisando..."):
-                res = ai_assistant.get_gemini_response(user_input, kpis_hoje, relatorio_semanal, config_atual)
-            st.session_state.chat_history.append({"role": "assistant", "message": res})
-            st.rerun()
+        pergunta = user_input or pergunta
+
+        with mensagens:
+            for msg in st.session_state.chat_history:
+                st.chat_message(msg["role"]).write(msg["message"])
+
+            if pergunta:
+                st.session_state.chat_history.append({"role": "user", "message": pergunta})
+                st.chat_message("user").write(pergunta)
+                # Resposta exibida conforme chega (perguntas repetidas vêm do cache)
+                res = st.chat_message("assistant").write_stream(
+                    ai_assistant.stream_gemini_response(
+                        pergunta, kpis_hoje, relatorio_semanal, config_atual, db.buscar_nomes_motoboys()
+                    )
+                )
+                st.session_state.chat_history.append({"role": "assistant", "message": res})
+
+        ultimo = ai_assistant.get_medidor_prompts().estatisticas()["ultimo"]
+        if ultimo:
+            st.caption(
+                f"🧮 Último prompt: ~{ultimo['tokens_prompt']} tokens "
+                f"({ultimo['motoboys_listados']} de {ultimo['motoboys_total']} motoboys detalhados)"
+            )
+
+
+@st.fragment
+@db.por_rerun
+def painel_duplicados():
+    """
+    Motoboys cadastrados com grafias diferentes; unificar reexecuta a área inteira
+    """
+    with st.expander("🧑‍🤝‍🧑 Motoboys duplicados", expanded=False):
+        st.caption(
+            "Mesma chave: mesmo nome com outros acentos, maiúsculas ou espaços. "
+            "Parecidos: podem ser pessoas diferentes, confira antes de unificar."
+        )
+        if not st.button("🔍 Procurar duplicados"):
+            if "duplicados" not in st.session_state:
+                return
+        else:
+            st.session_state["duplicados"] = db.encontrar_motoboys_duplicados()
+        duplicados = st.session_state["duplicados"]
+
+        if not duplicados["iguais"] and not duplicados["semelhantes"]:
+            st.info("Nenhum motoboy duplicado encontrado")
+            return
+
+        unificar = None
+        for i, grupo in enumerate(duplicados["iguais"]):
+            destino = indice_nomes.escolher_nome(grupo)
+            col_d1, col_d2 = st.columns([3, 1])
+            col_d1.write(f"= {' / '.join(grupo)} → **{destino}**")
+            if col_d2.button("Unificar", key=f"unificar_igual_{i}", width='stretch'):
+                unificar = ([nome for nome in grupo if nome != destino], destino)
+
+        for i, (nome_a, nome_b, valor) in enumerate(duplicados["semelhantes"]):
+            col_d1, col_d2, col_d3 = st.columns([2, 2, 1])
+            col_d1.write(f"~ {nome_a} / {nome_b} ({valor:.0%})")
+            destino = col_d2.selectbox(
+                "Manter", [nome_b, nome_a], key=f"manter_{i}", label_visibility="collapsed"
+            )
+            if col_d3.button("Unificar", key=f"unificar_parecido_{i}", width='stretch'):
+                unificar = ([nome_a if destino == nome_b else nome_b], destino)
+
+        if unificar:
+            origens, destino = unificar
+            total = db.mesclar_motoboys(origens, destino)
+            if total is not None:
+                st.session_state.pop("duplicados", None)
+                st.toast(f"✅ {', '.join(origens)} → {destino}: {total} registros")
+                # KPIs, relatório e listas mudam: rerun completo
+                st.rerun()
+
+
+def painel_gerencial():
+    """
+    Área gerencial: só é calculada quando selecionada
+    """
+    st.header("Análise Gerencial e IA")
+    # Configuração, KPIs e semana buscados em paralelo
+    dados = db.carregar_painel_gerencial(date.today())
+    config_atual = dados["config"]
+    kpis_hoje = dados["kpis"]
+    relatorio_semanal = dados["relatorio"]
+
+    painel_configuracao(config_atual)
+    painel_importacao()
+    painel_duplicados()
+    painel_indicadores(kpis_hoje, relatorio_semanal)
+
+    st.divider()
+    painel_periodo()
+
+    st.divider()
+    painel_tendencias()
+
+    st.divider()
+
+    # Assistente de IA
+    painel_assistente(kpis_hoje, relatorio_semanal, config_atual)
+
+
+# Uma unidade de trabalho por rerun: consultas idênticas não se repetem
+with db.unidade_de_trabalho() as unidade:
+    if area == AREAS[0]:
+        painel_operacional()
+    else:
+        painel_gerencial()
+
+
+# ==================== DIAGNÓSTICO (OCULTO) ====================
+def painel_diagnostico():
+    """
+    Métricas do caminho quente; aparece só com ?diagnostico=1 na URL
+    """
+    with st.expander("🩺 Diagnóstico", expanded=True):
+        totais = instrumentacao.totais_rerun()
+        if totais:
+            st.write("**Este carregamento**")
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Chamadas", totais["chamadas"])
+            c2.metric("Tempo medido", f"{totais['ms_instrumentado']:.0f} ms")
+            c3.metric("Linhas", totais["linhas"])
+            c4.metric("Bytes", totais["bytes"])
+            st.caption(f"Round-trips: {db.estatisticas_rerun()}")
+
+        st.write("**Acumulado do processo**")
+        por_funcao = instrumentacao.METRICAS.por_funcao()
+        if por_funcao:
+            st.dataframe(
+                pd.DataFrame.from_dict(por_funcao, orient="index").sort_values("ms_total", ascending=False),
+                width='stretch'
+            )
+        st.caption(
+            f"Cache de consultas: {db.estatisticas_cache()} | "
+            f"Respostas da IA: {ai_assistant.get_cache_respostas().estatisticas()} | "
+            f"Prompts: {ai_assistant.get_medidor_prompts().estatisticas()}"
+        )
+
+        saude = db.saude_conexao()
+        if saude:
+            st.write("**Conexão com o banco**")
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Disjuntor", saude["estado"])
+            c2.metric("Última latência", f"{saude['ultima_latencia_ms'] or 0:.0f} ms")
+            c3.metric("Novas tentativas", saude["novas_tentativas"])
+            c4.metric("Reconexões", saude["reconexoes"])
+            if saude["ultimo_erro"]:
+                st.caption(f"Último erro ({saude['ultima_falha']}): {saude['ultimo_erro']}")
+            if st.button("🔌 Testar conexão"):
+                if db.verificar_conexao():
+                    st.success("✅ Banco respondeu")
+                else:
+                    st.error("❌ Banco não respondeu")
+
+        config_arquivo = db.get_config_arquivamento()
+        st.write("**Arquivamento**")
+        destino = f"bucket `{config_arquivo['bucket']}`" if config_arquivo["bucket"] else "Parquet"
+        st.caption(
+            f"Meses anteriores aos últimos {config_arquivo['meses_ativos']} vão para "
+            f"{destino}; KPIs e folha continuam no banco. O arquivamento roda pela "
+            "linha de comando (`python arquivamento.py`, com a chave service_role)"
+        )
+        if not config_arquivo["bucket"]:
+            st.warning("⚠️ Sem [arquivamento] bucket: nenhum mês sai do banco (só simulação)")
+        if st.button("🔍 Simular arquivamento"):
+            resultado = db.arquivar_registros_antigos(simular=True)
+            if resultado:
+                st.dataframe(pd.DataFrame(resultado), width='stretch', hide_index=True)
+            else:
+                st.info("Nenhum mês para arquivar")
+
+        formato = st.radio("Exportar", ["JSON lines", "Prometheus"], horizontal=True)
+        if formato == "JSON lines":
+            texto, arquivo = instrumentacao.METRICAS.exportar_jsonl(), "metricas.jsonl"
+        else:
+            texto, arquivo = instrumentacao.METRICAS.exportar_prometheus(), "metricas.prom"
+        st.code(texto or "(sem chamadas registradas)", language="text")
+        st.download_button("⬇️ Baixar", texto, file_name=arquivo)
+
 
 st.divider()
 st.markdown("<div style='text-align: center; color: #666;'>🏍️ Sistema Motoboys 2026</div>", unsafe_allow_html=True)
+st.caption(f"🔄 {unidade.round_trips} consulta(s) ao banco neste carregamento")
+
+if st.query_params.get("diagnostico") == "1":
+    painel_diagnostico()
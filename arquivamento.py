@@ -0,0 +1,322 @@
+"""
+Arquivamento de registros antigos em Parquet
+Meses com mais de `meses_ativos` de idade são gravados em arquivos Parquet
+(zstd, um por mês), enviados ao bucket e removidos do banco — no Supabase a
+partição mensal inteira sai com DROP. resumo_diario e folha_semanal continuam
+no banco, então KPIs, folha e tendências seguem cobrindo o período; os
+registros brutos do arquivo continuam disponíveis para relatórios e
+exportações (ler_registros, sobre a cópia local baixada por sincronizar).
+
+O bucket (Supabase Storage) é o armazenamento durável: a pasta local é só
+uma cópia e some a cada reinício no Streamlit Cloud. Sem bucket configurado
+nada sai do banco; só a simulação é permitida.
+
+Uso (com a chave service_role do Supabase; veja DEPLOY.md):
+    python arquivamento.py               # meses_ativos, pasta e bucket de [arquivamento]
+    python arquivamento.py --meses 6 --simular
+    python arquivamento.py --particoes   # só cria as partições dos próximos meses
+"""
+import argparse
+import itertools
+import os
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import exportacao
+
+CONFIG_PADRAO = {
+    "pasta": "arquivo",      # cópia local dos arquivos Parquet
+    "meses_ativos": 12,      # meses mantidos no banco (além do atual)
+    "bucket": None,          # bucket do Supabase Storage (obrigatório para arquivar)
+}
+
+# Todas as colunas de registros (a exportação omite as de controle)
+COLUNAS_ARQUIVO = exportacao.COLUNAS_REGISTROS + [
+    ("updated_at", "texto"),
+    ("chave_idempotencia", "texto"),
+]
+
+PREFIXO = "registros_"
+# Anterior a qualquer registro real (início das buscas por meses antigos)
+INICIO_HISTORICO = date(2000, 1, 1)
+
+
+class ErroArquivamento(Exception):
+    """Arquivamento recusado ou cópia no bucket que não confere"""
+
+
+def inicio_mes(data):
+    """
+    Primeiro dia do mês da data
+    """
+    data = exportacao.converter(data, "data")
+    return data.replace(day=1)
+
+
+def somar_meses(mes, meses):
+    """
+    Primeiro dia do mês `meses` depois (ou antes, se negativo) de `mes`
+    """
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def limite_arquivamento(meses_ativos, hoje=None):
+    """
+    Primeiro dia do mês mais antigo que fica no banco
+
+    Returns:
+        date (registros antes desta data são arquivados)
+    """
+    return somar_meses(inicio_mes(hoje or date.today()), -int(meses_ativos))
+
+
+def arquivos_do_mes(pasta, mes):
+    """
+    Arquivos de um mês; um mês pode ter mais de um (lançamentos retroativos
+    feitos depois do primeiro arquivamento geram um arquivo adicional)
+    """
+    return sorted(Path(pasta).glob(f"{PREFIXO}{mes:%Y-%m}*.parquet"))
+
+
+def meses_arquivados(pasta):
+    """
+    Returns:
+        Lista ordenada com o primeiro dia de cada mês que tem arquivo
+    """
+    meses = set()
+    for arquivo in Path(pasta).glob(f"{PREFIXO}*.parquet"):
+        try:
+            meses.add(date.fromisoformat(arquivo.stem[len(PREFIXO):len(PREFIXO) + 7] + "-01"))
+        except ValueError:
+            continue
+    return sorted(meses)
+
+
+def _novo_caminho(pasta, mes):
+    existentes = arquivos_do_mes(pasta, mes)
+    sufixo = f"-{len(existentes)}" if existentes else ""
+    return Path(pasta) / f"{PREFIXO}{mes:%Y-%m}{sufixo}.parquet"
+
+
+def _gravar_atomico(destino, conteudo):
+    descritor, temporario = tempfile.mkstemp(dir=Path(destino).parent, suffix=".parcial")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, destino)
+    except BaseException:
+        Path(temporario).unlink(missing_ok=True)
+        raise
+
+
+def sincronizar(backend, bucket, pasta):
+    """
+    Baixa para a pasta local os arquivos do bucket que ainda não estão nela
+
+    Returns:
+        Quantidade de arquivos baixados
+    """
+    Path(pasta).mkdir(parents=True, exist_ok=True)
+    baixados = 0
+    for nome in backend.listar_arquivos(bucket, PREFIXO):
+        destino = Path(pasta) / nome
+        if nome.endswith(".parquet") and not destino.exists():
+            _gravar_atomico(destino, backend.baixar_arquivo(bucket, nome))
+            baixados += 1
+    return baixados
+
+
+def enviar(backend, bucket, caminho):
+    """
+    Envia um arquivo ao bucket e confere a cópia (baixada de volta e
+    comparada byte a byte)
+
+    Raises:
+        ErroArquivamento: a cópia no bucket difere do arquivo local
+    """
+    nome = Path(caminho).name
+    conteudo = Path(caminho).read_bytes()
+    backend.enviar_arquivo(bucket, nome, conteudo)
+    if backend.baixar_arquivo(bucket, nome) != conteudo:
+        backend.remover_arquivo(bucket, nome)
+        raise ErroArquivamento(f"A cópia de {nome} no bucket {bucket} não confere")
+
+
+def gravar_mes(pasta, mes, linhas):
+    """
+    Grava os registros de um mês em Parquet (arquivo temporário renomeado
+    no fim: um arquivo interrompido nunca aparece como arquivado)
+
+    Returns:
+        Tupla (caminho, quantidade de linhas)
+    """
+    Path(pasta).mkdir(parents=True, exist_ok=True)
+    destino = _novo_caminho(pasta, mes)
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix=".parcial")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            total = exportacao.escrever_parquet(arquivo, linhas, COLUNAS_ARQUIVO)
+        os.replace(temporario, destino)
+    except BaseException:
+        Path(temporario).unlink(missing_ok=True)
+        raise
+    return destino, total
+
+
+def ordem(linha):
+    """
+    Chave de ordenação (data, id), a mesma da paginação do banco
+    """
+    return str(linha["data"]), linha["id"]
+
+
+def ler_registros(pasta, data_inicio, data_fim, nomes=None):
+    """
+    Registros arquivados de um período, no formato das linhas do banco
+    (datas como 'YYYY-MM-DD'), ordenados por data e id
+
+    Só abre os arquivos dos meses do período e só lê as linhas do intervalo;
+    a memória usada é a de um mês por vez.
+
+    Args:
+        nomes: Dicionário {grafia antiga: nome atual} (motoboys_mesclados);
+            os arquivos guardam o nome da época do arquivamento
+
+    Yields:
+        Dicionários com as colunas de COLUNAS_ARQUIVO
+    """
+    import pyarrow.parquet as pq
+
+    inicio = exportacao.converter(data_inicio, "data")
+    fim = exportacao.converter(data_fim, "data")
+    for mes in meses_arquivados(pasta):
+        if not inicio_mes(inicio) <= mes <= fim:
+            continue
+        linhas = []
+        for arquivo in arquivos_do_mes(pasta, mes):
+            tabela = pq.read_table(arquivo, filters=[("data", ">=", inicio), ("data", "<=", fim)])
+            linhas.extend(tabela.to_pylist())
+        for linha in linhas:
+            linha["data"] = linha["data"].isoformat()
+            if nomes:
+                linha["nome"] = nomes.get(linha["nome"], linha["nome"])
+        linhas.sort(key=ordem)
+        anterior = None
+        for linha in linhas:
+            # Mesmo registro em dois arquivos do mês: arquivamento interrompido
+            if ordem(linha) != anterior:
+                anterior = ordem(linha)
+                yield linha
+
+
+def arquivar(backend, pasta, meses_ativos, hoje=None, simular=False, tamanho_pagina=1000, bucket=None):
+    """
+    Arquiva os meses anteriores ao limite, um de cada vez
+
+    Cada mês é lido página a página, gravado em Parquet, enviado ao bucket
+    (cópia conferida) e só então removido do banco, conferindo a quantidade
+    de linhas; se algo falhar no meio do caminho, o arquivo é descartado
+    (local e no bucket) e o mês fica para a próxima execução.
+
+    Args:
+        backend: storage.StorageBackend
+        pasta: Pasta local dos arquivos Parquet
+        meses_ativos: Meses completos mantidos no banco
+        simular: Se True, só conta os registros de cada mês
+        bucket: Bucket do armazenamento durável (obrigatório se não simular)
+
+    Returns:
+        Lista de dicionários com mes, registros, arquivo e erro (se houver)
+
+    Raises:
+        ErroArquivamento: Sem bucket e sem simular
+    """
+    if not simular:
+        if not bucket:
+            raise ErroArquivamento(
+                "Configure [arquivamento] bucket (Supabase Storage) para arquivar; "
+                "sem armazenamento durável só a simulação é permitida"
+            )
+        # Partições à frente primeiro: lançamentos novos nunca caem na partição padrão
+        backend.garantir_particoes()
+        # Arquivos de execuções anteriores: o próximo nome do mês não pode repetir um do bucket
+        sincronizar(backend, bucket, pasta)
+
+    limite = limite_arquivamento(meses_ativos, hoje)
+    fim = date.fromordinal(limite.toordinal() - 1)
+
+    def paginas():
+        apos = None
+        while True:
+            pagina = backend.buscar_pagina_registros(INICIO_HISTORICO, fim, apos, tamanho_pagina)
+            yield from pagina
+            if len(pagina) < tamanho_pagina:
+                return
+            apos = (pagina[-1]["data"], pagina[-1]["id"])
+
+    resultado = []
+    # Paginação por (data, id): remover um mês não desloca as páginas seguintes
+    for mes, linhas in itertools.groupby(paginas(), key=lambda linha: inicio_mes(linha["data"])):
+        item = {"mes": f"{mes:%Y-%m}", "registros": 0, "arquivo": None, "erro": None}
+        if simular:
+            item["registros"] = sum(1 for _ in linhas)
+            resultado.append(item)
+            continue
+
+        caminho, total = gravar_mes(pasta, mes, linhas)
+        item["registros"], item["arquivo"] = total, f"{bucket}/{caminho.name}"
+        enviado = False
+        try:
+            enviar(backend, bucket, caminho)
+            enviado = True
+            backend.arquivar_mes_registros(mes, total)
+        except Exception as e:
+            caminho.unlink(missing_ok=True)
+            item["arquivo"], item["erro"] = None, str(e)
+            if enviado:
+                try:
+                    backend.remover_arquivo(bucket, caminho.name)
+                except Exception as erro_remocao:
+                    # Linhas repetidas no arquivo e no banco são lidas uma vez só
+                    item["erro"] += f" (cópia no bucket não removida: {erro_remocao})"
+        resultado.append(item)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquiva registros antigos em Parquet")
+    parser.add_argument("--meses", type=int, help="Meses mantidos no banco (padrão: [arquivamento] meses_ativos)")
+    parser.add_argument("--pasta", help="Pasta local dos arquivos (padrão: [arquivamento] pasta)")
+    parser.add_argument("--bucket", help="Bucket do Supabase Storage (padrão: [arquivamento] bucket)")
+    parser.add_argument("--simular", action="store_true", help="Só mostrar o que seria arquivado")
+    parser.add_argument("--particoes", action="store_true", help="Só criar as partições dos próximos meses")
+    args = parser.parse_args()
+
+    import database
+
+    config = database.get_config_arquivamento()
+    backend = database.get_backend()
+    if not backend:
+        raise SystemExit("Banco de dados indisponível")
+
+    if args.particoes:
+        backend.garantir_particoes()
+        print("Partições garantidas")
+        return
+
+    meses = args.meses if args.meses is not None else config["meses_ativos"]
+    pasta = args.pasta or config["pasta"]
+    bucket = args.bucket or config["bucket"]
+    try:
+        resultado = arquivar(backend, pasta, meses, simular=args.simular, bucket=bucket)
+    except ErroArquivamento as e:
+        raise SystemExit(str(e))
+    for item in resultado:
+        situacao = item["erro"] or item["arquivo"] or "simulação"
+        print(f"{item['mes']}: {item['registros']} registros -> {situacao}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Gerador determinístico de registros sintéticos para os benchmarks
+N motoboys x M dias x turnos (Manhã/Noite), com a mesma semente gerando
+sempre os mesmos dados
+"""
+import random
+from datetime import date, datetime, timedelta
+
+PRENOMES = [
+    "Ana", "Bruno", "Carlos", "Daniel", "Eduardo", "Fernanda", "Gabriel", "Helena",
+    "Igor", "João", "Karina", "Lucas", "Marcos", "Natália", "Otávio", "Paulo",
+    "Rafael", "Sérgio", "Tiago", "Vinícius",
+]
+SOBRENOMES = [
+    "Silva", "Souza", "Oliveira", "Santos", "Lima", "Pereira", "Costa", "Almeida",
+    "Ferreira", "Rodrigues", "Gomes", "Martins", "Araújo", "Barbosa", "Ribeiro",
+]
+
+
+def gerar_nomes(n_motoboys, semente=42):
+    """
+    Nomes únicos e realistas (com acentos) para n motoboys
+    """
+    rng = random.Random(semente)
+    nomes = []
+    vistos = set()
+    while len(nomes) < n_motoboys:
+        nome = f"{rng.choice(PRENOMES)} {rng.choice(SOBRENOMES)}"
+        if nome in vistos:
+            nome = f"{nome} {len(nomes)}"
+        vistos.add(nome)
+        nomes.append(nome)
+    return nomes
+
+
+def gerar_registros(n_motoboys, n_dias, semente=42, fim=None, proporcao_fixos=0.6, presenca=0.8):
+    """
+    Registros sintéticos terminando em `fim` (padrão: hoje)
+
+    Args:
+        n_motoboys: Quantidade de motoboys distintos
+        n_dias: Dias de histórico
+        semente: Semente do gerador (mesma semente, mesmos dados)
+        fim: Último dia gerado
+        proporcao_fixos: Fração de motoboys fixos (os demais são freelancers)
+        presenca: Probabilidade de um motoboy trabalhar em cada turno
+
+    Returns:
+        Lista de dicionários no formato da tabela registros
+    """
+    rng = random.Random(semente)
+    fim = fim or date.today()
+    inicio = fim - timedelta(days=n_dias - 1)
+    nomes = gerar_nomes(n_motoboys, semente)
+    tipos = {nome: "Fixo" if rng.random() < proporcao_fixos else "Freelancer" for nome in nomes}
+
+    registros = []
+    for d in range(n_dias):
+        dia = inicio + timedelta(days=d)
+        for periodo, hora in (("Manhã", 9), ("Noite", 19)):
+            for nome in nomes:
+                if rng.random() >= presenca:
+                    continue
+                registros.append({
+                    "nome": nome,
+                    "data": str(dia),
+                    "periodo": periodo,
+                    "tipo": tipos[nome],
+                    "entregas": max(0, int(rng.gauss(12, 5))),
+                    "created_at": datetime(dia.year, dia.month, dia.day, hora, rng.randint(0, 59)).isoformat(),
+                    "chave_idempotencia": f"sint-{semente}-{len(registros)}",
+                })
+    return registros
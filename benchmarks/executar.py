@@ -0,0 +1,262 @@
+"""
+Benchmarks da camada de dados e da folha com dados sintéticos
+Mede as funções do caminho quente em escalas crescentes e grava os
+resultados em JSON lines (um arquivo acumulado entre versões), para que
+regressões apareçam comparando execuções
+
+Uso (na raiz do projeto):
+    python -m benchmarks.executar
+    python -m benchmarks.executar --escalas 20x7,100x30,300x90 --backend sqlite
+    python -m benchmarks.executar --latencia 0.03 --comparar
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import plotly.express as px
+from streamlit import config as streamlit_config
+from streamlit import logger as streamlit_logger
+
+import database as db
+import folha
+import storage
+import utils
+from benchmarks.dados_sinteticos import gerar_registros
+from benchmarks.supabase_memoria import ClienteSupabaseMemoria
+
+CONFIG = {"valor_diaria": 150.0, "valor_corrida": 5.0}
+ESCALAS_PADRAO = "20x7,100x30,300x90"
+SAIDA_PADRAO = Path(__file__).with_name("resultados.jsonl")
+LIMITE_REGRESSAO = 1.2  # 20% mais lento que a versão anterior
+
+
+def versao_codigo():
+    """
+    Identificação da versão medida (git describe), para comparar execuções
+    """
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "desconhecida"
+
+
+def criar_backend(tipo, registros, latencia=0.0):
+    """
+    Backend populado com os registros sintéticos
+
+    Args:
+        tipo: "memoria" (SupabaseBackend sobre o cliente em memória) ou "sqlite"
+        latencia: Segundos simulados por ida ao banco (só "memoria")
+    """
+    if tipo == "sqlite":
+        backend = storage.SQLiteBackend(":memory:")
+    else:
+        backend = storage.SupabaseBackend(ClienteSupabaseMemoria())
+
+    backend.salvar_configuracao({**CONFIG, "ativa": True, "created_at": datetime.now().isoformat()})
+    for inicio in range(0, len(registros), 1000):
+        backend.inserir_registros_lote(registros[inicio:inicio + 1000])
+
+    if tipo != "sqlite":
+        backend.client.latencia = latencia
+    return backend
+
+
+def usar_backend(backend):
+    """
+    Aponta database.py para o backend do benchmark (sem secrets)
+    """
+    db.get_backend = lambda: backend
+
+
+def limpar_caches():
+    """
+    Cada medição parte do cache frio (pior caso de um rerun)
+    """
+    db.get_cache().limpar()
+    db.get_indice_nomes.clear()
+
+
+def montar_graficos(relatorio):
+    """
+    Mesma construção de DataFrame/Plotly de painel_indicadores
+    """
+    df_relatorio = pd.DataFrame(relatorio)
+    df_display = df_relatorio[['nome', 'tipo', 'dias_trabalhados', 'total_entregas', 'valor_devido']].copy()
+    df_display['valor_devido'] = df_display['valor_devido'].apply(utils.formatar_moeda)
+    fig_entregas = px.bar(df_relatorio, x='nome', y='total_entregas', color='tipo', title='Entregas/Semana')
+    df_fixos = df_relatorio[df_relatorio['valor_devido'] > 0]
+    fig_valores = px.bar(df_fixos, x='nome', y='valor_devido', title='Valores/Fixos')
+    return fig_entregas.to_dict(), fig_valores.to_dict()
+
+
+def casos(registros, hoje):
+    """
+    Funções medidas: nome -> (função, limpar caches antes)
+    """
+    inicio_semana = str(utils.get_inicio_semana(hoje))
+    semana = [r for r in registros if r["data"] >= inicio_semana]
+    nome = semana[0]["nome"] if semana else registros[0]["nome"]
+    do_motoboy = [r for r in semana if r["nome"] == nome]
+    relatorio = db.gerar_relatorio_semanal()
+
+    return {
+        "calcular_kpis_dia": (lambda: db.calcular_kpis_dia(hoje), True),
+        "gerar_relatorio_semanal": (db.gerar_relatorio_semanal, True),
+        "buscar_nomes_motoboys": (lambda: db.buscar_nomes_motoboys(nome[:2]), True),
+        "buscar_serie_tendencia (12 meses)": (
+            lambda: db.buscar_serie_tendencia(hoje - timedelta(days=364), hoje, "periodo"), True
+        ),
+        "calcular_valor_devido_motoboy": (
+            lambda: utils.calcular_valor_devido_motoboy(do_motoboy, **CONFIG), False
+        ),
+        "folha.calcular_folha (histórico)": (
+            lambda: folha.calcular_folha(registros, **CONFIG), False
+        ),
+        "dataframe_plotly": (lambda: montar_graficos(relatorio), False),
+    }
+
+
+def medir(funcao, limpar, repeticoes, cliente=None):
+    tempos = []
+    round_trips = 0
+    for _ in range(repeticoes):
+        if limpar:
+            limpar_caches()
+        antes = cliente.round_trips if cliente else 0
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        round_trips = (cliente.round_trips - antes) if cliente else None
+    return {
+        "ms_min": round(min(tempos), 3),
+        "ms_mediana": round(statistics.median(tempos), 3),
+        "ms_media": round(statistics.fmean(tempos), 3),
+        "round_trips": round_trips,
+    }
+
+
+def executar(escalas, tipo_backend, repeticoes, latencia, semente):
+    """
+    Returns:
+        Lista de resultados (um por escala x caso)
+    """
+    versao = versao_codigo()
+    hoje = date.today()
+    resultados = []
+    for escala in escalas:
+        motoboys, dias = (int(x) for x in escala.lower().split("x"))
+        registros = gerar_registros(motoboys, dias, semente=semente, fim=hoje)
+        backend = criar_backend(tipo_backend, registros, latencia)
+        usar_backend(backend)
+        cliente = getattr(backend, "client", None)
+
+        for caso, (funcao, limpar) in casos(registros, hoje).items():
+            medicao = medir(funcao, limpar, repeticoes, cliente)
+            resultado = {
+                "versao": versao,
+                "executado_em": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "backend": tipo_backend,
+                "latencia_ms": latencia * 1000 if tipo_backend != "sqlite" else 0,
+                "motoboys": motoboys,
+                "dias": dias,
+                "registros": len(registros),
+                "caso": caso,
+                "repeticoes": repeticoes,
+                **medicao,
+            }
+            resultados.append(resultado)
+            print(
+                f"{escala:>8} {caso:<36} mediana {medicao['ms_mediana']:>10.2f} ms"
+                + (f"  ({medicao['round_trips']} ida(s) ao banco)" if medicao["round_trips"] is not None else ""),
+                flush=True
+            )
+    return resultados
+
+
+def _chave(resultado):
+    return (
+        resultado["backend"], resultado.get("latencia_ms", 0),
+        resultado["motoboys"], resultado["dias"], resultado["caso"]
+    )
+
+
+def comparar(resultados, anteriores):
+    """
+    Compara com a execução mais recente de outra versão para cada medição
+
+    Returns:
+        Lista de mensagens de regressão (mais de 20% mais lento)
+    """
+    referencia = {}
+    for anterior in anteriores:
+        if anterior["versao"] != resultados[0]["versao"]:
+            referencia[_chave(anterior)] = anterior
+
+    regressoes = []
+    for resultado in resultados:
+        anterior = referencia.get(_chave(resultado))
+        if not anterior or not anterior["ms_mediana"]:
+            continue
+        razao = resultado["ms_mediana"] / anterior["ms_mediana"]
+        if razao > LIMITE_REGRESSAO:
+            regressoes.append(
+                f"{resultado['caso']} ({resultado['motoboys']}x{resultado['dias']}): "
+                f"{anterior['ms_mediana']:.2f} → {resultado['ms_mediana']:.2f} ms "
+                f"({razao:.1f}x, versão anterior {anterior['versao']})"
+            )
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks com dados sintéticos")
+    parser.add_argument("--escalas", default=ESCALAS_PADRAO, help="Motoboys x dias, separados por vírgula")
+    parser.add_argument("--backend", choices=["memoria", "sqlite"], default="memoria")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos por ida ao banco (memoria)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default=str(SAIDA_PADRAO), help="Arquivo JSON lines acumulado")
+    parser.add_argument("--comparar", action="store_true", help="Comparar com a versão anterior no arquivo")
+    args = parser.parse_args(argv)
+
+    # Fora do `streamlit run` o Streamlit avisa a cada chamada de cache/st.error
+    # (a configuração é lida antes, senão o nível é redefinido na primeira leitura)
+    streamlit_config.get_option("logger.level")
+    streamlit_logger.set_log_level("error")
+
+    saida = Path(args.saida)
+    anteriores = []
+    if args.comparar and saida.exists():
+        anteriores = [json.loads(l) for l in saida.read_text(encoding="utf-8").splitlines() if l.strip()]
+
+    resultados = executar(
+        args.escalas.split(","), args.backend, args.repeticoes, args.latencia, args.semente
+    )
+
+    with saida.open("a", encoding="utf-8") as arquivo:
+        for resultado in resultados:
+            arquivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    print(f"✅ {len(resultados)} resultados gravados em {saida}")
+
+    if args.comparar:
+        regressoes = comparar(resultados, anteriores)
+        for regressao in regressoes:
+            print(f"⚠️ Regressão: {regressao}")
+        if not regressoes:
+            print("✅ Nenhuma regressão acima de 20% em relação à versão anterior")
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,320 @@
+"""
+Substituto em memória do cliente supabase-py para os benchmarks
+Implementa só o que storage.SupabaseBackend usa: table() com os filtros
+select/eq/gte/lte/or_/order/limit, insert/upsert/update/delete e rpc() das
+funções relatorio_periodo, kpis_dia e serie_tendencia (mesma saída das
+funções SQL)
+
+`latencia` simula o tempo de ida e volta da rede a cada execute()
+"""
+import time
+from datetime import date, datetime, timedelta
+
+import utils
+
+
+class Resposta:
+    def __init__(self, data):
+        self.data = data
+
+
+def _valor(texto):
+    """
+    Converte o valor de um filtro PostgREST (texto) para comparação
+    """
+    if isinstance(texto, str) and texto.lstrip("-").isdigit():
+        return int(texto)
+    return texto
+
+
+def _comparar(valor, operador, alvo):
+    if valor is None:
+        return False
+    if isinstance(alvo, bool) or isinstance(valor, bool):
+        pass
+    elif isinstance(alvo, int):
+        valor = int(valor)
+    else:
+        # Datas e textos são comparados como texto ISO, como no PostgREST
+        valor, alvo = str(valor), str(alvo)
+    return {
+        "eq": lambda: valor == alvo,
+        "gt": lambda: valor > alvo,
+        "gte": lambda: valor >= alvo,
+        "lt": lambda: valor < alvo,
+        "lte": lambda: valor <= alvo,
+    }[operador]()
+
+
+def _separar(texto):
+    """
+    Divide por vírgulas de primeiro nível (ignora as que estão entre parênteses)
+    """
+    partes, nivel, atual = [], 0, ""
+    for c in texto:
+        if c == "," and nivel == 0:
+            partes.append(atual)
+            atual = ""
+            continue
+        nivel += (c == "(") - (c == ")")
+        atual += c
+    partes.append(atual)
+    return partes
+
+
+def _condicao_or(expressao):
+    """
+    Interpreta expressões de .or_() como "data.gt.X,and(data.eq.X,id.gt.Y)"
+    """
+    def condicao(texto):
+        if texto.startswith("and(") or texto.startswith("or("):
+            juncao = all if texto.startswith("and(") else any
+            filhos = [condicao(p) for p in _separar(texto[texto.index("(") + 1:-1])]
+            return lambda linha: juncao(f(linha) for f in filhos)
+        coluna, operador, alvo = texto.split(".", 2)
+        alvo = _valor(alvo)
+        return lambda linha: _comparar(linha.get(coluna), operador, alvo)
+
+    filhos = [condicao(p) for p in _separar(expressao)]
+    return lambda linha: any(f(linha) for f in filhos)
+
+
+class Consulta:
+    def __init__(self, cliente, tabela):
+        self.cliente = cliente
+        self.tabela = tabela
+        self.operacao = "select"
+        self.dados = None
+        self.filtros = []
+        self.ordem = []
+        self.limite = None
+        self.colunas = "*"
+        self.opcoes = {}
+
+    # Operações
+    def select(self, colunas="*"):
+        self.operacao, self.colunas = "select", colunas
+        return self
+
+    def insert(self, dados):
+        self.operacao, self.dados = "insert", dados
+        return self
+
+    def upsert(self, dados, on_conflict=None, ignore_duplicates=False):
+        self.operacao, self.dados = "upsert", dados
+        self.opcoes = {"on_conflict": on_conflict, "ignore_duplicates": ignore_duplicates}
+        return self
+
+    def update(self, dados):
+        self.operacao, self.dados = "update", dados
+        return self
+
+    def delete(self):
+        self.operacao = "delete"
+        return self
+
+    # Filtros
+    def _filtro(self, coluna, operador, alvo):
+        self.filtros.append(lambda linha: _comparar(linha.get(coluna), operador, alvo))
+        return self
+
+    def eq(self, coluna, alvo):
+        return self._filtro(coluna, "eq", alvo)
+
+    def gt(self, coluna, alvo):
+        return self._filtro(coluna, "gt", alvo)
+
+    def gte(self, coluna, alvo):
+        return self._filtro(coluna, "gte", alvo)
+
+    def lt(self, coluna, alvo):
+        return self._filtro(coluna, "lt", alvo)
+
+    def lte(self, coluna, alvo):
+        return self._filtro(coluna, "lte", alvo)
+
+    def or_(self, expressao):
+        self.filtros.append(_condicao_or(expressao))
+        return self
+
+    def order(self, coluna, desc=False):
+        self.ordem.append((coluna, desc))
+        return self
+
+    def limit(self, limite):
+        self.limite = limite
+        return self
+
+    def execute(self):
+        self.cliente.round_trips += 1
+        if self.cliente.latencia:
+            time.sleep(self.cliente.latencia)
+        return Resposta(getattr(self, f"_executar_{self.operacao}")())
+
+    def _selecionadas(self):
+        return [l for l in self.cliente.tabelas[self.tabela] if all(f(l) for f in self.filtros)]
+
+    def _executar_select(self):
+        linhas = self._selecionadas()
+        for coluna, desc in reversed(self.ordem):
+            linhas.sort(key=lambda l: (l.get(coluna) is None, l.get(coluna)), reverse=desc)
+        if self.limite is not None:
+            linhas = linhas[:self.limite]
+        if self.colunas != "*":
+            nomes = [c.strip() for c in self.colunas.split(",")]
+            return [{c: l.get(c) for c in nomes} for l in linhas]
+        return [dict(l) for l in linhas]
+
+    def _executar_insert(self):
+        linhas = self.dados if isinstance(self.dados, list) else [self.dados]
+        return [self.cliente.inserir(self.tabela, l) for l in linhas]
+
+    def _executar_upsert(self):
+        colunas = self.opcoes.get("on_conflict")
+        colunas = colunas.split(",") if colunas else []
+
+        def chave(linha):
+            return tuple(str(linha.get(c)) for c in colunas)
+
+        existentes = {chave(l) for l in self.cliente.tabelas[self.tabela]} if colunas else set()
+        inseridas = []
+        for linha in self.dados if isinstance(self.dados, list) else [self.dados]:
+            if colunas and chave(linha) in existentes:
+                continue
+            existentes.add(chave(linha))
+            inseridas.append(self.cliente.inserir(self.tabela, linha))
+        return inseridas
+
+    def _executar_update(self):
+        alteradas = []
+        for linha in self._selecionadas():
+            linha.update(self.dados)
+            self.cliente.apos_escrita(self.tabela, linha)
+            alteradas.append(dict(linha))
+        return alteradas
+
+    def _executar_delete(self):
+        removidas = self._selecionadas()
+        ids = {id(l) for l in removidas}
+        self.cliente.tabelas[self.tabela] = [l for l in self.cliente.tabelas[self.tabela] if id(l) not in ids]
+        return [dict(l) for l in removidas]
+
+
+class ClienteSupabaseMemoria:
+    """
+    Cliente com as tabelas registros, motoboys e configuracoes em listas
+    """
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.round_trips = 0
+        self.tabelas = {"registros": [], "motoboys": [], "configuracoes": []}
+        self._ids = {}
+        self._nomes = set()
+
+    def table(self, nome):
+        return Consulta(self, nome)
+
+    def inserir(self, tabela, dados):
+        linha = dict(dados)
+        self._ids[tabela] = self._ids.get(tabela, 0) + 1
+        linha.setdefault("id", self._ids[tabela])
+        linha.setdefault("created_at", datetime.now().isoformat())
+        self.tabelas[tabela].append(linha)
+        self.apos_escrita(tabela, linha)
+        return dict(linha)
+
+    def apos_escrita(self, tabela, linha):
+        # Equivalente ao trigger registrar_motoboy
+        if tabela == "registros" and linha["nome"] not in self._nomes:
+            self._nomes.add(linha["nome"])
+            self._ids["motoboys"] = self._ids.get("motoboys", 0) + 1
+            self.tabelas["motoboys"].append({"id": self._ids["motoboys"], "nome": linha["nome"]})
+
+    def rpc(self, funcao, parametros):
+        cliente = self
+
+        class Chamada:
+            def execute(self):
+                cliente.round_trips += 1
+                if cliente.latencia:
+                    time.sleep(cliente.latencia)
+                return Resposta(getattr(cliente, f"_rpc_{funcao}")(**parametros))
+        return Chamada()
+
+    def _rpc_relatorio_periodo(self, p_inicio, p_fim):
+        grupos = {}
+        for r in self.tabelas["registros"]:
+            if not p_inicio <= r["data"] <= p_fim:
+                continue
+            g = grupos.setdefault(r["nome"], {"datas": set(), "datas_fixo": set(), "entregas": 0, "entregas_fixo": 0, "fixos": 0, "total": 0})
+            g["datas"].add(r["data"])
+            g["entregas"] += r["entregas"]
+            g["total"] += 1
+            if r["tipo"] == "Fixo":
+                g["datas_fixo"].add(r["data"])
+                g["entregas_fixo"] += r["entregas"]
+                g["fixos"] += 1
+
+        return [
+            {
+                "nome": nome,
+                "tipo": "Fixo" if g["fixos"] == g["total"] else ("Freelancer" if not g["fixos"] else "Misto"),
+                "dias_trabalhados": len(g["datas"]),
+                "total_entregas": g["entregas"],
+                "dias_fixo": len(g["datas_fixo"]),
+                "entregas_fixo": g["entregas_fixo"],
+            }
+            for nome, g in sorted(grupos.items())
+        ]
+
+    def _rpc_kpis_dia(self, p_data):
+        do_dia = [r for r in self.tabelas["registros"] if r["data"] == p_data]
+        return [{
+            "total_entregas": sum(r["entregas"] for r in do_dia),
+            "total_motoboys": len({utils.normalizar_chave_nome(r["nome"]) for r in do_dia}),
+        }]
+
+    def _rpc_serie_tendencia(self, p_inicio, p_fim, p_granularidade, p_dimensao, p_limite_grupos):
+        def intervalo(dia):
+            d = date.fromisoformat(dia)
+            if p_granularidade == "semana":
+                d -= timedelta(days=d.weekday())
+            elif p_granularidade == "mes":
+                d = d.replace(day=1)
+            elif p_granularidade == "trimestre":
+                d = d.replace(month=(d.month - 1) // 3 * 3 + 1, day=1)
+            elif p_granularidade == "ano":
+                d = d.replace(month=1, day=1)
+            return str(d)
+
+        def grupo(r):
+            return {
+                "periodo": r["periodo"],
+                "motoboy": r["nome"],
+                "dia_semana": str(date.fromisoformat(r["data"]).isoweekday()),
+            }.get(p_dimensao, "Total")
+
+        do_periodo = [r for r in self.tabelas["registros"] if p_inicio <= r["data"] <= p_fim]
+        totais = {}
+        for r in do_periodo:
+            totais[grupo(r)] = totais.get(grupo(r), 0) + r["entregas"]
+        principais = sorted(totais, key=lambda g: (-totais[g], g))
+        if p_dimensao == "motoboy":
+            principais = principais[:p_limite_grupos]
+        principais = set(principais)
+
+        pontos = {}
+        for r in do_periodo:
+            if grupo(r) not in principais:
+                continue
+            p = pontos.setdefault((intervalo(r["data"]), grupo(r)), {"entregas": 0, "nomes": set(), "diarias": set(), "turnos": 0})
+            p["entregas"] += r["entregas"]
+            p["nomes"].add(r["nome"])
+            p["diarias"].add((r["data"], r["nome"]))
+            p["turnos"] += 1
+        return [
+            {"intervalo": i, "grupo": g, "entregas": p["entregas"], "motoboys": len(p["nomes"]),
+             "diarias": len(p["diarias"]), "turnos": p["turnos"]}
+            for (i, g), p in sorted(pontos.items())
+        ]
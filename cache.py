@@ -0,0 +1,210 @@
+"""
+Cache de consultas compartilhado entre sessões
+TTL configurável + contadores de versão por tag para invalidação seletiva
+"""
+import threading
+import time
+
+
+class CacheConsultas:
+    """
+    Cache read-through chaveado por (função, argumentos)
+
+    Cada entrada guarda a versão das tags das quais depende (ex.:
+    ("dia", "2026-01-05"), ("semana", "2026-01-05"), "config"). Uma escrita
+    chama invalidar() com as tags afetadas: a versão sobe e somente as
+    entradas que dependem delas deixam de valer. Quando não se sabe quais
+    tags foram afetadas, invalidar_grupos("dia") derruba todas as ("dia", …).
+    """
+
+    def __init__(self, ttl=60, max_entradas=2048, max_versoes=None):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        # Versões de tags que nenhuma entrada usa são podadas acima deste limite
+        self.max_versoes = max_versoes or max_entradas * 4
+        self._limite_versoes = self.max_versoes
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._versoes = {}
+        # Sobe a cada limpar() e poda das versões: cargas iniciadas antes não
+        # são armazenadas (a versão que capturaram pode ter sido descartada)
+        self._epoca = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+        self.correcoes = 0
+
+    def _valida(self, entrada, agora):
+        expira_em, versoes, _ = entrada
+        if expira_em <= agora:
+            return False
+        return all(self._versoes.get(tag, 0) == versao for tag, versao in versoes)
+
+    def obter(self, chave, carregar, tags=(), ttl=None):
+        """
+        Retorna o valor em cache ou executa `carregar()` e armazena o resultado
+
+        Exceções de `carregar` são propagadas e nada é armazenado.
+        O valor retornado é compartilhado: trate-o como somente leitura.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada and self._valida(entrada, agora):
+                self.acertos += 1
+                return entrada[2]
+            self.falhas += 1
+            versoes = tuple((tag, self._versoes.get(tag, 0)) for tag in self._com_grupos(tags))
+            epoca = self._epoca
+
+        valor = carregar()
+
+        with self._lock:
+            # Não armazenar se houve escrita nas tags (ou limpar()) durante a carga
+            if epoca == self._epoca and all(
+                self._versoes.get(tag, 0) == versao for tag, versao in versoes
+            ):
+                if len(self._entradas) >= self.max_entradas:
+                    self._remover_expiradas(agora)
+                    if len(self._entradas) >= self.max_entradas:
+                        self._entradas.pop(next(iter(self._entradas)))
+                validade = self.ttl if ttl is None else ttl
+                self._entradas[chave] = (agora + validade, versoes, valor)
+        return valor
+
+    @staticmethod
+    def _com_grupos(tags):
+        """
+        Tags mais a tag de grupo de cada tag composta (("dia", x) -> ("grupo", "dia"))
+        """
+        grupos = sorted({("grupo", tag[0]) for tag in tags if isinstance(tag, tuple)})
+        return tuple(tags) + tuple(grupos)
+
+    def invalidar_grupos(self, *grupos):
+        """
+        Invalida todas as tags de um ou mais grupos (inclusive as que ainda
+        estão sendo carregadas), ex.: invalidar_grupos("dia", "semana")
+        """
+        self.invalidar(*(("grupo", grupo) for grupo in grupos))
+
+    def invalidar(self, *tags):
+        """
+        Incrementa a versão das tags e remove as entradas que dependem delas
+        """
+        if not tags:
+            return
+        with self._lock:
+            for tag in tags:
+                self._versoes[tag] = self._versoes.get(tag, 0) + 1
+            self.invalidacoes += 1
+            afetadas = set(tags)
+            for chave in [
+                chave for chave, (_, versoes, _) in self._entradas.items()
+                if any(tag in afetadas for tag, _ in versoes)
+            ]:
+                del self._entradas[chave]
+            self._podar_versoes()
+
+    def espiar(self, chave):
+        """
+        Valor válido em cache sem carregar nem contar acerto/falha (None se ausente)
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada and self._valida(entrada, time.monotonic()):
+                return entrada[2]
+            return None
+
+    def corrigir(self, tags, corrigir):
+        """
+        Como invalidar(), mas tenta atualizar no lugar as entradas afetadas
+
+        `corrigir(chave, valor)` devolve o novo valor (sem alterar o antigo,
+        que pode estar em uso) ou None para descartar a entrada. As versões
+        das tags sobem mesmo assim: cargas em andamento não são armazenadas.
+        """
+        if not tags:
+            return
+        agora = time.monotonic()
+        with self._lock:
+            afetadas = set(tags)
+            dependentes = [
+                (chave, entrada) for chave, entrada in self._entradas.items()
+                if any(tag in afetadas for tag, _ in entrada[1])
+            ]
+            for tag in afetadas:
+                self._versoes[tag] = self._versoes.get(tag, 0) + 1
+            self.invalidacoes += 1
+
+            for chave, entrada in dependentes:
+                expira_em, versoes, valor = entrada
+                novo = None
+                # Entrada já vencida (por outra tag ou TTL) não é corrigida
+                if expira_em > agora and all(
+                    self._versoes.get(tag, 0) == versao
+                    for tag, versao in versoes if tag not in afetadas
+                ):
+                    try:
+                        novo = corrigir(chave, valor)
+                    except Exception:
+                        novo = None
+                if novo is None:
+                    del self._entradas[chave]
+                    continue
+                versoes = tuple((tag, self._versoes.get(tag, 0)) for tag, _ in versoes)
+                self._entradas[chave] = (expira_em, versoes, novo)
+                self.correcoes += 1
+            self._podar_versoes()
+
+    def _podar_versoes(self):
+        """
+        Descarta as versões das tags que nenhuma entrada usa quando passam de
+        max_versoes (uma por dia/semana já alterado, sem isto cresceriam sem
+        limite); a época sobe para que cargas em andamento não sejam armazenadas
+        """
+        if len(self._versoes) <= self._limite_versoes:
+            return
+        em_uso = {tag for _, versoes, _ in self._entradas.values() for tag, _ in versoes}
+        self._versoes = {tag: versao for tag, versao in self._versoes.items() if tag in em_uso}
+        self._epoca += 1
+        # Muitas tags ainda em uso: a próxima poda espera o dobro (custo amortizado)
+        self._limite_versoes = max(self.max_versoes, 2 * len(self._versoes))
+
+    def _remover_expiradas(self, agora):
+        for chave in [
+            chave for chave, entrada in self._entradas.items()
+            if not self._valida(entrada, agora)
+        ]:
+            del self._entradas[chave]
+
+    def limpar(self):
+        """
+        Descarta todas as entradas e as versões das tags (mantém os contadores)
+
+        Uma carga iniciada antes da limpeza poderia reencontrar a versão que
+        capturou e armazenar dados antigos: a época sobe e nenhuma delas é
+        armazenada.
+        """
+        with self._lock:
+            self._entradas.clear()
+            self._versoes.clear()
+            self._epoca += 1
+            self.invalidacoes += 1
+
+    def estatisticas(self):
+        """
+        Contadores de acertos/falhas para diagnóstico
+
+        Returns:
+            Dicionário com acertos, falhas, taxa_acerto, entradas, invalidacoes e correcoes
+        """
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": round(self.acertos / total, 4) if total else 0.0,
+                "entradas": len(self._entradas),
+                "invalidacoes": self.invalidacoes,
+                "correcoes": self.correcoes
+            }
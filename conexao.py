@@ -0,0 +1,324 @@
+"""
+Conexão gerenciada com o Supabase
+Um cliente por processo com pool de conexões keep-alive e timeouts, novas
+tentativas com espera exponencial para leituras, disjuntor (circuit breaker)
+e reconexão automática. Expõe o estado de saúde para a interface.
+
+ConexaoSupabase tem a mesma interface usada por storage.SupabaseBackend
+(table(...)...execute() e rpc(...).execute()), então o backend não muda.
+"""
+import random
+import threading
+import time
+from datetime import datetime
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+# Funções SQL sem efeitos colaterais (podem ser repetidas com segurança)
+FUNCOES_SOMENTE_LEITURA = {"relatorio_periodo", "kpis_dia", "serie_tendencia"}
+
+CONFIG_PADRAO = {
+    "timeout": 10.0,            # segundos por requisição
+    "timeout_conexao": 5.0,     # segundos para abrir a conexão
+    "tentativas": 3,            # tentativas por leitura
+    "espera": 0.25,             # espera inicial entre tentativas (dobra a cada uma)
+    "limite_falhas": 5,         # falhas seguidas que abrem o disjuntor
+    "pausa_circuito": 30.0,     # segundos com o disjuntor aberto
+    "conexoes": 10,             # máximo de conexões no pool
+    "conexoes_ociosas": 5,      # conexões keep-alive mantidas abertas
+    "keepalive": 30.0,          # segundos até fechar uma conexão ociosa
+}
+
+
+class ErroConexao(Exception):
+    """
+    Banco inacessível (rede, timeout ou disjuntor aberto)
+    """
+
+
+class CircuitoAberto(ErroConexao):
+    """
+    Disjuntor aberto: a requisição nem foi enviada
+    """
+
+
+def erro_transitorio(erro):
+    """
+    Falhas de rede/timeout (vale tentar de novo); erros de SQL ou de
+    validação devolvidos pelo PostgREST não são transitórios
+    """
+    try:
+        import httpx
+        if isinstance(erro, (httpx.TransportError, httpx.TimeoutException)):
+            return True
+        if isinstance(erro, httpx.HTTPStatusError):
+            return erro.response.status_code >= 500
+    except ImportError:
+        pass
+    return isinstance(erro, (ConnectionError, TimeoutError, ErroConexao))
+
+
+class Disjuntor:
+    """
+    Circuit breaker: após `limite_falhas` falhas seguidas, recusa requisições
+    por `pausa` segundos; depois deixa passar uma de teste (meio aberto)
+    """
+
+    def __init__(self, limite_falhas=5, pausa=30.0):
+        self.limite_falhas = limite_falhas
+        self.pausa = pausa
+        self.estado = FECHADO
+        self.falhas_seguidas = 0
+        self.aberto_em = None
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """
+        Returns:
+            True se a requisição pode ser enviada
+        """
+        with self._lock:
+            if self.estado == ABERTO and time.monotonic() - self.aberto_em >= self.pausa:
+                self.estado = MEIO_ABERTO
+                return True
+            return self.estado == FECHADO
+
+    def sucesso(self):
+        with self._lock:
+            self.estado = FECHADO
+            self.falhas_seguidas = 0
+            self.aberto_em = None
+
+    def falha(self):
+        with self._lock:
+            self.falhas_seguidas += 1
+            if self.estado == MEIO_ABERTO or self.falhas_seguidas >= self.limite_falhas:
+                self.estado = ABERTO
+                self.aberto_em = time.monotonic()
+
+    def liberar_teste(self):
+        """
+        Encerra a pausa: a próxima requisição é a de teste
+        """
+        with self._lock:
+            if self.estado == ABERTO:
+                self.aberto_em = time.monotonic() - self.pausa
+
+    def reabre_em(self):
+        """
+        Segundos até a próxima requisição de teste (0 se fechado)
+        """
+        with self._lock:
+            if self.estado != ABERTO:
+                return 0.0
+            return max(0.0, self.pausa - (time.monotonic() - self.aberto_em))
+
+
+class _Consulta:
+    """
+    Registra a cadeia de chamadas do construtor de consultas do supabase-py
+    para executá-la (e repeti-la em um cliente novo, após reconexão)
+    """
+
+    def __init__(self, conexao, inicio, somente_leitura):
+        self._conexao = conexao
+        self._passos = [inicio]
+        self._somente_leitura = somente_leitura
+
+    def __getattr__(self, nome):
+        def passo(*args, **kwargs):
+            self._passos.append((nome, args, kwargs))
+            if len(self._passos) == 2 and self._somente_leitura is None:
+                # A primeira operação após table() define se é leitura
+                self._somente_leitura = nome == "select"
+            return self
+        return passo
+
+    def _montar(self, cliente):
+        objeto = cliente
+        for nome, args, kwargs in self._passos:
+            objeto = getattr(objeto, nome)(*args, **kwargs)
+        return objeto
+
+    def execute(self):
+        return self._conexao.executar(
+            lambda cliente: self._montar(cliente).execute(),
+            repetir=bool(self._somente_leitura)
+        )
+
+
+class ConexaoSupabase:
+    """
+    Cliente Supabase gerenciado
+
+    Args:
+        criar_cliente: Função que recebe a configuração e devolve um cliente
+            supabase-py novo (chamada na primeira requisição e a cada reconexão)
+        config: Dicionário com as chaves de CONFIG_PADRAO
+    """
+
+    def __init__(self, criar_cliente, config=None):
+        self.criar_cliente = criar_cliente
+        self.config = {**CONFIG_PADRAO, **(config or {})}
+        self.disjuntor = Disjuntor(self.config["limite_falhas"], self.config["pausa_circuito"])
+        self._cliente = None
+        self._lock = threading.Lock()
+        self.requisicoes = 0
+        self.novas_tentativas = 0
+        self.reconexoes = 0
+        self.ultimo_erro = None
+        self.ultima_falha = None
+        self.ultimo_sucesso = None
+        self.ultima_latencia_ms = None
+
+    # Mesma interface do cliente supabase-py usada pelo backend
+    def table(self, nome):
+        return _Consulta(self, ("table", (nome,), {}), None)
+
+    def rpc(self, funcao, parametros=None):
+        return _Consulta(self, ("rpc", (funcao, parametros or {}), {}), funcao in FUNCOES_SOMENTE_LEITURA)
+
+    def cliente(self):
+        """
+        Cliente atual, criado na primeira chamada ou após uma reconexão
+        """
+        with self._lock:
+            if self._cliente is None:
+                self._cliente = self.criar_cliente(self.config)
+            return self._cliente
+
+    def reconectar(self):
+        """
+        Descarta o cliente atual (conexões presas ou sessão inválida)
+        """
+        # O cliente antigo não é fechado: outras threads podem estar usando;
+        # as conexões dele são liberadas quando ele sai de uso
+        with self._lock:
+            if self._cliente is not None:
+                self._cliente = None
+                self.reconexoes += 1
+
+    def executar(self, operacao, repetir=False):
+        """
+        Executa `operacao(cliente)` respeitando o disjuntor
+
+        Args:
+            operacao: Função que recebe o cliente supabase-py
+            repetir: Se True (leituras), tenta de novo falhas transitórias
+                com espera exponencial; escritas são enviadas uma vez só
+
+        Raises:
+            CircuitoAberto: Se o banco está fora e a pausa não terminou
+            A exceção original da última tentativa
+        """
+        if not self.disjuntor.permitir():
+            raise CircuitoAberto(
+                f"Banco indisponível; nova tentativa em {self.disjuntor.reabre_em():.0f}s "
+                f"(último erro: {self.ultimo_erro})"
+            )
+
+        tentativas = self.config["tentativas"] if repetir else 1
+        espera = self.config["espera"]
+        for tentativa in range(1, tentativas + 1):
+            self.requisicoes += 1
+            inicio = time.perf_counter()
+            try:
+                cliente = self.cliente()
+            except Exception as e:
+                # Configuração inválida ou biblioteca ausente: conta como banco fora
+                self.ultimo_erro = f"{type(e).__name__}: {e}"
+                self.ultima_falha = datetime.now().isoformat(timespec="seconds")
+                self.disjuntor.falha()
+                raise ErroConexao(f"Erro ao conectar com Supabase: {e}") from e
+            try:
+                resposta = operacao(cliente)
+            except Exception as e:
+                if not erro_transitorio(e):
+                    # O banco respondeu: a conexão está saudável
+                    self.disjuntor.sucesso()
+                    raise
+                self.ultimo_erro = f"{type(e).__name__}: {e}"
+                self.ultima_falha = datetime.now().isoformat(timespec="seconds")
+                self.reconectar()
+                if tentativa == tentativas:
+                    self.disjuntor.falha()
+                    raise
+                self.novas_tentativas += 1
+                # Jitter evita que vários terminais tentem ao mesmo tempo
+                time.sleep(espera * random.uniform(0.5, 1.5))
+                espera *= 2
+                continue
+
+            self.ultima_latencia_ms = round((time.perf_counter() - inicio) * 1000, 1)
+            self.ultimo_sucesso = datetime.now().isoformat(timespec="seconds")
+            self.disjuntor.sucesso()
+            return resposta
+
+    def verificar(self):
+        """
+        Verificação de saúde: uma leitura mínima, enviada mesmo com o
+        disjuntor aberto (se responder, o disjuntor fecha)
+
+        Returns:
+            True se o banco respondeu
+        """
+        self.disjuntor.liberar_teste()
+        try:
+            self.executar(
+                lambda cliente: cliente.table("configuracoes").select("id").limit(1).execute()
+            )
+            return True
+        except Exception:
+            return False
+
+    def saude(self):
+        """
+        Returns:
+            Dicionário com estado (fechado/aberto/meio_aberto), falhas_seguidas,
+            reabre_em, ultimo_erro, ultima_falha, ultimo_sucesso,
+            ultima_latencia_ms, requisicoes, novas_tentativas e reconexoes
+        """
+        return {
+            "estado": self.disjuntor.estado,
+            "falhas_seguidas": self.disjuntor.falhas_seguidas,
+            "reabre_em": round(self.disjuntor.reabre_em(), 1),
+            "ultimo_erro": self.ultimo_erro,
+            "ultima_falha": self.ultima_falha,
+            "ultimo_sucesso": self.ultimo_sucesso,
+            "ultima_latencia_ms": self.ultima_latencia_ms,
+            "requisicoes": self.requisicoes,
+            "novas_tentativas": self.novas_tentativas,
+            "reconexoes": self.reconexoes,
+        }
+
+
+def criar_cliente_supabase(url, key):
+    """
+    Fábrica de clientes supabase-py com pool keep-alive e timeouts
+
+    Returns:
+        Função para ConexaoSupabase(criar_cliente=...)
+    """
+    def criar(config):
+        from supabase import ClientOptions, create_client
+
+        timeout = config["timeout"]
+        try:
+            import httpx
+            cliente_http = httpx.Client(
+                timeout=httpx.Timeout(timeout, connect=config["timeout_conexao"]),
+                limits=httpx.Limits(
+                    max_connections=config["conexoes"],
+                    max_keepalive_connections=config["conexoes_ociosas"],
+                    keepalive_expiry=config["keepalive"],
+                ),
+                follow_redirects=True,
+            )
+            opcoes = ClientOptions(postgrest_client_timeout=timeout, httpx_client=cliente_http)
+        except TypeError:
+            # supabase-py sem httpx_client: pool padrão do postgrest, só os timeouts
+            opcoes = ClientOptions(postgrest_client_timeout=timeout)
+        return create_client(url, key, options=opcoes)
+    return criar
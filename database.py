@@ -2,31 +2,915 @@
 Gerenciamento de conexão e queries com Supabase
 Otimizado para Supabase-py 2.x e Streamlit Cloud 2026
 """
+import functools
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import streamlit as st
-from supabase import create_client, Client
 from datetime import datetime, timedelta
+import arquivamento
+import conexao
+import exportacao
+import fila_escrita
+import folha
+import instrumentacao
+import storage
+import tempo_real
 import utils
+from cache import CacheConsultas
+import indice_nomes
+
+
+def get_config_conexao():
+    """
+    Configuração opcional em secrets.toml (valores padrão em conexao.CONFIG_PADRAO):
+        [conexao]
+        timeout = 10             # segundos por requisição
+        timeout_conexao = 5      # segundos para abrir a conexão
+        tentativas = 3           # tentativas por leitura (espera exponencial)
+        espera = 0.25            # espera inicial entre tentativas
+        limite_falhas = 5        # falhas seguidas que abrem o disjuntor
+        pausa_circuito = 30      # segundos sem enviar requisições após abrir
+        conexoes = 10            # tamanho do pool keep-alive
+        conexoes_ociosas = 5
+        keepalive = 30
+
+    Returns:
+        Dicionário com as chaves de conexao.CONFIG_PADRAO
+    """
+    try:
+        config = st.secrets.get("conexao", {})
+        return {
+            chave: type(padrao)(config.get(chave, padrao))
+            for chave, padrao in conexao.CONFIG_PADRAO.items()
+        }
+    except Exception:
+        return dict(conexao.CONFIG_PADRAO)
 
 
 @st.cache_resource
+def get_conexao():
+    """
+    Conexão gerenciada com o Supabase (uma por processo)
+
+    O cliente é criado na primeira requisição e recriado após falhas de
+    rede; sem secrets, a exceção é propagada e nada fica em cache.
+
+    Returns:
+        conexao.ConexaoSupabase
+    """
+    return conexao.ConexaoSupabase(
+        conexao.criar_cliente_supabase(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"]),
+        get_config_conexao()
+    )
+
+
 def get_supabase_client():
     """
-    Cria e retorna cliente Supabase (cached para reutilização)
+    Retorna o cliente Supabase gerenciado (timeouts, novas tentativas,
+    disjuntor e reconexão)
 
     Returns:
-        Cliente Supabase configurado
+        conexao.ConexaoSupabase ou None se faltarem as credenciais
     """
     try:
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        return create_client(url, key)
+        return get_conexao()
     except Exception as e:
         st.error(f"Erro ao conectar com Supabase: {e}")
         return None
 
 
+def saude_conexao():
+    """
+    Estado da conexão com o banco para a interface
+
+    Returns:
+        Dicionário de ConexaoSupabase.saude() ou None (backend SQLite)
+    """
+    if get_tipo_backend() != "supabase":
+        return None
+    try:
+        return get_conexao().saude()
+    except Exception:
+        return None
+
+
+def verificar_conexao():
+    """
+    Testa o banco agora (mesmo com o disjuntor aberto)
+
+    Returns:
+        True se o banco respondeu
+    """
+    try:
+        return get_conexao().verificar()
+    except Exception:
+        return False
+
+
+def get_tipo_backend():
+    """
+    Retorna o backend configurado em [storage] backend nos secrets
+
+    Returns:
+        "supabase" (padrão) ou "sqlite"
+    """
+    try:
+        return st.secrets.get("storage", {}).get("backend", "supabase")
+    except Exception:
+        return "supabase"
+
+
+@st.cache_resource
+def _abrir_backend():
+    """
+    Cria o backend de armazenamento (propaga exceções: falhas não ficam em cache)
+    """
+    if get_tipo_backend() == "sqlite":
+        caminho = st.secrets.get("storage", {}).get("caminho", "motoboys.db")
+        return storage.SQLiteBackend(caminho)
+    return storage.SupabaseBackend(get_conexao())
+
+
+def get_backend():
+    """
+    Retorna o backend de armazenamento (cached para reutilização)
+
+    Configuração opcional em secrets.toml:
+        [storage]
+        backend = "sqlite"        # ou "supabase" (padrão)
+        caminho = "motoboys.db"   # arquivo do banco local
+
+    Returns:
+        Instância de storage.StorageBackend ou None em caso de falha
+        (tentada de novo na próxima chamada)
+    """
+    try:
+        return _abrir_backend()
+    except Exception as e:
+        st.error(f"Erro ao abrir backend de armazenamento: {e}")
+        return None
+
+
+@st.cache_resource(ttl=600)
+def get_indice_nomes():
+    """
+    Carrega o índice de nomes a partir da tabela motoboys (cached e
+    atualizado a cada inserção; recarregado a cada 10 minutos para
+    incluir nomes gravados por outras instâncias)
+
+    Returns:
+        IndiceNomes com os motoboys cadastrados
+    """
+    backend = get_backend()
+    if not backend:
+        raise RuntimeError("Backend de armazenamento indisponível")
+    return indice_nomes.IndiceNomes(backend.buscar_nomes_motoboys())
+
+
+@st.cache_resource(ttl=600)
+def get_nomes_mesclados():
+    """
+    Grafias unificadas por mesclar_motoboys, para os registros arquivados
+    (cached como o índice de nomes e limpo a cada unificação)
+
+    Returns:
+        Dicionário {grafia antiga: nome atual}
+    """
+    backend = get_backend()
+    if not backend:
+        raise RuntimeError("Backend de armazenamento indisponível")
+    return backend.buscar_nomes_mesclados()
+
+
+def _indexar_nome(nome):
+    """
+    Adiciona nome ao índice de autocomplete sem afetar a gravação
+    """
+    try:
+        get_indice_nomes().adicionar(nome)
+    except Exception:
+        pass
+
+
+def _nome_canonico(nome):
+    """
+    Nome normalizado; se o motoboy já está cadastrado com outra grafia
+    ("joao " para "João"), devolve a grafia cadastrada
+    """
+    nome = utils.normalizar_nome(nome)
+    try:
+        return get_indice_nomes().canonico(nome) or nome
+    except Exception:
+        return nome
+
+
+# ==================== ARQUIVAMENTO ====================
+
+def get_config_arquivamento():
+    """
+    Configuração opcional em secrets.toml:
+        [arquivamento]
+        bucket = "arquivo-registros"  # bucket do Supabase Storage (sem ele, só simulação)
+        pasta = "arquivo"             # cópia local dos arquivos Parquet
+        meses_ativos = 12             # meses completos mantidos no banco
+
+    Returns:
+        Dicionário com pasta, meses_ativos e bucket
+    """
+    try:
+        config = st.secrets.get("arquivamento", {})
+        return {
+            "pasta": config.get("pasta", arquivamento.CONFIG_PADRAO["pasta"]),
+            "meses_ativos": int(config.get("meses_ativos", arquivamento.CONFIG_PADRAO["meses_ativos"])),
+            "bucket": config.get("bucket", arquivamento.CONFIG_PADRAO["bucket"])
+        }
+    except Exception:
+        return dict(arquivamento.CONFIG_PADRAO)
+
+
+@st.cache_resource(ttl=300)
+def _sincronizar_arquivo(pasta, bucket):
+    """
+    Baixa os arquivos novos do bucket (cached: uma listagem a cada 5 minutos;
+    meses arquivados por outra máquina aparecem depois desse intervalo)
+    """
+    backend = get_backend()
+    if not backend:
+        raise RuntimeError("Backend de armazenamento indisponível")
+    return arquivamento.sincronizar(backend, bucket, pasta)
+
+
+def _pasta_arquivo():
+    """
+    Pasta local dos arquivos Parquet, já com os arquivos do bucket
+    (no Streamlit Cloud a pasta começa vazia a cada reinício)
+    """
+    config = get_config_arquivamento()
+    if config["bucket"]:
+        _sincronizar_arquivo(config["pasta"], config["bucket"])
+    return config["pasta"]
+
+
+def _periodo_arquivado(pasta, data_inicio, data_fim):
+    """
+    True se algum mês do período tem arquivo Parquet
+    """
+    inicio = arquivamento.inicio_mes(data_inicio)
+    fim = arquivamento.inicio_mes(data_fim)
+    return any(inicio <= mes <= fim for mes in arquivamento.meses_arquivados(pasta))
+
+
+def arquivar_registros_antigos(simular=False):
+    """
+    Arquiva em Parquet os meses anteriores a [arquivamento] meses_ativos
+
+    Sem [arquivamento] bucket só a simulação roda (arquivamento.ErroArquivamento)
+
+    Args:
+        simular: Se True, só conta o que seria arquivado
+
+    Returns:
+        Lista de arquivamento.arquivar (um item por mês) ou [] em caso de erro
+    """
+    try:
+        backend = get_backend()
+        if not backend:
+            return []
+
+        config = get_config_arquivamento()
+        resultado = arquivamento.arquivar(
+            backend, config["pasta"], config["meses_ativos"], simular=simular, bucket=config["bucket"]
+        )
+        if not simular and any(item["arquivo"] for item in resultado):
+            # Listas de registros em cache ainda apontam para as linhas removidas
+            get_cache().limpar()
+        return resultado
+    except Exception as e:
+        st.error(f"Erro ao arquivar registros: {e}")
+        return []
+
+
+# ==================== CACHE ====================
+
+@st.cache_resource
+def get_cache():
+    """
+    Cache de consultas compartilhado entre todas as sessões
+
+    Configuração opcional em secrets.toml:
+        [cache]
+        ttl = 60   # segundos
+
+    Returns:
+        Instância de CacheConsultas
+    """
+    try:
+        ttl = float(st.secrets.get("cache", {}).get("ttl", 60))
+    except Exception:
+        ttl = 60
+    return CacheConsultas(ttl=ttl)
+
+
+# ==================== TEMPO REAL ====================
+
+def get_config_tempo_real():
+    """
+    Configuração opcional em secrets.toml:
+        [tempo_real]
+        ativo = true     # padrão: true
+        intervalo = 2    # segundos entre verificações da lista do dia
+
+    Returns:
+        Dicionário com ativo e intervalo
+    """
+    try:
+        config = st.secrets.get("tempo_real", {})
+        return {
+            "ativo": bool(config.get("ativo", True)),
+            "intervalo": float(config.get("intervalo", 2))
+        }
+    except Exception:
+        return {"ativo": True, "intervalo": 2.0}
+
+
+@st.cache_resource
+def get_tempo_real():
+    """
+    Barramento de eventos e espelho da lista do dia (um por processo,
+    compartilhado por todas as sessões/terminais deste servidor)
+
+    Com o backend Supabase, também assina o Realtime para receber as
+    escritas de outros processos; mudanças remotas corrigem o cache.
+
+    Returns:
+        Dicionário com barramento, espelho e assinante (ou None)
+    """
+    barramento = tempo_real.Barramento()
+    espelho = tempo_real.EspelhoDia()
+    cache = get_cache()
+
+    def corrigir_cache(evento):
+        # Escritas deste processo já corrigiram o cache em database.py
+        if evento.get("origem") == "local":
+            return
+        # Eventos podem ter sido perdidos durante a reconexão; sem REPLICA
+        # IDENTITY FULL, uma exclusão remota não informa o dia afetado
+        registros = (evento.get("registro"), evento.get("anterior"))
+        if evento["tipo"] == tempo_real.RESSINCRONIZAR or not any(r and r.get("data") for r in registros):
+            cache.limpar()
+            return
+        _corrigir_caches(evento.get("anterior"), evento.get("registro"), cache, espelho)
+
+    # Antes do espelho: a correção lê o estado do dia anterior ao evento
+    barramento.assinar(corrigir_cache)
+    barramento.assinar(espelho.aplicar)
+
+    assinante = None
+    if get_tipo_backend() == "supabase":
+        try:
+            assinante = tempo_real.AssinanteSupabase(
+                st.secrets["supabase"]["url"],
+                st.secrets["supabase"]["key"],
+                barramento
+            )
+            assinante.iniciar()
+        except Exception as e:
+            st.warning(f"Tempo real indisponível, usando apenas eventos locais: {e}")
+            assinante = None
+
+    return {"barramento": barramento, "espelho": espelho, "assinante": assinante}
+
+
+def _publicar(tipo, registro=None, anterior=None):
+    """
+    Publica uma escrita deste processo no barramento de tempo real
+
+    RESSINCRONIZAR (escrita em muitas linhas, ex.: unificar motoboys) vai
+    sem linha e faz os assinantes recarregarem a lista do dia; os outros
+    processos recebem as linhas alteradas pelo Supabase Realtime.
+    """
+    if not get_config_tempo_real()["ativo"]:
+        return
+    hub = get_tempo_real()
+    if tipo == tempo_real.RESSINCRONIZAR or registro or anterior:
+        hub["barramento"].publicar(tempo_real.evento(tipo, registro, anterior))
+    else:
+        # Backend não devolveu a linha: recarregar a lista na próxima leitura
+        hub["espelho"].descartar()
+
+
+@instrumentacao.medir()
+def registros_dia_tempo_real(data):
+    """
+    Lista do dia servida do espelho em memória (atualizado por deltas)
+    Só consulta o banco na primeira leitura do dia ou após ressincronização
+
+    Args:
+        data: Data dos registros
+
+    Returns:
+        Lista de registros, mais recentes primeiro
+    """
+    if not get_config_tempo_real()["ativo"]:
+        return buscar_registros_dia(data)
+
+    try:
+        backend = get_backend()
+        if not backend:
+            return []
+
+        espelho = get_tempo_real()["espelho"]
+        if not espelho.carregado_para(data):
+            unidade = unidade_atual()
+            if unidade is not None:
+                unidade.contar(consultas=1, round_trips=1)
+            espelho.carregar(data, lambda: backend.buscar_registros_dia(data))
+        return espelho.registros()
+    except Exception as e:
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao buscar registros do dia: {e}")
+        return []
+
+
+# ==================== FILA DE GRAVAÇÃO ====================
+
+def get_config_fila_escrita():
+    """
+    Configuração opcional em secrets.toml:
+        [fila_escrita]
+        ativo = true                  # padrão: false
+        caminho = "fila_escrita.db"   # diário local dos registros pendentes
+        lote = 50                     # registros por envio
+        intervalo = 2                 # segundos entre verificações
+
+    Returns:
+        Dicionário com ativo, caminho, lote e intervalo
+    """
+    try:
+        config = st.secrets.get("fila_escrita", {})
+        return {
+            "ativo": bool(config.get("ativo", False)),
+            "caminho": config.get("caminho", "fila_escrita.db"),
+            "lote": int(config.get("lote", 50)),
+            "intervalo": float(config.get("intervalo", 2))
+        }
+    except Exception:
+        return {"ativo": False, "caminho": "fila_escrita.db", "lote": 50, "intervalo": 2.0}
+
+
+@st.cache_resource
+def get_fila_escrita():
+    """
+    Fila de gravação local com envio em segundo plano (um por processo)
+
+    Returns:
+        Instância de fila_escrita.FilaEscrita ou None se desativada/indisponível
+    """
+    config = get_config_fila_escrita()
+    if not config["ativo"]:
+        return None
+
+    try:
+        backend = get_backend()
+        if not backend:
+            return None
+
+        cache = get_cache()
+        espelho = get_tempo_real()["espelho"]
+
+        def ao_sincronizar(linhas):
+            # Roda na thread de envio: só objetos já resolvidos, sem st.*
+            tags = []
+            for linha in linhas:
+                tags.extend(_tags_data(linha["data"]))
+            cache.invalidar(*tags)
+            espelho.descartar()
+
+        return fila_escrita.FilaEscrita(
+            config["caminho"],
+            backend.inserir_registros_lote,
+            tamanho_lote=config["lote"],
+            intervalo=config["intervalo"],
+            ao_sincronizar=ao_sincronizar
+        ).iniciar()
+    except Exception as e:
+        st.error(f"Erro ao abrir fila de gravação: {e}")
+        return None
+
+
+def registros_pendentes_dia(data):
+    """
+    Registros aceitos localmente e ainda não enviados ao banco
+
+    Args:
+        data: Data dos registros
+
+    Returns:
+        Lista de registros pendentes (vazia sem fila de gravação)
+    """
+    fila = get_fila_escrita()
+    return fila.pendentes(data) if fila else []
+
+
+def status_fila_escrita(registros):
+    """
+    Situação de cada registro no diário da fila de gravação
+
+    Args:
+        registros: Linhas com chave_idempotencia (do banco ou da fila)
+
+    Returns:
+        Dicionário chave_idempotencia -> fila_escrita.PENDENTE ou SINCRONIZADO
+        (vazio sem fila; registros que não passaram pela fila ficam de fora)
+    """
+    fila = get_fila_escrita()
+    if not fila:
+        return {}
+    return fila.status([registro.get("chave_idempotencia") for registro in registros])
+
+
+def estado_fila_escrita():
+    """
+    Returns:
+        Resumo da fila (pendentes, sincronizados, ultimo_erro, ultimo_envio) ou None
+    """
+    fila = get_fila_escrita()
+    return fila.resumo() if fila else None
+
+
+# ==================== UNIDADE DE TRABALHO (POR RERUN) ====================
+
+_contexto = threading.local()
+
+
+class UnidadeDeTrabalho:
+    """
+    Consultas feitas durante um rerun do Streamlit
+
+    Guarda o resultado de cada consulta para que chamadas idênticas no
+    mesmo rerun (ex.: buscar_configuracao_ativa dentro de KPIs e relatório)
+    não voltem ao cache nem ao banco, e conta as idas ao banco.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.resultados = {}
+        self.periodos = []
+        self.consultas = 0
+        self.reaproveitadas = 0
+        self.round_trips = 0
+
+    def contar(self, consultas=0, reaproveitadas=0, round_trips=0):
+        """
+        Incrementa os contadores (seguro para as threads do carregador paralelo)
+        """
+        with self._lock:
+            self.consultas += consultas
+            self.reaproveitadas += reaproveitadas
+            self.round_trips += round_trips
+
+    def limpar(self):
+        self.resultados.clear()
+        self.periodos.clear()
+
+    def registros_do_dia(self, data):
+        """
+        Responde a consulta de um dia a partir de um período já carregado
+
+        Returns:
+            Lista de registros do dia (mais recentes primeiro) ou None
+        """
+        data = str(data)
+        for inicio, fim, registros in self.periodos:
+            if inicio <= data <= fim:
+                do_dia = [r for r in registros if str(r.get("data")) == data]
+                do_dia.sort(key=lambda r: r.get("created_at") or "", reverse=True)
+                return do_dia
+        return None
+
+    def resumo(self):
+        return {
+            "consultas": self.consultas,
+            "reaproveitadas": self.reaproveitadas,
+            "round_trips": self.round_trips
+        }
+
+
+@contextmanager
+def unidade_de_trabalho():
+    """
+    Abre a unidade de trabalho do rerun atual (reaproveita a já aberta)
+
+    Uso:
+        with db.unidade_de_trabalho() as unidade:
+            ...
+        unidade.round_trips
+    """
+    atual = getattr(_contexto, "unidade", None)
+    if atual is not None:
+        yield atual
+        return
+
+    unidade = UnidadeDeTrabalho()
+    _contexto.unidade = unidade
+    try:
+        with instrumentacao.rerun():
+            yield unidade
+    finally:
+        _contexto.unidade = None
+        _contexto.ultima = unidade
+
+
+def por_rerun(funcao):
+    """
+    Decorator: executa a função (ex.: um fragmento) dentro de uma unidade de trabalho
+    """
+    @functools.wraps(funcao)
+    def executar(*args, **kwargs):
+        with unidade_de_trabalho():
+            return funcao(*args, **kwargs)
+    return executar
+
+
+def unidade_atual():
+    """
+    Unidade de trabalho ativa nesta thread (None fora de um rerun)
+    """
+    return getattr(_contexto, "unidade", None)
+
+
+def estatisticas_rerun():
+    """
+    Consultas e round-trips do rerun em andamento (ou do último concluído)
+
+    Returns:
+        Dicionário com consultas, reaproveitadas e round_trips
+    """
+    unidade = unidade_atual() or getattr(_contexto, "ultima", None)
+    return unidade.resumo() if unidade else {"consultas": 0, "reaproveitadas": 0, "round_trips": 0}
+
+
+def _consultar(chave, carregar, tags=(), unidade=None, cache=None):
+    """
+    Executa uma leitura passando pela unidade de trabalho e pelo cache (read-through)
+
+    Args:
+        unidade: Unidade de trabalho a usar (padrão: a da thread atual;
+            informada explicitamente pelas threads do carregador paralelo)
+        cache: CacheConsultas a usar (padrão: get_cache(); as threads do
+            carregador paralelo recebem o da thread do script, pois não têm
+            ScriptRunContext para os getters de st.cache_resource)
+    """
+    unidade = unidade or unidade_atual()
+    cache = cache or get_cache()
+    if unidade is None:
+        return cache.obter(chave, carregar, tags)
+
+    if chave in unidade.resultados:
+        unidade.contar(consultas=1, reaproveitadas=1)
+        return unidade.resultados[chave]
+    unidade.contar(consultas=1)
+
+    def carregar_contando():
+        unidade.contar(round_trips=1)
+        return carregar()
+
+    valor = cache.obter(chave, carregar_contando, tags)
+    unidade.resultados[chave] = valor
+    return valor
+
+
+def _tags_data(data):
+    """
+    Tags afetadas por uma escrita em `data`: o dia e a semana dele
+    """
+    data = utils.para_data(data)
+    return [("dia", str(data)), ("semana", str(utils.get_inicio_semana(data)))]
+
+
+def _tags_periodo(data_inicio, data_fim):
+    """
+    Tags das semanas cobertas por um intervalo de datas
+    """
+    semana = utils.get_inicio_semana(data_inicio)
+    fim = utils.para_data(data_fim)
+    tags = []
+    while semana <= fim:
+        tags.append(("semana", str(semana)))
+        semana += timedelta(days=7)
+    return tags
+
+
+def _invalidar_registro(*registros):
+    """
+    Invalida dia e semana de cada registro alterado
+    """
+    tags = []
+    for registro in registros:
+        if registro and registro.get("data"):
+            tags.extend(_tags_data(registro["data"]))
+    get_cache().invalidar(*tags)
+
+    unidade = unidade_atual()
+    if unidade is not None:
+        unidade.limpar()
+
+
+# ==================== ATUALIZAÇÃO OTIMISTA DO CACHE ====================
+# Uma escrita corrige no lugar as consultas em cache (lista do dia, período,
+# KPIs e relatório) a partir da linha devolvida pelo banco; o que não puder
+# ser derivado com segurança é descartado e volta a ser consultado
+
+def _registros_dia_em_memoria(data, cache, espelho=None):
+    """
+    Lista completa de um dia já em memória (cache ou espelho de tempo real), ou None
+    """
+    registros = cache.espiar(("registros_dia", str(data)))
+    if registros is None and espelho is not None and espelho.carregado_para(data):
+        registros = espelho.registros()
+    return registros
+
+
+def _aplicar_na_lista(linhas, anterior, novo, pertence, ordem, decrescente=False):
+    """
+    Nova lista com `anterior` removido e `novo` incluído (se pertencer a ela)
+
+    Returns:
+        Lista ordenada ou None se a linha nova não tem id
+    """
+    if novo is not None and novo.get("id") is None:
+        return None
+    ids = {r.get("id") for r in (anterior, novo) if r}
+    resultado = [r for r in linhas if r.get("id") not in ids]
+    if novo is not None and pertence(novo):
+        resultado.append(dict(novo))
+        resultado.sort(key=ordem, reverse=decrescente)
+    return resultado
+
+
+def _ordem_dia(registro):
+    return str(registro.get("created_at") or "")
+
+
+def _ordem_periodo(registro):
+    return (str(registro.get("data")), registro.get("id") or 0)
+
+
+def _resumo_por_motoboy(linhas):
+    """
+    Entregas, entregas Fixo e tipos de cada motoboy em uma lista de registros de um dia
+    """
+    resumo = {}
+    for registro in linhas:
+        item = resumo.setdefault(registro["nome"], {"entregas": 0, "entregas_fixo": 0, "tipos": set()})
+        entregas = int(registro.get("entregas") or 0)
+        item["entregas"] += entregas
+        if registro.get("tipo") == "Fixo":
+            item["entregas_fixo"] += entregas
+        item["tipos"].add(registro.get("tipo"))
+    return resumo
+
+
+TIPOS_POR_CLASSIFICACAO = {"Fixo": {"Fixo"}, "Freelancer": {"Freelancer"}, "Misto": {"Fixo", "Freelancer"}}
+
+
+def _classificar(tipos):
+    return "Misto" if len(tipos) > 1 else next(iter(tipos))
+
+
+def _corrigir_relatorio(linhas, data_inicio, data_fim, dias):
+    """
+    Aplica a diferença antes/depois de cada dia alterado às linhas de relatorio_periodo
+
+    Returns:
+        Novas linhas ou None quando o tipo (Fixo/Freelancer/Misto) não pode ser derivado
+    """
+    por_nome = {linha["nome"]: dict(linha) for linha in linhas}
+    for dia, (antes, depois) in dias.items():
+        if not data_inicio <= dia <= data_fim:
+            continue
+        if antes is None:
+            return None
+        resumo_antes, resumo_depois = _resumo_por_motoboy(antes), _resumo_por_motoboy(depois)
+
+        for nome in set(resumo_antes) | set(resumo_depois):
+            a, d = resumo_antes.get(nome), resumo_depois.get(nome)
+            if a == d:
+                continue
+            linha = por_nome.get(nome)
+            if linha is None:
+                if a is not None:
+                    return None
+                linha = {"nome": nome, "tipo": None, "dias_trabalhados": 0, "total_entregas": 0,
+                         "dias_fixo": 0, "entregas_fixo": 0}
+
+            tipos_antes = a["tipos"] if a else set()
+            tipos_depois = d["tipos"] if d else set()
+            linha = {
+                **linha,
+                "dias_trabalhados": int(linha["dias_trabalhados"]) + bool(d) - bool(a),
+                "total_entregas": int(linha["total_entregas"])
+                + (d["entregas"] if d else 0) - (a["entregas"] if a else 0),
+                "dias_fixo": int(linha["dias_fixo"]) + ("Fixo" in tipos_depois) - ("Fixo" in tipos_antes),
+                "entregas_fixo": int(linha["entregas_fixo"])
+                + (d["entregas_fixo"] if d else 0) - (a["entregas_fixo"] if a else 0),
+            }
+            if linha["dias_trabalhados"] <= 0:
+                por_nome.pop(nome, None)
+                continue
+
+            if d and linha["dias_trabalhados"] == 1:
+                # Todos os registros do motoboy no período estão neste dia
+                linha["tipo"] = _classificar(tipos_depois)
+            elif tipos_antes <= tipos_depois:
+                linha["tipo"] = _classificar(TIPOS_POR_CLASSIFICACAO.get(linha["tipo"], set()) | tipos_depois)
+            elif linha["tipo"] in ("Fixo", "Freelancer") and tipos_depois <= {linha["tipo"]}:
+                pass
+            else:
+                # Misto que perdeu registros de um tipo: depende dos outros dias
+                return None
+            por_nome[nome] = linha
+
+    return sorted(por_nome.values(), key=lambda linha: linha["nome"])
+
+
+def _corrigir_consulta(chave, valor, anterior, novo, dias):
+    """
+    Nova versão de uma consulta em cache após a escrita (None: descartar)
+    """
+    consulta = chave[0]
+    if consulta == "registros_dia":
+        return _aplicar_na_lista(
+            valor, anterior, novo, lambda r: str(r.get("data")) == chave[1], _ordem_dia, decrescente=True
+        )
+    if consulta == "registros_periodo":
+        return _aplicar_na_lista(
+            valor, anterior, novo, lambda r: chave[1] <= str(r.get("data")) <= chave[2], _ordem_periodo
+        )
+    if consulta == "kpis_dia":
+        if chave[1] not in dias:
+            return valor
+        antes, depois = dias[chave[1]]
+        if antes is None:
+            return None
+        return {
+            **(valor or {}),
+            "total_entregas": sum(int(r.get("entregas") or 0) for r in depois),
+            "total_motoboys": len({utils.normalizar_chave_nome(r["nome"]) for r in depois}),
+        }
+    if consulta == "relatorio_periodo":
+        return _corrigir_relatorio(valor, chave[1], chave[2], dias)
+    return None
+
+
+def _corrigir_caches(anterior=None, novo=None, cache=None, espelho=None):
+    """
+    Atualiza as consultas em cache com a linha alterada, sem ir ao banco
+
+    Deve ser chamada antes de o evento chegar ao espelho de tempo real: o
+    estado "antes" de cada dia vem do cache ou do espelho.
+
+    Args:
+        anterior: Linha antes da escrita (UPDATE/DELETE)
+        novo: Linha devolvida pelo banco (INSERT/UPDATE)
+    """
+    cache = cache or get_cache()
+    if espelho is None and get_config_tempo_real()["ativo"]:
+        espelho = get_tempo_real()["espelho"]
+
+    datas = sorted({str(r["data"]) for r in (anterior, novo) if r and r.get("data")})
+    dias = {}
+    tags = []
+    for data in datas:
+        antes = _registros_dia_em_memoria(data, cache, espelho)
+        depois = None
+        if antes is not None:
+            depois = _aplicar_na_lista(antes, anterior, novo, lambda r: str(r.get("data")) == data, _ordem_dia, True)
+        dias[data] = (antes, depois) if depois is not None else (None, None)
+        tags.extend(_tags_data(data))
+
+    cache.corrigir(tags, lambda chave, valor: _corrigir_consulta(chave, valor, anterior, novo, dias))
+
+    unidade = unidade_atual()
+    if unidade is not None:
+        unidade.limpar()
+
+
+def estatisticas_cache():
+    """
+    Contadores de acertos e falhas do cache de consultas
+
+    Returns:
+        Dicionário com acertos, falhas, taxa_acerto, entradas e invalidacoes
+    """
+    return get_cache().estatisticas()
+
+
 # ==================== REGISTROS ====================
 
+@instrumentacao.medir()
 def inserir_registro(nome, data, periodo, tipo, entregas):
     """
     Insere novo registro de motoboy
@@ -39,13 +923,15 @@ def inserir_registro(nome, data, periodo, tipo, entregas):
         entregas: Número de entregas
 
     Returns:
-        True se sucesso, False caso contrário
+        Registro gravado (com id e created_at do banco; na fila de gravação,
+        com a chave de idempotência) ou False em caso de erro
     """
     try:
-        supabase = get_supabase_client()
-        if not supabase:
+        backend = get_backend()
+        if not backend:
             return False
 
+        nome = _nome_canonico(nome)
         data_obj = {
             "nome": nome,
             "data": str(data),
@@ -55,13 +941,28 @@ def inserir_registro(nome, data, periodo, tipo, entregas):
             "created_at": datetime.now().isoformat()
         }
 
-        response = supabase.table("registros").insert(data_obj).execute()
-        return True
+        # Com a fila de gravação, o registro é aceito localmente e enviado em segundo plano
+        fila = get_fila_escrita()
+        if fila is not None:
+            chave = fila.enfileirar(data_obj)
+            _indexar_nome(nome)
+            return {**data_obj, "chave_idempotencia": chave}
+
+        inserido = backend.inserir_registro(data_obj)
+        if inserido:
+            _corrigir_caches(novo=inserido)
+        else:
+            _invalidar_registro(data_obj)
+        _indexar_nome(nome)
+        _publicar(tempo_real.INSERT, inserido)
+        return inserido or data_obj
     except Exception as e:
+        instrumentacao.registrar_erro()
         st.error(f"Erro ao inserir registro: {e}")
         return False
 
 
+@instrumentacao.medir()
 def buscar_registros_dia(data):
     """
     Busca todos os registros de uma data específica
@@ -73,22 +974,30 @@ def buscar_registros_dia(data):
         Lista de registros
     """
     try:
-        supabase = get_supabase_client()
-        if not supabase:
+        backend = get_backend()
+        if not backend:
             return []
 
-        response = supabase.table("registros")\
-            .select("*")\
-            .eq("data", str(data))\
-            .order("created_at", desc=True)\
-            .execute()
-
-        return response.data if response.data else []
+        # Dia contido em um período já carregado neste rerun: sem nova consulta
+        unidade = unidade_atual()
+        if unidade is not None:
+            do_dia = unidade.registros_do_dia(data)
+            if do_dia is not None:
+                unidade.contar(consultas=1, reaproveitadas=1)
+                return do_dia
+
+        return _consultar(
+            ("registros_dia", str(data)),
+            lambda: backend.buscar_registros_dia(data),
+            _tags_data(data)[:1]
+        )
     except Exception as e:
+        instrumentacao.registrar_erro()
         st.error(f"Erro ao buscar registros do dia: {e}")
         return []
 
 
+@instrumentacao.medir()
 def buscar_registros_semana(data_inicio, data_fim):
     """
     Busca registros entre duas datas (semana)
@@ -101,23 +1010,96 @@ def buscar_registros_semana(data_inicio, data_fim):
         Lista de registros
     """
     try:
-        supabase = get_supabase_client()
-        if not supabase:
+        backend = get_backend()
+        if not backend:
             return []
 
-        response = supabase.table("registros")\
-            .select("*")\
-            .gte("data", str(data_inicio))\
-            .lte("data", str(data_fim))\
-            .order("data", desc=False)\
-            .execute()
+        # Paginado para não ser truncado pelo limite de linhas do PostgREST
+        registros = _consultar(
+            ("registros_periodo", str(data_inicio), str(data_fim)),
+            lambda: list(_paginar_registros(backend, data_inicio, data_fim)),
+            _tags_periodo(data_inicio, data_fim)
+        )
 
-        return response.data if response.data else []
+        unidade = unidade_atual()
+        if unidade is not None:
+            unidade.periodos.append((str(data_inicio), str(data_fim), registros))
+        return registros
     except Exception as e:
+        instrumentacao.registrar_erro()
         st.error(f"Erro ao buscar registros da semana: {e}")
         return []
 
 
+TAMANHO_PAGINA = 1000
+
+
+def _paginar_registros(backend, data_inicio, data_fim, tamanho_pagina=TAMANHO_PAGINA):
+    """
+    Percorre os registros do período com paginação por chave (data, id)
+    Cada página continua após o último (data, id) lido: sem OFFSET e sem truncamento
+
+    Meses já arquivados em Parquet entram na mesma ordem (arquivamento.py),
+    com o nome atual dos motoboys unificados depois do arquivamento
+    """
+    do_banco = _paginar_banco(backend, data_inicio, data_fim, tamanho_pagina)
+    pasta = _pasta_arquivo()
+    if not _periodo_arquivado(pasta, data_inicio, data_fim):
+        yield from do_banco
+        return
+    # Lançamentos retroativos em um mês arquivado ficam no banco até a
+    # próxima execução: intercalar em vez de concatenar. Uma linha no arquivo
+    # e no banco (arquivamento interrompido antes da remoção) sai uma vez só
+    anterior = None
+    for linha in heapq.merge(
+        arquivamento.ler_registros(pasta, data_inicio, data_fim, get_nomes_mesclados()),
+        do_banco,
+        key=arquivamento.ordem
+    ):
+        if arquivamento.ordem(linha) != anterior:
+            anterior = arquivamento.ordem(linha)
+            yield linha
+
+
+def _paginar_banco(backend, data_inicio, data_fim, tamanho_pagina=TAMANHO_PAGINA):
+    apos = None
+    unidade = unidade_atual()
+    while True:
+        pagina = backend.buscar_pagina_registros(data_inicio, data_fim, apos, tamanho_pagina)
+        if unidade is not None:
+            unidade.contar(round_trips=1)
+        yield from pagina
+        if len(pagina) < tamanho_pagina:
+            return
+        apos = (pagina[-1]["data"], pagina[-1]["id"])
+
+
+@instrumentacao.medir()
+def iterar_registros(data_inicio, data_fim, tamanho_pagina=TAMANHO_PAGINA):
+    """
+    Gerador com todos os registros de um período (mês, trimestre, datas livres)
+    Memória limitada a uma página por vez, independente do tamanho do período
+
+    Args:
+        data_inicio: Data de início
+        data_fim: Data de fim
+        tamanho_pagina: Registros por ida ao banco
+
+    Yields:
+        Registros ordenados por data e id
+    """
+    try:
+        backend = get_backend()
+        if not backend:
+            return
+
+        yield from _paginar_registros(backend, data_inicio, data_fim, tamanho_pagina)
+    except Exception as e:
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao buscar registros do período: {e}")
+
+
+@instrumentacao.medir()
 def atualizar_registro(registro_id, nome, data, periodo, tipo, entregas):
     """
     Atualiza registro existente
@@ -131,13 +1113,14 @@ def atualizar_registro(registro_id, nome, data, periodo, tipo, entregas):
         entregas: Número de entregas
 
     Returns:
-        True se sucesso, False caso contrário
+        Registro como ficou no banco ou False em caso de erro
     """
     try:
-        supabase = get_supabase_client()
-        if not supabase:
+        backend = get_backend()
+        if not backend:
             return False
 
+        nome = _nome_canonico(nome)
         data_obj = {
             "nome": nome,
             "data": str(data),
@@ -146,17 +1129,23 @@ def atualizar_registro(registro_id, nome, data, periodo, tipo, entregas):
             "entregas": entregas
         }
 
-        response = supabase.table("registros")\
-            .update(data_obj)\
-            .eq("id", registro_id)\
-            .execute()
-
-        return True
+        # O registro anterior informa o dia/semana que também precisam ser corrigidos
+        anterior = backend.buscar_registro(registro_id)
+        atualizado = backend.atualizar_registro(registro_id, data_obj)
+        if anterior and atualizado:
+            _corrigir_caches(anterior, atualizado)
+        else:
+            _invalidar_registro(anterior, data_obj)
+        _indexar_nome(nome)
+        _publicar(tempo_real.UPDATE, atualizado, anterior)
+        return atualizado or {**data_obj, "id": registro_id}
     except Exception as e:
+        instrumentacao.registrar_erro()
         st.error(f"Erro ao atualizar registro: {e}")
         return False
 
 
+@instrumentacao.medir()
 def excluir_registro(registro_id):
     """
     Exclui registro
@@ -165,26 +1154,63 @@ def excluir_registro(registro_id):
         registro_id: ID do registro
 
     Returns:
-        True se sucesso, False caso contrário
+        Registro excluído ou False em caso de erro ou se nada foi excluído
+        (registro já excluído por outro servidor)
     """
     try:
-        supabase = get_supabase_client()
-        if not supabase:
+        backend = get_backend()
+        if not backend:
             return False
 
-        response = supabase.table("registros")\
-            .delete()\
-            .eq("id", registro_id)\
-            .execute()
-
-        return True
+        # Lido antes: se outro servidor já excluiu, a linha ainda diz qual
+        # dia/semana corrigir no cache deste processo
+        anterior = backend.buscar_registro(registro_id)
+        excluido = backend.excluir_registro(registro_id)
+        linha = excluido or anterior
+        if linha:
+            _corrigir_caches(anterior=linha)
+        else:
+            # Sem a linha não há como saber o dia: descarta todas as leituras de registros
+            get_cache().invalidar_grupos("dia", "semana")
+            unidade = unidade_atual()
+            if unidade is not None:
+                unidade.limpar()
+        _publicar(tempo_real.DELETE, anterior=linha)
+        return excluido or False
     except Exception as e:
+        instrumentacao.registrar_erro()
         st.error(f"Erro ao excluir registro: {e}")
         return False
 
 
 # ==================== CONFIGURAÇÕES ====================
 
+CONFIG_PADRAO = {"valor_diaria": 0.0, "valor_corrida": 0.0}
+
+
+def _carregar_configuracao(backend, unidade=None, cache=None):
+    """
+    Lê a configuração ativa (propaga exceções)
+    """
+    config = _consultar(
+        ("configuracao_ativa",),
+        backend.buscar_configuracao_ativa,
+        ["config"],
+        unidade,
+        cache
+    )
+
+    if config:
+        return {
+            "id": config.get("id"),
+            "valor_diaria": config.get("valor_diaria", 0.0),
+            "valor_corrida": config.get("valor_corrida", 0.0)
+        }
+    # Retornar valores padrão se não houver configuração
+    return dict(CONFIG_PADRAO)
+
+
+@instrumentacao.medir()
 def buscar_configuracao_ativa():
     """
     Busca a configuração ativa mais recente
@@ -193,32 +1219,18 @@ def buscar_configuracao_ativa():
         Dicionário com valor_diaria e valor_corrida
     """
     try:
-        supabase = get_supabase_client()
-        if not supabase:
-            return {"valor_diaria": 0.0, "valor_corrida": 0.0}
-
-        response = supabase.table("configuracoes")\
-            .select("*")\
-            .eq("ativa", True)\
-            .order("created_at", desc=True)\
-            .limit(1)\
-            .execute()
+        backend = get_backend()
+        if not backend:
+            return dict(CONFIG_PADRAO)
 
-        if response.data and len(response.data) > 0:
-            config = response.data[0]
-            return {
-                "id": config.get("id"),
-                "valor_diaria": config.get("valor_diaria", 0.0),
-                "valor_corrida": config.get("valor_corrida", 0.0)
-            }
-        else:
-            # Retornar valores padrão se não houver configuração
-            return {"valor_diaria": 0.0, "valor_corrida": 0.0}
+        return _carregar_configuracao(backend)
     except Exception as e:
+        instrumentacao.registrar_erro()
         st.error(f"Erro ao buscar configuração ativa: {e}")
-        return {"valor_diaria": 0.0, "valor_corrida": 0.0}
+        return dict(CONFIG_PADRAO)
 
 
+@instrumentacao.medir()
 def salvar_configuracao(valor_diaria, valor_corrida):
     """
     Salva nova configuração e desativa as anteriores
@@ -231,17 +1243,11 @@ def salvar_configuracao(valor_diaria, valor_corrida):
         True se sucesso, False caso contrário
     """
     try:
-        supabase = get_supabase_client()
-        if not supabase:
+        backend = get_backend()
+        if not backend:
             return False
 
-        # Desativar todas as configurações anteriores
-        supabase.table("configuracoes")\
-            .update({"ativa": False})\
-            .eq("ativa", True)\
-            .execute()
-
-        # Inserir nova configuração ativa
+        # Inserir nova configuração ativa (o backend desativa as anteriores)
         data_obj = {
             "valor_diaria": valor_diaria,
             "valor_corrida": valor_corrida,
@@ -249,18 +1255,76 @@ def salvar_configuracao(valor_diaria, valor_corrida):
             "created_at": datetime.now().isoformat()
         }
 
-        response = supabase.table("configuracoes").insert(data_obj).execute()
+        backend.salvar_configuracao(data_obj)
+        get_cache().invalidar("config")
+        if unidade_atual() is not None:
+            unidade_atual().limpar()
         return True
     except Exception as e:
+        instrumentacao.registrar_erro()
         st.error(f"Erro ao salvar configuração: {e}")
         return False
 
 
 # ==================== ANÁLISES E RELATÓRIOS ====================
 
+KPIS_VAZIOS = {
+    "total_entregas": 0,
+    "total_motoboys": 0,
+    "media_entregas_moto": 0.0,
+    "custo_total": 0.0,
+    "custo_medio_entrega": 0.0
+}
+
+
+def _carregar_totais_dia(backend, data, unidade=None, cache=None):
+    """
+    Lê a linha de kpis_dia (propaga exceções)
+    """
+    return _consultar(
+        ("kpis_dia", str(data)),
+        lambda: backend.kpis_dia(data),
+        _tags_data(data)[:1],
+        unidade,
+        cache
+    )
+
+
+def _montar_kpis(totais, config):
+    """
+    Calcula os KPIs a partir dos totais do dia e da configuração
+    """
+    if not totais or not totais.get("total_motoboys"):
+        return dict(KPIS_VAZIOS)
+
+    # Métricas já somadas no servidor
+    total_entregas = int(totais.get("total_entregas") or 0)
+    motoboys_unicos = int(totais.get("total_motoboys") or 0)
+
+    # Usar funções do utils para cálculos
+    custo_total = utils.calcular_custo_total(
+        motoboys_unicos,
+        total_entregas,
+        config.get("valor_diaria", 0.0),
+        config.get("valor_corrida", 0.0)
+    )
+
+    custo_medio = utils.calcular_custo_medio_entrega(custo_total, total_entregas)
+    media_entregas = utils.calcular_media_entregas_moto(total_entregas, motoboys_unicos)
+
+    return {
+        "total_entregas": total_entregas,
+        "total_motoboys": motoboys_unicos,
+        "media_entregas_moto": round(media_entregas, 2),
+        "custo_total": custo_total,
+        "custo_medio_entrega": round(custo_medio, 2)
+    }
+
+
+@instrumentacao.medir()
 def calcular_kpis_dia(data):
     """
-    Calcula KPIs do dia
+    Calcula KPIs do dia a partir da agregação kpis_dia (uma linha)
 
     Args:
         data: Data para calcular KPIs
@@ -269,51 +1333,74 @@ def calcular_kpis_dia(data):
         Dicionário com KPIs
     """
     try:
-        registros = buscar_registros_dia(data)
+        backend = get_backend()
+        totais = _carregar_totais_dia(backend, data) if backend else None
         config = buscar_configuracao_ativa()
 
-        if not registros:
-            return {
-                "total_entregas": 0,
-                "total_motoboys": 0,
-                "media_entregas_moto": 0.0,
-                "custo_total": 0.0,
-                "custo_medio_entrega": 0.0
-            }
+        return _montar_kpis(totais, config)
+    except Exception as e:
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao calcular KPIs: {e}")
+        return dict(KPIS_VAZIOS)
 
-        # Calcular métricas
-        total_entregas = sum(r.get("entregas", 0) for r in registros)
-        motoboys_unicos = len(set(r.get("nome") for r in registros))
 
-        # Usar funções do utils para cálculos
-        custo_total = utils.calcular_custo_total(
-            motoboys_unicos,
-            total_entregas,
-            config.get("valor_diaria", 0.0),
-            config.get("valor_corrida", 0.0)
-        )
+def _carregar_linhas_relatorio(backend, data_inicio, data_fim, unidade=None, cache=None):
+    """
+    Lê relatorio_periodo: uma linha por motoboy (propaga exceções)
+    """
+    return _consultar(
+        ("relatorio_periodo", str(data_inicio), str(data_fim)),
+        lambda: backend.relatorio_periodo(data_inicio, data_fim),
+        _tags_periodo(data_inicio, data_fim),
+        unidade,
+        cache
+    )
 
-        custo_medio = utils.calcular_custo_medio_entrega(custo_total, total_entregas)
-        media_entregas = utils.calcular_media_entregas_moto(total_entregas, motoboys_unicos)
 
-        return {
-            "total_entregas": total_entregas,
-            "total_motoboys": motoboys_unicos,
-            "media_entregas_moto": round(media_entregas, 2),
-            "custo_total": custo_total,
-            "custo_medio_entrega": round(custo_medio, 2)
-        }
+def _montar_relatorio(linhas, config):
+    """
+    Calcula valores devidos de todos os motoboys de uma vez (folha.py)
+    """
+    if not linhas:
+        return []
+
+    relatorio = folha.calcular_valores(
+        linhas,
+        config.get("valor_diaria", 0.0),
+        config.get("valor_corrida", 0.0)
+    )
+    return relatorio.to_dict("records")
+
+
+@instrumentacao.medir()
+def gerar_relatorio_periodo(data_inicio, data_fim):
+    """
+    Gera relatório consolidado por motoboy em um período qualquer
+    O agrupamento é feito no servidor sobre resumo_diario (relatorio_periodo)
+
+    Args:
+        data_inicio: Data de início
+        data_fim: Data de fim
+
+    Returns:
+        Lista de dicionários com dados consolidados por motoboy
+    """
+    try:
+        backend = get_backend()
+        if not backend:
+            return []
+
+        linhas = _carregar_linhas_relatorio(backend, data_inicio, data_fim)
+        config = buscar_configuracao_ativa()
+
+        return _montar_relatorio(linhas, config)
     except Exception as e:
-        st.error(f"Erro ao calcular KPIs: {e}")
-        return {
-            "total_entregas": 0,
-            "total_motoboys": 0,
-            "media_entregas_moto": 0.0,
-            "custo_total": 0.0,
-            "custo_medio_entrega": 0.0
-        }
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao gerar relatório do período: {e}")
+        return []
 
 
+@instrumentacao.medir()
 def gerar_relatorio_semanal():
     """
     Gera relatório consolidado da semana (segunda até hoje)
@@ -321,92 +1408,343 @@ def gerar_relatorio_semanal():
     Returns:
         Lista de dicionários com dados consolidados por motoboy
     """
-    try:
-        data_inicio = utils.get_inicio_semana()
-        data_hoje = utils.get_data_hoje()
+    return gerar_relatorio_periodo(utils.get_inicio_semana(), utils.get_data_hoje())
+
+
+@instrumentacao.medir()
+def gerar_relatorio_mensal(ano, mes):
+    """
+    Gera relatório consolidado de um mês
+
+    Args:
+        ano: Ano (ex.: 2026)
+        mes: Mês (1 a 12)
+
+    Returns:
+        Lista de dicionários com dados consolidados por motoboy
+    """
+    data_inicio, data_fim = utils.get_limites_mes(ano, mes)
+    return gerar_relatorio_periodo(data_inicio, data_fim)
+
+
+# ==================== TENDÊNCIAS ====================
+
+# Pontos por gráfico (somando as séries): acima disso a granularidade aumenta
+LIMITE_PONTOS_GRAFICO = 400
+
+# Séries por dimensão (motoboy: só os com mais entregas no intervalo)
+GRUPOS_POR_DIMENSAO = {"total": 1, "periodo": 2, "dia_semana": 7, "motoboy": 5}
 
-        registros = buscar_registros_semana(data_inicio, data_hoje)
+
+def escolher_granularidade(data_inicio, data_fim, dimensao="total", minima="dia"):
+    """
+    Menor granularidade (a partir de `minima`) que mantém o gráfico em até
+    LIMITE_PONTOS_GRAFICO pontos
+
+    Returns:
+        Uma de utils.GRANULARIDADES
+    """
+    grupos = GRUPOS_POR_DIMENSAO[dimensao]
+    candidatas = utils.GRANULARIDADES[utils.GRANULARIDADES.index(minima):]
+    for granularidade in candidatas:
+        if utils.contar_intervalos(data_inicio, data_fim, granularidade) * grupos <= LIMITE_PONTOS_GRAFICO:
+            return granularidade
+    return candidatas[-1]
+
+
+def _montar_serie(linhas, config, dimensao):
+    """
+    Acrescenta custo, custo por motoboy e custo por entrega a cada ponto
+    (custo como nos KPIs: diárias x valor da diária + entregas x valor da corrida)
+    """
+    serie = []
+    for linha in linhas:
+        entregas = int(linha.get("entregas") or 0)
+        motoboys = int(linha.get("motoboys") or 0)
+        custo = utils.calcular_custo_total(
+            int(linha.get("diarias") or 0),
+            entregas,
+            config.get("valor_diaria", 0.0),
+            config.get("valor_corrida", 0.0)
+        )
+        grupo = str(linha.get("grupo"))
+        serie.append({
+            "intervalo": str(linha.get("intervalo"))[:10],
+            "grupo": utils.DIAS_SEMANA.get(grupo, grupo) if dimensao == "dia_semana" else grupo,
+            "entregas": entregas,
+            "motoboys": motoboys,
+            "turnos": int(linha.get("turnos") or 0),
+            "custo": custo,
+            "custo_por_motoboy": custo / motoboys if motoboys else 0.0,
+            "custo_por_entrega": utils.calcular_custo_medio_entrega(custo, entregas),
+        })
+    return serie
+
+
+@instrumentacao.medir()
+def buscar_serie_tendencia(data_inicio, data_fim, dimensao="total", granularidade=None):
+    """
+    Série de entregas e custos reamostrada no servidor (serie_tendencia)
+
+    Só os pontos agregados chegam ao navegador: a granularidade é
+    aumentada automaticamente para caber em LIMITE_PONTOS_GRAFICO.
+
+    Args:
+        data_inicio: Data de início
+        data_fim: Data de fim
+        dimensao: total, periodo, dia_semana ou motoboy
+        granularidade: Granularidade mínima desejada (padrão: a menor que couber)
+
+    Returns:
+        Dicionário com granularidade (a usada) e linhas (intervalo, grupo,
+        entregas, motoboys, turnos, custo, custo_por_motoboy, custo_por_entrega)
+    """
+    granularidade = escolher_granularidade(data_inicio, data_fim, dimensao, granularidade or "dia")
+    try:
+        backend = get_backend()
+        if not backend:
+            return {"granularidade": granularidade, "linhas": []}
+
+        linhas = _consultar(
+            ("serie_tendencia", str(data_inicio), str(data_fim), granularidade, dimensao),
+            lambda: backend.serie_tendencia(
+                data_inicio, data_fim, granularidade, dimensao, GRUPOS_POR_DIMENSAO["motoboy"]
+            ),
+            _tags_periodo(data_inicio, data_fim)
+        )
         config = buscar_configuracao_ativa()
+        return {"granularidade": granularidade, "linhas": _montar_serie(linhas, config, dimensao)}
+    except Exception as e:
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao buscar tendências: {e}")
+        return {"granularidade": granularidade, "linhas": []}
 
-        if not registros:
-            return []
 
-        # Agrupar por motoboy
-        motoboys_dict = {}
-
-        for registro in registros:
-            nome = registro.get("nome")
-            tipo = registro.get("tipo")
-            entregas = registro.get("entregas", 0)
-            data = registro.get("data")
-
-            if nome not in motoboys_dict:
-                motoboys_dict[nome] = {
-                    "nome": nome,
-                    "tipo": tipo,
-                    "total_entregas": 0,
-                    "dias_trabalhados": set(),
-                    "registros": []
-                }
-
-            motoboys_dict[nome]["total_entregas"] += entregas
-            motoboys_dict[nome]["dias_trabalhados"].add(data)
-            motoboys_dict[nome]["registros"].append(registro)
-
-        # Calcular valores devidos
-        relatorio = []
-        for nome, dados in motoboys_dict.items():
-            dias_trab = len(dados["dias_trabalhados"])
-            total_entregas = dados["total_entregas"]
-            tipo = dados["tipo"]
-
-            # Calcular valor devido
-            if tipo == "Fixo":
-                valor_devido = (
-                    dias_trab * config.get("valor_diaria", 0.0) +
-                    total_entregas * config.get("valor_corrida", 0.0)
-                )
-            else:  # Freelancer
-                valor_devido = 0.0  # Já foi pago no dia
-
-            relatorio.append({
-                "nome": nome,
-                "tipo": tipo,
-                "dias_trabalhados": dias_trab,
-                "total_entregas": total_entregas,
-                "valor_devido": valor_devido
-            })
-
-        # Ordenar por nome
-        relatorio.sort(key=lambda x: x["nome"])
-
-        return relatorio
+# ==================== EXPORTAÇÃO ====================
+
+@instrumentacao.medir()
+def exportar_periodo(data_inicio, data_fim, conteudo, formato):
+    """
+    Gera o arquivo de exportação de um período (exportacao.py)
+
+    Os registros são lidos página a página e gravados em lotes; a folha
+    vem da mesma agregação do relatório (uma linha por motoboy).
+
+    Args:
+        data_inicio: Data de início
+        data_fim: Data de fim
+        conteudo: "registros" (todos os turnos) ou "folha"
+        formato: "CSV", "XLSX" ou "Parquet"
+
+    Returns:
+        Tupla (bytes do arquivo, quantidade de linhas) ou (None, 0) em caso
+        de erro ou de arquivo acima de exportacao.LIMITE_DOWNLOAD
+    """
+    try:
+        backend = get_backend()
+        if not backend:
+            return None, 0
+
+        if conteudo == "registros":
+            linhas = _paginar_registros(backend, data_inicio, data_fim)
+            colunas = exportacao.COLUNAS_REGISTROS
+        else:
+            linhas = _montar_relatorio(
+                _carregar_linhas_relatorio(backend, data_inicio, data_fim),
+                buscar_configuracao_ativa()
+            )
+            colunas = exportacao.COLUNAS_FOLHA
+
+        # Uma falha no meio da leitura interrompe a exportação (sem arquivo parcial)
+        return exportacao.exportar(linhas, colunas, formato)
+    except exportacao.ErroExportacaoGrande as e:
+        st.warning(f"⚠️ {e}")
+        return None, 0
     except Exception as e:
-        st.error(f"Erro ao gerar relatório semanal: {e}")
-        return []
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao exportar período: {e}")
+        return None, 0
+
+
+# ==================== CARREGAMENTO PARALELO ====================
+
+@st.cache_resource
+def get_executor():
+    """
+    Pool de threads compartilhado para consultas simultâneas ao banco
+    """
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="motoboys-db")
+
+
+@instrumentacao.medir()
+def carregar_painel_gerencial(data=None):
+    """
+    Busca configuração, totais do dia e consolidado da semana em paralelo
+    A latência passa a ser a da consulta mais lenta, não a soma de todas
 
+    Erros são exibidos por consulta (st.error na thread do Streamlit) e a
+    parte afetada volta com os mesmos valores padrão das funções individuais.
 
-def buscar_nomes_motoboys():
+    Args:
+        data: Dia dos KPIs e fim da semana (padrão: hoje)
+
+    Returns:
+        Dicionário com config, kpis e relatorio (semana até `data`)
+    """
+    data = data or utils.get_data_hoje()
+    vazio = {"config": dict(CONFIG_PADRAO), "kpis": dict(KPIS_VAZIOS), "relatorio": []}
+
+    backend = get_backend()
+    if not backend:
+        return vazio
+
+    # As threads do pool não enxergam a unidade de trabalho desta thread nem
+    # têm ScriptRunContext (getters de st.cache_resource): tudo é resolvido
+    # aqui e repassado explicitamente
+    unidade = unidade_atual()
+    cache = get_cache()
+    executor = get_executor()
+    tarefas = {
+        "config": executor.submit(_carregar_configuracao, backend, unidade, cache),
+        "totais": executor.submit(_carregar_totais_dia, backend, data, unidade, cache),
+        "linhas": executor.submit(
+            _carregar_linhas_relatorio, backend, utils.get_inicio_semana(data), data, unidade, cache
+        ),
+    }
+
+    resultados = {}
+    for nome, tarefa in tarefas.items():
+        try:
+            resultados[nome] = tarefa.result()
+        except Exception as e:
+            resultados[nome] = e
+
+    config = resultados["config"]
+    if isinstance(config, Exception):
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao buscar configuração ativa: {config}")
+        config = vazio["config"]
+
+    totais = resultados["totais"]
+    if isinstance(totais, Exception):
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao calcular KPIs: {totais}")
+        kpis = vazio["kpis"]
+    else:
+        kpis = _montar_kpis(totais, config)
+
+    linhas = resultados["linhas"]
+    if isinstance(linhas, Exception):
+        instrumentacao.registrar_erro()
+        st.error(f"Erro ao gerar relatório semanal: {linhas}")
+        relatorio = vazio["relatorio"]
+    else:
+        try:
+            relatorio = _montar_relatorio(linhas, config)
+        except Exception as e:
+            instrumentacao.registrar_erro()
+            st.error(f"Erro ao gerar relatório semanal: {e}")
+            relatorio = vazio["relatorio"]
+
+    return {"config": config, "kpis": kpis, "relatorio": relatorio}
+
+
+@instrumentacao.medir()
+def buscar_nomes_motoboys(prefixo=""):
     """
     Busca lista única de nomes de motoboys para autocomplete
+    Servida pelo índice em memória (sem varrer a tabela registros)
+
+    Args:
+        prefixo: Filtra nomes que começam com o prefixo (opcional)
 
     Returns:
         Lista de nomes únicos
     """
     try:
-        supabase = get_supabase_client()
-        if not supabase:
-            return []
-
-        response = supabase.table("registros")\
-            .select("nome")\
-            .execute()
+        indice = get_indice_nomes()
 
-        if response.data:
-            nomes = list(set(r.get("nome") for r in response.data if r.get("nome")))
-            nomes.sort()
-            return nomes
-        return []
+        if prefixo:
+            return indice.buscar_prefixo(prefixo)
+        return indice.nomes()
     except Exception as e:
+        instrumentacao.registrar_erro()
         st.error(f"Erro ao buscar nomes de motoboys: {e}")
         return []
+
+
+def buscar_nomes_semelhantes(nome):
+    """
+    Motoboys cadastrados com nome parecido (para confirmar antes de criar
+    um motoboy novo: "Joao Silv" -> "João Silva")
+
+    Args:
+        nome: Nome digitado
+
+    Returns:
+        Lista de nomes (vazia se o nome já está cadastrado com a mesma chave)
+    """
+    try:
+        indice = get_indice_nomes()
+        if indice.canonico(nome):
+            return []
+        return indice.buscar_semelhantes(nome)
+    except Exception:
+        return []
+
+
+def encontrar_motoboys_duplicados(minimo=indice_nomes.SEMELHANCA_MINIMA):
+    """
+    Motoboys provavelmente cadastrados mais de uma vez
+
+    Args:
+        minimo: Semelhança mínima dos pares parecidos (0 a 1)
+
+    Returns:
+        Dicionário de indice_nomes.agrupar_duplicados (iguais e semelhantes)
+    """
+    try:
+        backend = get_backend()
+        if not backend:
+            return {"iguais": [], "semelhantes": []}
+
+        return indice_nomes.agrupar_duplicados(backend.buscar_nomes_motoboys(), minimo)
+    except Exception as e:
+        st.error(f"Erro ao buscar motoboys duplicados: {e}")
+        return {"iguais": [], "semelhantes": []}
+
+
+def mesclar_motoboys(origens, destino):
+    """
+    Unifica grafias de um mesmo motoboy no nome de destino
+
+    Args:
+        origens: Nomes que deixam de existir
+        destino: Nome que fica
+
+    Outros servidores recebem as linhas renomeadas pelo Supabase Realtime
+    (UPDATE em registros); os totais de meses arquivados, o índice de
+    nomes e as grafias dos registros arquivados (get_nomes_mesclados)
+    deles se atualizam no fim do TTL do cache e do índice.
+
+    Returns:
+        Quantidade de registros alterados ou None em caso de erro
+    """
+    try:
+        backend = get_backend()
+        if not backend:
+            return None
+
+        total = backend.mesclar_motoboys(list(origens), destino)
+        # Nomes mudam em qualquer dia, semana ou período já em cache (inclusive hoje)
+        get_cache().invalidar_grupos("dia", "semana")
+        unidade = unidade_atual()
+        if unidade is not None:
+            unidade.limpar()
+        get_indice_nomes.clear()
+        get_nomes_mesclados.clear()
+        _publicar(tempo_real.RESSINCRONIZAR)
+        return total
+    except Exception as e:
+        st.error(f"Erro ao unificar motoboys: {e}")
+        return None
@@ -0,0 +1,226 @@
+"""
+Exportação de registros e da folha de pagamento (CSV, XLSX e Parquet)
+As linhas chegam de um gerador (database.iterar_registros, uma página por
+vez) e são gravadas em lotes: a memória usada não depende do tamanho do
+período. Colunas numéricas continuam numéricas (sem formatar_moeda) e
+datas viram datas de verdade no XLSX e no Parquet.
+"""
+import csv
+import io
+import itertools
+import tempfile
+from datetime import date
+
+TAMANHO_LOTE = 1000
+# Arquivos até este tamanho ficam em memória; acima disso, em disco
+LIMITE_MEMORIA = 8 * 1024 * 1024
+# O st.download_button guarda o arquivo inteiro em memória: acima disso,
+# a exportação é recusada e o usuário precisa reduzir o período
+LIMITE_DOWNLOAD = 50 * 1024 * 1024
+
+# (coluna, tipo): tipos "int", "float", "data" ou "texto"
+COLUNAS_REGISTROS = [
+    ("id", "int"),
+    ("data", "data"),
+    ("nome", "texto"),
+    ("periodo", "texto"),
+    ("tipo", "texto"),
+    ("entregas", "int"),
+    ("created_at", "texto"),
+]
+
+COLUNAS_FOLHA = [
+    ("nome", "texto"),
+    ("tipo", "texto"),
+    ("dias_trabalhados", "int"),
+    ("total_entregas", "int"),
+    ("dias_fixo", "int"),
+    ("entregas_fixo", "int"),
+    ("valor_devido", "float"),
+]
+
+FORMATOS = {
+    "CSV": (".csv", "text/csv"),
+    "XLSX": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+FORMATO_MOEDA_XLSX = '"R$" #,##0.00'
+
+
+class ErroExportacaoGrande(Exception):
+    """O arquivo gerado passou de LIMITE_DOWNLOAD"""
+
+    def __init__(self, limite):
+        super().__init__(
+            f"O arquivo passou de {limite // (1024 * 1024)} MB; reduza o período da exportação"
+        )
+        self.limite = limite
+
+
+def converter(valor, tipo):
+    """
+    Converte um valor vindo do banco (texto ou número) para o tipo da coluna
+
+    Returns:
+        int, float, date, str ou None (valor vazio)
+    """
+    if valor is None or valor == "":
+        return None
+    if tipo == "int":
+        return int(valor)
+    if tipo == "float":
+        return float(valor)
+    if tipo == "data":
+        return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+    return str(valor)
+
+
+def _lotes(linhas, colunas, tamanho_lote):
+    """
+    Agrupa as linhas em listas de tuplas já convertidas
+
+    Yields:
+        Lista com até `tamanho_lote` tuplas (na ordem de `colunas`)
+    """
+    linhas = iter(linhas)
+    while True:
+        lote = [
+            tuple(converter(linha.get(nome), tipo) for nome, tipo in colunas)
+            for linha in itertools.islice(linhas, tamanho_lote)
+        ]
+        if not lote:
+            return
+        yield lote
+
+
+def escrever_csv(destino, linhas, colunas, tamanho_lote=TAMANHO_LOTE):
+    """
+    CSV UTF-8 com BOM (acentos corretos no Excel), separador vírgula e
+    ponto decimal
+
+    Returns:
+        Quantidade de linhas gravadas
+    """
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="", write_through=True)
+    escritor = csv.writer(texto)
+    escritor.writerow([nome for nome, _ in colunas])
+    total = 0
+    for lote in _lotes(linhas, colunas, tamanho_lote):
+        escritor.writerows(lote)
+        total += len(lote)
+    texto.detach()
+    return total
+
+
+def escrever_xlsx(destino, linhas, colunas, tamanho_lote=TAMANHO_LOTE, aba="Dados"):
+    """
+    XLSX em modo write_only (openpyxl grava cada linha e a descarta)
+
+    Returns:
+        Quantidade de linhas gravadas
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    pasta = Workbook(write_only=True)
+    planilha = pasta.create_sheet(aba)
+    planilha.append([nome for nome, _ in colunas])
+
+    def celula(valor, nome, tipo):
+        c = WriteOnlyCell(planilha, value=valor)
+        if tipo == "data":
+            c.number_format = "DD/MM/YYYY"
+        elif nome == "valor_devido":
+            c.number_format = FORMATO_MOEDA_XLSX
+        return c
+
+    total = 0
+    for lote in _lotes(linhas, colunas, tamanho_lote):
+        for valores in lote:
+            planilha.append([
+                celula(valor, nome, tipo) for valor, (nome, tipo) in zip(valores, colunas)
+            ])
+        total += len(lote)
+    pasta.save(destino)
+    return total
+
+
+def escrever_parquet(destino, linhas, colunas, tamanho_lote=TAMANHO_LOTE):
+    """
+    Parquet (zstd) com esquema tipado; cada lote vira um row group
+
+    Returns:
+        Quantidade de linhas gravadas
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos_arrow = {"int": pa.int64(), "float": pa.float64(), "data": pa.date32(), "texto": pa.string()}
+    esquema = pa.schema([(nome, tipos_arrow[tipo]) for nome, tipo in colunas])
+
+    total = 0
+    with pq.ParquetWriter(destino, esquema, compression="zstd") as escritor:
+        for lote in _lotes(linhas, colunas, tamanho_lote):
+            colunas_lote = list(zip(*lote))
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas_lote, esquema)],
+                schema=esquema
+            ))
+            total += len(lote)
+        if not total:
+            escritor.write_table(esquema.empty_table())
+    return total
+
+
+ESCRITORES = {"CSV": escrever_csv, "XLSX": escrever_xlsx, "Parquet": escrever_parquet}
+
+
+def _limitar(linhas, arquivo, limite, tamanho_lote):
+    """
+    Repassa as linhas, conferindo o tamanho do arquivo a cada lote
+
+    CSV e Parquet gravam conforme leem, então um período grande demais é
+    interrompido cedo; o XLSX só é gravado no final (conferido em exportar).
+
+    Raises:
+        ErroExportacaoGrande: arquivo já passou do limite
+    """
+    for i, linha in enumerate(linhas, 1):
+        yield linha
+        if i % tamanho_lote == 0 and arquivo.tell() > limite:
+            raise ErroExportacaoGrande(limite)
+
+
+def exportar(linhas, colunas, formato, tamanho_lote=TAMANHO_LOTE, limite=LIMITE_DOWNLOAD):
+    """
+    Grava as linhas no formato escolhido em um arquivo temporário
+
+    Args:
+        linhas: Iterável de dicionários (pode ser um gerador paginado)
+        colunas: COLUNAS_REGISTROS, COLUNAS_FOLHA ou equivalente
+        formato: "CSV", "XLSX" ou "Parquet"
+        limite: Tamanho máximo do arquivo em bytes
+
+    Returns:
+        Tupla (bytes do arquivo, quantidade de linhas); durante a gravação
+        o arquivo fica em memória até LIMITE_MEMORIA e depois vai para o disco
+
+    Raises:
+        ErroExportacaoGrande: o arquivo passou de `limite`
+    """
+    with tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA) as arquivo:
+        total = ESCRITORES[formato](
+            arquivo, _limitar(linhas, arquivo, limite, tamanho_lote), colunas, tamanho_lote
+        )
+        if arquivo.seek(0, io.SEEK_END) > limite:
+            raise ErroExportacaoGrande(limite)
+        arquivo.seek(0)
+        return arquivo.read(), total
+
+
+def nome_arquivo(conteudo, data_inicio, data_fim, formato):
+    """
+    Ex.: registros_2026-10-01_2026-10-31.xlsx
+    """
+    return f"{conteudo}_{data_inicio}_{data_fim}{FORMATOS[formato][0]}"
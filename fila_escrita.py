@@ -0,0 +1,215 @@
+"""
+Fila de gravação local (write-behind) para novos registros
+O registro é gravado na hora em um diário SQLite local e uma thread o envia
+ao backend em lotes, com novas tentativas e chave de idempotência (o mesmo
+lote reenviado não duplica registros). Pendências sobrevivem a reinícios.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+PENDENTE = "pendente"
+SINCRONIZADO = "sincronizado"
+
+SCHEMA_FILA = """
+CREATE TABLE IF NOT EXISTS fila (
+    chave TEXT PRIMARY KEY,
+    dados TEXT NOT NULL,
+    data TEXT,
+    status TEXT NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    ultimo_erro TEXT,
+    criado_em TEXT NOT NULL,
+    enviado_em TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_fila_status ON fila(status, criado_em);
+CREATE INDEX IF NOT EXISTS idx_fila_data ON fila(data, status);
+"""
+
+
+class FilaEscrita:
+    """
+    Diário local de registros + envio em segundo plano
+
+    Args:
+        caminho: Arquivo SQLite do diário
+        enviar_lote: Função que recebe uma lista de linhas (com
+            chave_idempotencia) e as grava no backend; deve ignorar duplicatas
+        tamanho_lote: Máximo de linhas por envio
+        intervalo: Segundos entre verificações quando não há novidades
+        ao_sincronizar: Função chamada com as linhas de cada lote enviado
+    """
+
+    def __init__(self, caminho, enviar_lote, tamanho_lote=50, intervalo=2.0, ao_sincronizar=None):
+        self.caminho = caminho
+        self.enviar_lote = enviar_lote
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.ao_sincronizar = ao_sincronizar
+        self.ultimo_erro = None
+        self.ultimo_envio = None
+        self._lock = threading.RLock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self.conexao.row_factory = sqlite3.Row
+        with self._lock:
+            self.conexao.execute("PRAGMA journal_mode=WAL")
+            # Cada registro aceito precisa sobreviver a uma queda de energia
+            self.conexao.execute("PRAGMA synchronous=FULL")
+            self.conexao.executescript(SCHEMA_FILA)
+
+    def enfileirar(self, dados):
+        """
+        Grava o registro no diário local (sem rede) e acorda o envio
+
+        Returns:
+            Chave de idempotência do registro
+        """
+        chave = dados.get("chave_idempotencia") or f"fila-{uuid.uuid4().hex}"
+        linha = {**dados, "chave_idempotencia": chave}
+        with self._lock, self.conexao:
+            self.conexao.execute(
+                "INSERT OR IGNORE INTO fila (chave, dados, data, criado_em) VALUES (?, ?, ?, ?)",
+                (chave, json.dumps(linha, default=str), str(linha.get("data")), datetime.now().isoformat())
+            )
+        self._acordar.set()
+        return chave
+
+    def pendentes(self, data=None):
+        """
+        Registros ainda não enviados (opcionalmente só de uma data), mais antigos primeiro
+        """
+        sql = "SELECT chave, dados, tentativas, ultimo_erro FROM fila WHERE status = ?"
+        parametros = [PENDENTE]
+        if data is not None:
+            sql += " AND data = ?"
+            parametros.append(str(data))
+        with self._lock:
+            linhas = self.conexao.execute(sql + " ORDER BY criado_em", parametros).fetchall()
+        return [
+            {**json.loads(l["dados"]), "tentativas": l["tentativas"], "ultimo_erro": l["ultimo_erro"]}
+            for l in linhas
+        ]
+
+    def status(self, chaves):
+        """
+        Returns:
+            Dicionário chave -> pendente/sincronizado (chaves desconhecidas ficam de fora)
+        """
+        chaves = [c for c in chaves if c]
+        if not chaves:
+            return {}
+        with self._lock:
+            linhas = self.conexao.execute(
+                f"SELECT chave, status FROM fila WHERE chave IN ({','.join('?' * len(chaves))})",
+                chaves
+            ).fetchall()
+        return {l["chave"]: l["status"] for l in linhas}
+
+    def resumo(self):
+        """
+        Returns:
+            Dicionário com pendentes, sincronizados, ultimo_erro e ultimo_envio
+        """
+        with self._lock:
+            contagem = dict(self.conexao.execute(
+                "SELECT status, COUNT(*) FROM fila GROUP BY status"
+            ).fetchall())
+        return {
+            "pendentes": contagem.get(PENDENTE, 0),
+            "sincronizados": contagem.get(SINCRONIZADO, 0),
+            "ultimo_erro": self.ultimo_erro,
+            "ultimo_envio": self.ultimo_envio,
+        }
+
+    def esvaziar(self):
+        """
+        Envia um lote de pendentes
+
+        Returns:
+            Quantidade de registros confirmados (0 se não havia nada)
+
+        Raises:
+            A exceção do envio (o lote continua pendente)
+        """
+        with self._lock:
+            linhas = self.conexao.execute(
+                "SELECT chave, dados FROM fila WHERE status = ? ORDER BY criado_em LIMIT ?",
+                (PENDENTE, self.tamanho_lote)
+            ).fetchall()
+        if not linhas:
+            return 0
+
+        chaves = [l["chave"] for l in linhas]
+        lote = [json.loads(l["dados"]) for l in linhas]
+        try:
+            self.enviar_lote(lote)
+        except Exception as e:
+            self.ultimo_erro = str(e)
+            with self._lock, self.conexao:
+                self.conexao.execute(
+                    f"UPDATE fila SET tentativas = tentativas + 1, ultimo_erro = ? "
+                    f"WHERE chave IN ({','.join('?' * len(chaves))})",
+                    [str(e)] + chaves
+                )
+            raise
+
+        # Duplicatas ignoradas pelo backend também contam como enviadas
+        agora = datetime.now().isoformat()
+        with self._lock, self.conexao:
+            self.conexao.execute(
+                f"UPDATE fila SET status = ?, enviado_em = ?, ultimo_erro = NULL "
+                f"WHERE chave IN ({','.join('?' * len(chaves))})",
+                [SINCRONIZADO, agora] + chaves
+            )
+        self.ultimo_erro = None
+        self.ultimo_envio = agora
+        if self.ao_sincronizar:
+            try:
+                self.ao_sincronizar(lote)
+            except Exception:
+                pass
+        return len(lote)
+
+    def limpar_sincronizados(self, dias=7):
+        """
+        Remove do diário os registros já enviados há mais de `dias` dias
+        """
+        limite = datetime.fromtimestamp(time.time() - dias * 86400).isoformat()
+        with self._lock, self.conexao:
+            return self.conexao.execute(
+                "DELETE FROM fila WHERE status = ? AND enviado_em < ?", (SINCRONIZADO, limite)
+            ).rowcount
+
+    # ==================== ENVIO EM SEGUNDO PLANO ====================
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="fila-escrita", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def _executar(self):
+        espera = self.intervalo
+        self.limpar_sincronizados()
+        while not self._parar.is_set():
+            self._acordar.wait(espera)
+            self._acordar.clear()
+            try:
+                # Esvazia tudo enquanto houver lotes cheios
+                while self.esvaziar() >= self.tamanho_lote:
+                    pass
+                espera = self.intervalo
+            except Exception:
+                # Backend lento ou fora do ar: espera exponencial até 60s
+                espera = min(max(espera, 1.0) * 2, 60.0)
@@ -0,0 +1,99 @@
+"""
+Motor de folha de pagamento (pandas/NumPy)
+Única implementação da regra de valores devidos, usada pelo relatório
+(database.py) e por utils.calcular_valor_devido_motoboy
+
+Regra: cada dia com registro Fixo paga uma diária e cada entrega Fixo
+paga uma corrida; registros Freelancer já foram pagos no dia. Um
+motoboy com registros dos dois tipos no período aparece como "Misto".
+"""
+import numpy as np
+import pandas as pd
+
+COLUNAS_AGREGADAS = [
+    "nome", "tipo", "dias_trabalhados", "total_entregas", "dias_fixo", "entregas_fixo"
+]
+
+COLUNAS_FOLHA = COLUNAS_AGREGADAS + ["valor_devido"]
+
+
+def agregar_registros(registros):
+    """
+    Consolida registros (brutos ou de resumo_diario) por motoboy com groupby
+
+    Args:
+        registros: Lista de dicionários ou DataFrame com nome, data, tipo e entregas
+
+    Returns:
+        DataFrame com COLUNAS_AGREGADAS (uma linha por motoboy, ordenado por nome)
+    """
+    if isinstance(registros, pd.DataFrame):
+        df = registros[["nome", "data", "tipo", "entregas"]].copy()
+    else:
+        df = pd.DataFrame.from_records(registros, columns=["nome", "data", "tipo", "entregas"])
+
+    if df.empty:
+        return pd.DataFrame(columns=COLUNAS_AGREGADAS)
+
+    df["entregas"] = pd.to_numeric(df["entregas"], errors="coerce").fillna(0).astype("int64")
+    fixo = df["tipo"].eq("Fixo").to_numpy()
+    df["fixo"] = fixo.astype("int64")
+    df["data_fixo"] = df["data"].where(fixo)
+    df["entregas_fixo"] = np.where(fixo, df["entregas"].to_numpy(), 0)
+
+    agregado = df.groupby("nome", sort=True).agg(
+        dias_trabalhados=("data", "nunique"),
+        total_entregas=("entregas", "sum"),
+        dias_fixo=("data_fixo", "nunique"),
+        entregas_fixo=("entregas_fixo", "sum"),
+        registros_fixo=("fixo", "sum"),
+        registros=("fixo", "size"),
+    ).reset_index()
+
+    agregado["tipo"] = np.select(
+        [
+            agregado["registros_fixo"].to_numpy() == agregado["registros"].to_numpy(),
+            agregado["registros_fixo"].to_numpy() == 0,
+        ],
+        ["Fixo", "Freelancer"],
+        default="Misto",
+    )
+    return agregado[COLUNAS_AGREGADAS]
+
+
+def calcular_valores(agregado, valor_diaria, valor_corrida):
+    """
+    Calcula valor_devido de todos os motoboys de uma vez (operação vetorial)
+
+    Args:
+        agregado: DataFrame ou lista de dicionários com COLUNAS_AGREGADAS
+            (saída de agregar_registros ou da função SQL relatorio_periodo)
+        valor_diaria: Valor da diária
+        valor_corrida: Valor por corrida
+
+    Returns:
+        DataFrame com COLUNAS_FOLHA ordenado por nome
+    """
+    df = agregado if isinstance(agregado, pd.DataFrame) else pd.DataFrame.from_records(agregado)
+    if df.empty:
+        return pd.DataFrame(columns=COLUNAS_FOLHA)
+
+    df = df.copy()
+    for coluna in ("dias_trabalhados", "total_entregas", "dias_fixo", "entregas_fixo"):
+        df[coluna] = pd.to_numeric(df[coluna], errors="coerce").fillna(0).astype("int64")
+
+    df["valor_devido"] = (
+        df["dias_fixo"].to_numpy() * float(valor_diaria or 0.0) +
+        df["entregas_fixo"].to_numpy() * float(valor_corrida or 0.0)
+    )
+    return df[COLUNAS_FOLHA].sort_values("nome", kind="stable").reset_index(drop=True)
+
+
+def calcular_folha(registros, valor_diaria, valor_corrida):
+    """
+    Atalho: agrega registros e calcula os valores devidos
+
+    Returns:
+        DataFrame com COLUNAS_FOLHA
+    """
+    return calcular_valores(agregar_registros(registros), valor_diaria, valor_corrida)
@@ -0,0 +1,350 @@
+"""
+Importação em lote de planilhas históricas (XLSX/CSV) para registros
+Lê em streaming, valida contra as restrições de schema.sql e envia lotes
+idempotentes (upsert por chave_idempotencia), permitindo retomar após falhas
+
+Uso (linha de comando):
+    python importador.py planilha.xlsx [--lote 500] [--a-partir-de 1200] [--sqlite motoboys.db]
+"""
+import argparse
+import csv
+import hashlib
+import io
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import utils
+from indice_nomes import IndiceNomes
+
+PERIODOS = {"manha": "Manhã", "noite": "Noite"}
+TIPOS = {"fixo": "Fixo", "freelancer": "Freelancer", "freela": "Freelancer", "free": "Freelancer"}
+
+# Cabeçalhos aceitos para cada coluna (sem acentos, minúsculos)
+ALIASES_COLUNAS = {
+    "nome": ("nome", "motoboy", "entregador"),
+    "data": ("data", "dia"),
+    "periodo": ("periodo", "turno"),
+    "tipo": ("tipo", "vinculo"),
+    "entregas": ("entregas", "corridas", "qtd entregas", "quantidade"),
+}
+
+MAX_ERROS_GUARDADOS = 100
+
+
+class ErroImportacao(Exception):
+    """
+    Falha ao enviar um lote; `resultado["ultima_linha"]` indica de onde retomar
+    """
+
+    def __init__(self, mensagem, resultado):
+        super().__init__(mensagem)
+        self.resultado = resultado
+
+
+def _sem_acentos(texto):
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).strip().lower()
+
+
+def _mapear_cabecalho(cabecalho):
+    """
+    Associa cada coluna esperada ao índice correspondente no cabeçalho
+    """
+    normalizados = [_sem_acentos(c) if c is not None else "" for c in cabecalho]
+    indices = {}
+    for coluna, aliases in ALIASES_COLUNAS.items():
+        for i, titulo in enumerate(normalizados):
+            if titulo in aliases:
+                indices[coluna] = i
+                break
+    faltando = [c for c in ALIASES_COLUNAS if c not in indices]
+    if faltando:
+        raise ValueError(f"Colunas não encontradas no cabeçalho: {', '.join(faltando)}")
+    return indices
+
+
+def _linhas_mapeadas(linhas):
+    """
+    Converte linhas (listas) em dicionários usando o cabeçalho (primeira linha)
+
+    Yields:
+        (número da linha na planilha, dicionário bruto)
+    """
+    linhas = iter(linhas)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+    indices = _mapear_cabecalho(cabecalho)
+    for numero, valores in enumerate(linhas, start=2):
+        if not valores or all(v in (None, "") for v in valores):
+            continue
+        yield numero, {
+            coluna: valores[i] if i < len(valores) else None
+            for coluna, i in indices.items()
+        }
+
+
+def ler_csv(arquivo, encoding="utf-8-sig"):
+    """
+    Lê CSV em streaming (detecta ';' ou ',' como separador)
+
+    Args:
+        arquivo: Caminho ou arquivo binário aberto
+    """
+    if isinstance(arquivo, (str, Path)):
+        arquivo = open(arquivo, "rb")
+    texto = io.TextIOWrapper(arquivo, encoding=encoding, newline="")
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=";,")
+    except csv.Error:
+        dialeto = csv.excel
+    yield from _linhas_mapeadas(csv.reader(texto, dialeto))
+
+
+def ler_xlsx(arquivo):
+    """
+    Lê a primeira aba de um XLSX em modo somente leitura (streaming)
+
+    Args:
+        arquivo: Caminho ou arquivo binário aberto
+    """
+    from openpyxl import load_workbook
+
+    pasta = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        aba = pasta.worksheets[0]
+        yield from _linhas_mapeadas(aba.iter_rows(values_only=True))
+    finally:
+        pasta.close()
+
+
+def ler_planilha(arquivo, nome_arquivo=None):
+    """
+    Escolhe o leitor pela extensão do arquivo (.xlsx/.xlsm ou .csv)
+    """
+    nome_arquivo = str(nome_arquivo or arquivo).lower()
+    if nome_arquivo.endswith((".xlsx", ".xlsm")):
+        return ler_xlsx(arquivo)
+    if nome_arquivo.endswith(".csv"):
+        return ler_csv(arquivo)
+    raise ValueError("Formato não suportado (use .xlsx ou .csv)")
+
+
+def _converter_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    if isinstance(valor, (int, float)):
+        # Número de série do Excel
+        return date(1899, 12, 30) + timedelta(days=int(valor))
+    texto = str(valor or "").strip()
+    for formato in ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(texto[:10], formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"data inválida: {valor!r}")
+
+
+def validar_linha(bruta):
+    """
+    Normaliza e valida uma linha contra as restrições da tabela registros
+
+    Returns:
+        Dicionário pronto para inserção (sem chave_idempotencia)
+
+    Raises:
+        ValueError com a descrição do problema
+    """
+    nome = utils.normalizar_nome(bruta.get("nome"))
+    if not nome:
+        raise ValueError("nome vazio")
+    if len(nome) > 255:
+        raise ValueError("nome com mais de 255 caracteres")
+
+    periodo = PERIODOS.get(_sem_acentos(bruta.get("periodo") or ""))
+    if not periodo:
+        raise ValueError(f"período inválido: {bruta.get('periodo')!r} (use Manhã ou Noite)")
+
+    tipo = TIPOS.get(_sem_acentos(bruta.get("tipo") or ""))
+    if not tipo:
+        raise ValueError(f"tipo inválido: {bruta.get('tipo')!r} (use Fixo ou Freelancer)")
+
+    try:
+        entregas = int(float(str(bruta.get("entregas") or 0).replace(",", ".")))
+    except ValueError:
+        raise ValueError(f"entregas inválidas: {bruta.get('entregas')!r}")
+    if entregas < 0:
+        raise ValueError("entregas negativas")
+
+    return {
+        "nome": nome,
+        "data": str(_converter_data(bruta.get("data"))),
+        "periodo": periodo,
+        "tipo": tipo,
+        "entregas": entregas,
+    }
+
+
+def chave_idempotencia(linha, ocorrencia):
+    """
+    Chave determinística da linha: o mesmo conteúdo gera a mesma chave
+    em qualquer reimportação. `ocorrencia` diferencia linhas idênticas
+    do mesmo arquivo (ex.: dois turnos iguais registrados em separado).
+    """
+    base = "|".join(str(linha[c]) for c in ("nome", "data", "periodo", "tipo", "entregas"))
+    return hashlib.sha256(f"{base}|{ocorrencia}".encode("utf-8")).hexdigest()[:40]
+
+
+def _enviar_lote(backend, lote, tentativas):
+    espera = 1.0
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return backend.inserir_registros_lote(lote)
+        except Exception:
+            if tentativa == tentativas:
+                raise
+            time.sleep(espera)
+            espera *= 2
+
+
+def importar(linhas, backend, tamanho_lote=500, a_partir_de=0, progresso=None, tentativas=3):
+    """
+    Valida e envia as linhas em lotes multi-linha idempotentes
+
+    Args:
+        linhas: Iterável de (número da linha, dicionário bruto), ex.: ler_planilha()
+        backend: storage.StorageBackend de destino
+        tamanho_lote: Linhas por ida ao banco
+        a_partir_de: Ignora linhas com número menor (retomada rápida; a
+            idempotência já impede duplicatas mesmo reenviando tudo)
+        progresso: Função chamada com o resultado parcial após cada lote
+        tentativas: Tentativas por lote (espera exponencial entre elas)
+
+    Returns:
+        Dicionário com lidas, inseridas, duplicadas, invalidas, erros e ultima_linha
+
+    Raises:
+        ErroImportacao se um lote falhar em todas as tentativas
+    """
+    resultado = {
+        "lidas": 0,
+        "inseridas": 0,
+        "duplicadas": 0,
+        "invalidas": 0,
+        "erros": [],
+        "ultima_linha": a_partir_de,
+    }
+    ocorrencias = {}
+    # "joao" na planilha vira "João" se já cadastrado (ou visto antes no arquivo)
+    nomes = IndiceNomes(backend.buscar_nomes_motoboys())
+    lote = []
+    ultima_do_lote = a_partir_de
+
+    def enviar():
+        try:
+            inseridas = _enviar_lote(backend, lote, tentativas)
+        except Exception as e:
+            raise ErroImportacao(
+                f"Falha ao enviar lote até a linha {ultima_do_lote}: {e}", resultado
+            ) from e
+        resultado["inseridas"] += inseridas
+        resultado["duplicadas"] += len(lote) - inseridas
+        resultado["ultima_linha"] = ultima_do_lote
+        lote.clear()
+        if progresso:
+            progresso(resultado)
+
+    for numero, bruta in linhas:
+        try:
+            linha = validar_linha(bruta)
+        except ValueError as e:
+            if numero >= a_partir_de:
+                resultado["invalidas"] += 1
+                if len(resultado["erros"]) < MAX_ERROS_GUARDADOS:
+                    resultado["erros"].append({"linha": numero, "erro": str(e)})
+            continue
+
+        # A ocorrência é contada também nas linhas puladas para manter as chaves estáveis
+        base = tuple(linha.values())
+        ocorrencias[base] = ocorrencias.get(base, 0) + 1
+        if numero < a_partir_de:
+            continue
+
+        linha["chave_idempotencia"] = chave_idempotencia(linha, ocorrencias[base])
+        # Depois da chave (que continua estável): grafia já cadastrada do motoboy
+        linha["nome"] = nomes.canonico(linha["nome"]) or linha["nome"]
+        nomes.adicionar(linha["nome"])
+        lote.append(linha)
+        resultado["lidas"] += 1
+        ultima_do_lote = numero
+
+        if len(lote) >= tamanho_lote:
+            enviar()
+
+    if lote:
+        enviar()
+    return resultado
+
+
+def concluir_importacao():
+    """
+    Após importar, descarta o cache de consultas e recarrega o índice de nomes
+    """
+    import database as db
+
+    db.get_cache().limpar()
+    db.get_indice_nomes.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa planilhas históricas para registros")
+    parser.add_argument("arquivo", help="Planilha .xlsx ou .csv")
+    parser.add_argument("--lote", type=int, default=500, help="Linhas por lote (padrão: 500)")
+    parser.add_argument("--a-partir-de", type=int, default=0, help="Retomar a partir desta linha")
+    parser.add_argument("--sqlite", help="Importar para um banco SQLite local em vez do backend configurado")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        import storage
+        backend = storage.SQLiteBackend(args.sqlite)
+    else:
+        import database as db
+        backend = db.get_backend()
+        if not backend:
+            print("❌ Backend de armazenamento indisponível (verifique os secrets)")
+            return 1
+
+    def mostrar(resultado):
+        print(
+            f"  linha {resultado['ultima_linha']}: {resultado['inseridas']} inseridas, "
+            f"{resultado['duplicadas']} já existentes, {resultado['invalidas']} inválidas",
+            flush=True
+        )
+
+    try:
+        resultado = importar(
+            ler_planilha(args.arquivo),
+            backend,
+            tamanho_lote=args.lote,
+            a_partir_de=args.a_partir_de,
+            progresso=mostrar,
+        )
+    except ErroImportacao as e:
+        print(f"❌ {e}")
+        print(f"   Retome com: --a-partir-de {e.resultado['ultima_linha'] + 1}")
+        return 1
+
+    for erro in resultado["erros"]:
+        print(f"  ⚠️ linha {erro['linha']}: {erro['erro']}")
+    print(f"✅ Importação concluída: {resultado['inseridas']} registros inseridos")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,236 @@
+"""
+Índice em memória de nomes de motoboys para autocomplete
+Lista ordenada + busca binária: custo independe do volume de registros
+Trigramas (como o pg_trgm) para achar nomes parecidos ao cadastrar
+"""
+import bisect
+import threading
+
+import utils
+
+# Semelhança mínima (Jaccard de trigramas) para sugerir um nome existente
+SEMELHANCA_MINIMA = 0.5
+# Semelhança atribuída a um nome contido em outro (sobrenome a mais ou a menos)
+SEMELHANCA_CONTIDO = 0.8
+
+
+def trigramas(chave):
+    """
+    Trigramas de cada palavra com duas lacunas antes e uma depois
+    (mesma regra do pg_trgm: "joao" -> "  j", " jo", "joa", "oao", "ao ")
+    """
+    resultado = set()
+    for palavra in chave.split():
+        texto = f"  {palavra} "
+        resultado.update(texto[i:i + 3] for i in range(len(texto) - 2))
+    return resultado
+
+
+def semelhanca(a, b):
+    """
+    Semelhança entre duas chaves: trigramas em comum / trigramas no total (0 a 1)
+    Um nome cujas palavras estão todas no outro ("joao" e "joao silva")
+    vale pelo menos SEMELHANCA_CONTIDO
+    """
+    ta, tb = trigramas(a), trigramas(b)
+    if not ta or not tb:
+        return 0.0
+    valor = len(ta & tb) / len(ta | tb)
+    pa, pb = set(a.split()), set(b.split())
+    if pa <= pb or pb <= pa:
+        valor = max(valor, SEMELHANCA_CONTIDO)
+    return valor
+
+
+def agrupar_duplicados(nomes, minimo=SEMELHANCA_MINIMA):
+    """
+    Encontra nomes que provavelmente são o mesmo motoboy
+
+    Args:
+        nomes: Nomes cadastrados
+        minimo: Semelhança mínima para os pares parecidos
+
+    Returns:
+        Dicionário com:
+            iguais: listas de nomes com a mesma chave ("João", "joao ")
+            semelhantes: tuplas (nome_a, nome_b, semelhanca) com chaves
+                diferentes, do par mais parecido para o menos parecido
+    """
+    por_chave = {}
+    for nome in nomes:
+        if nome:
+            por_chave.setdefault(utils.normalizar_chave_nome(nome), []).append(nome)
+
+    # Índice invertido: só compara chaves que têm algum trigrama em comum
+    postagens = {}
+    for chave in por_chave:
+        for trigrama in trigramas(chave):
+            postagens.setdefault(trigrama, []).append(chave)
+
+    pares = {}
+    for chave in por_chave:
+        for trigrama in trigramas(chave):
+            for outra in postagens[trigrama]:
+                if outra > chave and (chave, outra) not in pares:
+                    pares[(chave, outra)] = semelhanca(chave, outra)
+
+    semelhantes = [
+        (por_chave[a][0], por_chave[b][0], round(valor, 2))
+        for (a, b), valor in pares.items()
+        if valor >= minimo
+    ]
+    semelhantes.sort(key=lambda par: (-par[2], par[0], par[1]))
+    return {
+        "iguais": [sorted(grupo) for grupo in por_chave.values() if len(grupo) > 1],
+        "semelhantes": semelhantes,
+    }
+
+
+def escolher_nome(grupo):
+    """
+    Grafia que fica ao unificar nomes com a mesma chave: a mais completa
+    (com acentos e iniciais maiúsculas), depois a primeira em ordem alfabética
+    """
+    def pontos(nome):
+        nome = utils.normalizar_nome(nome)
+        acentos = sum(1 for c in nome if not c.isascii())
+        iniciais = sum(1 for palavra in nome.split() if palavra[:1].isupper())
+        return (-acentos, -iniciais, nome)
+    return min(grupo, key=pontos)
+
+
+class IndiceNomes:
+    """
+    Índice de prefixo sobre os nomes da tabela motoboys
+
+    As chaves são os nomes normalizados (utils.normalizar_chave_nome),
+    mantidas ordenadas; a busca por prefixo localiza o início com bisect e
+    percorre só os resultados. Cada chave guarda o primeiro nome visto, que
+    é o nome usado nas gravações (canonico); carregado em ordem de cadastro
+    (buscar_nomes_motoboys), é o mesmo que o trigger registrar_motoboy mantém.
+    """
+
+    def __init__(self, nomes=()):
+        self._lock = threading.Lock()
+        self._chaves = []
+        self._nomes = {}
+        self._trigramas = {}
+        self._lista_cache = None
+        self.carregar(nomes)
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def __contains__(self, nome):
+        return self._chave(nome) in self._nomes
+
+    @staticmethod
+    def _chave(nome):
+        return utils.normalizar_chave_nome(nome)
+
+    def _indexar_trigramas(self, chave):
+        for trigrama in trigramas(chave):
+            self._trigramas.setdefault(trigrama, set()).add(chave)
+
+    def carregar(self, nomes):
+        """
+        Substitui o conteúdo do índice pelos nomes informados
+        """
+        with self._lock:
+            self._nomes = {}
+            for nome in nomes:
+                if nome:
+                    self._nomes.setdefault(self._chave(nome), nome)
+            self._chaves = sorted(self._nomes)
+            self._trigramas = {}
+            for chave in self._chaves:
+                self._indexar_trigramas(chave)
+            self._lista_cache = None
+
+    def adicionar(self, nome):
+        """
+        Adiciona um nome (O(log n) para localizar + inserção na lista)
+
+        Returns:
+            True se o nome era novo
+        """
+        if not nome:
+            return False
+        chave = self._chave(nome)
+        with self._lock:
+            if chave in self._nomes:
+                return False
+            self._nomes[chave] = nome
+            bisect.insort(self._chaves, chave)
+            self._indexar_trigramas(chave)
+            self._lista_cache = None
+            return True
+
+    def canonico(self, nome):
+        """
+        Nome já cadastrado com a mesma chave ("joao " -> "João")
+
+        Returns:
+            Nome cadastrado ou None se a chave é nova
+        """
+        with self._lock:
+            return self._nomes.get(self._chave(nome))
+
+    def buscar_semelhantes(self, nome, limite=5, minimo=SEMELHANCA_MINIMA):
+        """
+        Nomes cadastrados parecidos com `nome` (erros de digitação, sobrenome
+        a mais ou a menos); compara só as chaves com algum trigrama em comum
+
+        Returns:
+            Lista com até `limite` nomes, do mais parecido para o menos
+            (sem o próprio nome, se já cadastrado)
+        """
+        chave = self._chave(nome)
+        with self._lock:
+            candidatas = set()
+            for trigrama in trigramas(chave):
+                candidatas.update(self._trigramas.get(trigrama, ()))
+            candidatas.discard(chave)
+            pontuadas = [(semelhanca(chave, outra), outra) for outra in candidatas]
+            pontuadas = sorted(
+                (item for item in pontuadas if item[0] >= minimo),
+                key=lambda item: (-item[0], item[1])
+            )
+            return [self._nomes[outra] for _, outra in pontuadas[:limite]]
+
+    def remover(self, nome):
+        """
+        Remove um nome (após unificar motoboys duplicados)
+        """
+        chave = self._chave(nome)
+        with self._lock:
+            if self._nomes.get(chave) != nome:
+                return
+            del self._nomes[chave]
+            self._chaves.remove(chave)
+            for trigrama in trigramas(chave):
+                self._trigramas.get(trigrama, set()).discard(chave)
+            self._lista_cache = None
+
+    def buscar_prefixo(self, prefixo, limite=10):
+        """
+        Retorna até `limite` nomes que começam com o prefixo (sem diferenciar maiúsculas)
+        """
+        chave_prefixo = self._chave(prefixo)
+        with self._lock:
+            inicio = bisect.bisect_left(self._chaves, chave_prefixo)
+            resultado = []
+            for chave in self._chaves[inicio:inicio + limite]:
+                if not chave.startswith(chave_prefixo):
+                    break
+                resultado.append(self._nomes[chave])
+            return resultado
+
+    def nomes(self):
+        """
+        Lista completa ordenada (reaproveitada até a próxima alteração)
+        """
+        with self._lock:
+            if self._lista_cache is None:
+                self._lista_cache = [self._nomes[chave] for chave in self._chaves]
+            return list(self._lista_cache)
@@ -0,0 +1,315 @@
+"""
+Instrumentação do caminho quente (consultas do database.py e assistente de IA)
+Mede latência, linhas e bytes por função e os totais de cada rerun
+
+Custo por chamada: dois perf_counter, um lock e, para listas, a serialização
+de uma única linha (o tamanho do resto é estimado a partir dela)
+"""
+import bisect
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Limites (segundos) do histograma de latência, no formato do Prometheus
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_contexto = threading.local()
+
+
+def medir_resultado(resultado):
+    """
+    Estimativa barata de (linhas, bytes) de um resultado
+
+    Listas: tamanho da primeira linha em JSON x número de linhas
+    """
+    if resultado is None:
+        return 0, 0
+    if isinstance(resultado, str):
+        return 1, len(resultado.encode("utf-8"))
+    if isinstance(resultado, (list, tuple)):
+        if not resultado:
+            return 0, 0
+        return len(resultado), len(json.dumps(resultado[0], default=str)) * len(resultado)
+    if isinstance(resultado, dict):
+        return 1, len(json.dumps(resultado, default=str))
+    return 1, 0
+
+
+class EstatisticaFuncao:
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.segundos = 0.0
+        self.segundos_max = 0.0
+        self.linhas = 0
+        self.bytes = 0
+        self.baldes = [0] * (len(LIMITES_LATENCIA) + 1)
+
+    def registrar(self, segundos, linhas, tamanho, erro):
+        self.chamadas += 1
+        self.erros += int(erro)
+        self.segundos += segundos
+        self.segundos_max = max(self.segundos_max, segundos)
+        self.linhas += linhas
+        self.bytes += tamanho
+        self.baldes[bisect.bisect_left(LIMITES_LATENCIA, segundos)] += 1
+
+    def para_dict(self):
+        return {
+            "chamadas": self.chamadas,
+            "erros": self.erros,
+            "ms_total": round(self.segundos * 1000, 2),
+            "ms_medio": round(self.segundos * 1000 / self.chamadas, 2) if self.chamadas else 0.0,
+            "ms_max": round(self.segundos_max * 1000, 2),
+            "linhas": self.linhas,
+            "bytes": self.bytes,
+        }
+
+
+class Metricas:
+    """
+    Registro de métricas do processo (compartilhado por todas as sessões)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._funcoes = {}
+        self.ativo = True
+
+    def registrar(self, nome, segundos, linhas=0, tamanho=0, erro=False):
+        with self._lock:
+            estatistica = self._funcoes.get(nome)
+            if estatistica is None:
+                estatistica = self._funcoes[nome] = EstatisticaFuncao()
+            estatistica.registrar(segundos, linhas, tamanho, erro)
+
+    def por_funcao(self):
+        """
+        Returns:
+            Dicionário nome -> chamadas, erros, ms_total, ms_medio, ms_max, linhas, bytes
+        """
+        with self._lock:
+            return {nome: e.para_dict() for nome, e in sorted(self._funcoes.items())}
+
+    def limpar(self):
+        with self._lock:
+            self._funcoes.clear()
+
+    def exportar_jsonl(self):
+        """
+        Uma linha JSON por função, com carimbo de tempo (para anexar a um arquivo de log)
+        """
+        agora = time.time()
+        return "\n".join(
+            json.dumps({"ts": round(agora, 3), "funcao": nome, **dados}, ensure_ascii=False)
+            for nome, dados in self.por_funcao().items()
+        )
+
+    def exportar_prometheus(self, prefixo="motoboys"):
+        """
+        Texto no formato de exposição do Prometheus
+        """
+        with self._lock:
+            funcoes = sorted(self._funcoes.items())
+            linhas = []
+            # Cada métrica em um único bloco, precedido do seu TYPE
+            for metrica, atributo in (
+                ("chamadas_total", "chamadas"),
+                ("erros_total", "erros"),
+                ("linhas_total", "linhas"),
+                ("bytes_total", "bytes"),
+            ):
+                linhas.append(f"# TYPE {prefixo}_{metrica} counter")
+                for nome, e in funcoes:
+                    linhas.append(f'{prefixo}_{metrica}{{funcao="{nome}"}} {getattr(e, atributo)}')
+
+            linhas.append(f"# TYPE {prefixo}_latencia_segundos histogram")
+            for nome, e in funcoes:
+                rotulo = f'funcao="{nome}"'
+                acumulado = 0
+                for limite, quantidade in zip(LIMITES_LATENCIA, e.baldes):
+                    acumulado += quantidade
+                    linhas.append(f'{prefixo}_latencia_segundos_bucket{{{rotulo},le="{limite}"}} {acumulado}')
+                linhas.append(f'{prefixo}_latencia_segundos_bucket{{{rotulo},le="+Inf"}} {e.chamadas}')
+                linhas.append(f"{prefixo}_latencia_segundos_sum{{{rotulo}}} {e.segundos:.6f}")
+                linhas.append(f"{prefixo}_latencia_segundos_count{{{rotulo}}} {e.chamadas}")
+        return "\n".join(linhas) + "\n"
+
+
+METRICAS = Metricas()
+
+
+# ==================== TOTAIS POR RERUN ====================
+
+class TotaisRerun:
+    """
+    Soma das chamadas instrumentadas de um rerun (só as externas: uma
+    função instrumentada chamada por outra não é contada duas vezes)
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.chamadas = 0
+        self.segundos = 0.0
+        self.linhas = 0
+        self.bytes = 0
+        self.por_funcao = {}
+
+    def registrar(self, nome, segundos, linhas, tamanho):
+        self.chamadas += 1
+        self.segundos += segundos
+        self.linhas += linhas
+        self.bytes += tamanho
+        self.por_funcao[nome] = self.por_funcao.get(nome, 0.0) + segundos
+
+    def resumo(self):
+        return {
+            "chamadas": self.chamadas,
+            "ms_instrumentado": round(self.segundos * 1000, 2),
+            "ms_decorrido": round((time.perf_counter() - self.inicio) * 1000, 2),
+            "linhas": self.linhas,
+            "bytes": self.bytes,
+            "ms_por_funcao": {n: round(s * 1000, 2) for n, s in self.por_funcao.items()},
+        }
+
+
+@contextmanager
+def rerun():
+    """
+    Acumula os totais das chamadas feitas nesta thread até o fim do bloco
+    (aninhado: reaproveita os totais já abertos)
+    """
+    atual = getattr(_contexto, "rerun", None)
+    if atual is not None:
+        yield atual
+        return
+    _contexto.rerun = TotaisRerun()
+    try:
+        yield _contexto.rerun
+    finally:
+        _contexto.ultimo_rerun = _contexto.rerun
+        _contexto.rerun = None
+
+
+def totais_rerun():
+    """
+    Totais do rerun em andamento nesta thread (ou do último concluído)
+
+    Returns:
+        Dicionário de TotaisRerun.resumo() ou None
+    """
+    totais = getattr(_contexto, "rerun", None) or getattr(_contexto, "ultimo_rerun", None)
+    return totais.resumo() if totais else None
+
+
+# ==================== DECORADOR ====================
+
+class _Chamada:
+    """
+    Chamada instrumentada em execução (marcada por registrar_erro)
+    """
+    __slots__ = ("erro",)
+
+    def __init__(self):
+        self.erro = False
+
+
+def _pilha():
+    pilha = getattr(_contexto, "chamadas", None)
+    if pilha is None:
+        pilha = _contexto.chamadas = []
+    return pilha
+
+
+def registrar_erro():
+    """
+    Conta como erro a chamada instrumentada em execução nesta thread
+
+    Para funções que tratam a exceção (st.error e valor padrão) em vez de
+    propagá-la: sem isto o decorador só vê um retorno normal.
+    """
+    pilha = getattr(_contexto, "chamadas", None)
+    if pilha:
+        pilha[-1].erro = True
+
+
+def _registrar(nome, inicio, resultado, erro, externa):
+    segundos = time.perf_counter() - inicio
+    linhas, tamanho = medir_resultado(resultado)
+    METRICAS.registrar(nome, segundos, linhas, tamanho, erro)
+    totais = getattr(_contexto, "rerun", None)
+    if externa and totais is not None:
+        totais.registrar(nome, segundos, linhas, tamanho)
+
+
+def medir(nome=None):
+    """
+    Decorador: mede latência, linhas e bytes de cada chamada
+
+    Geradores são medidos até serem consumidos por completo (bytes = soma
+    dos trechos de texto produzidos). Exceções propagadas contam como erro;
+    as tratadas dentro da função, só se ela chamar registrar_erro().
+
+    Args:
+        nome: Nome da métrica (padrão: módulo.função)
+    """
+    def decorador(funcao):
+        rotulo = nome or f"{funcao.__module__}.{funcao.__name__}"
+
+        if inspect.isgeneratorfunction(funcao):
+            @functools.wraps(funcao)
+            def gerador(*args, **kwargs):
+                if not METRICAS.ativo:
+                    yield from funcao(*args, **kwargs)
+                    return
+                externa = not getattr(_contexto, "profundidade", 0)
+                inicio = time.perf_counter()
+                produzido = []
+                chamada = _Chamada()
+                iterador = funcao(*args, **kwargs)
+                try:
+                    while True:
+                        # Na pilha só enquanto o corpo do gerador executa
+                        _pilha().append(chamada)
+                        try:
+                            trecho = next(iterador)
+                        except StopIteration:
+                            return
+                        finally:
+                            _pilha().pop()
+                        if isinstance(trecho, str):
+                            produzido.append(trecho)
+                        yield trecho
+                except Exception:
+                    chamada.erro = True
+                    raise
+                finally:
+                    iterador.close()
+                    _registrar(rotulo, inicio, "".join(produzido), chamada.erro, externa)
+            return gerador
+
+        @functools.wraps(funcao)
+        def executar(*args, **kwargs):
+            if not METRICAS.ativo:
+                return funcao(*args, **kwargs)
+            profundidade = getattr(_contexto, "profundidade", 0)
+            _contexto.profundidade = profundidade + 1
+            inicio = time.perf_counter()
+            resultado = None
+            chamada = _Chamada()
+            _pilha().append(chamada)
+            try:
+                resultado = funcao(*args, **kwargs)
+                return resultado
+            except Exception:
+                chamada.erro = True
+                raise
+            finally:
+                _pilha().pop()
+                _contexto.profundidade = profundidade
+                _registrar(rotulo, inicio, resultado, chamada.erro, profundidade == 0)
+        return executar
+    return decorador
@@ -0,0 +1,123 @@
+-- ================================================
+-- MIGRAÇÃO: registros PARTICIONADA POR MÊS
+-- ================================================
+-- Para bancos criados antes do particionamento.
+-- 1. Execute o schema.sql atualizado (cria as funções de partição)
+-- 2. Execute este script no SQL Editor do Supabase
+--
+-- Copia os registros (mesmos ids) para a nova tabela particionada,
+-- uma partição por mês com dados, e recria índices e triggers.
+-- resumo_diario e folha_semanal não mudam (a cópia é feita antes dos
+-- triggers existirem). Roda em uma transação: em caso de erro nada muda.
+-- Pode ser executado de novo: se registros já é particionada, não faz nada.
+-- ================================================
+
+BEGIN;
+
+DO $$
+DECLARE
+    v_indice RECORD;
+    v_mes DATE;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'registros'::regclass) THEN
+        RAISE NOTICE 'registros já é particionada; nada a fazer';
+        RETURN;
+    END IF;
+
+    IF to_regproc('criar_particao_registros') IS NULL THEN
+        RAISE EXCEPTION 'Execute o schema.sql atualizado antes desta migração';
+    END IF;
+
+    -- Tabela antiga sai do caminho (nomes de índices são globais no schema)
+    ALTER TABLE registros RENAME TO registros_sem_particao;
+    FOR v_indice IN
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = 'public' AND tablename = 'registros_sem_particao'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', v_indice.indexname, v_indice.indexname || '_antigo');
+    END LOOP;
+    ALTER SEQUENCE registros_id_seq OWNED BY NONE;
+
+    CREATE TABLE registros (
+        id BIGINT NOT NULL DEFAULT nextval('registros_id_seq'),
+        nome VARCHAR(255) NOT NULL,
+        data DATE NOT NULL,
+        periodo VARCHAR(50) NOT NULL CHECK (periodo IN ('Manhã', 'Noite')),
+        tipo VARCHAR(50) NOT NULL CHECK (tipo IN ('Fixo', 'Freelancer')),
+        entregas INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        chave_idempotencia VARCHAR(64),
+        PRIMARY KEY (id, data)
+    ) PARTITION BY RANGE (data);
+    ALTER SEQUENCE registros_id_seq OWNED BY registros.id;
+
+    CREATE TABLE registros_padrao PARTITION OF registros DEFAULT;
+
+    -- Uma partição por mês com dados, mais o mês atual e os próximos
+    FOR v_mes IN
+        SELECT DISTINCT date_trunc('month', data)::DATE
+        FROM registros_sem_particao
+        ORDER BY 1
+    LOOP
+        PERFORM criar_particao_registros(v_mes);
+    END LOOP;
+    PERFORM garantir_particoes_registros();
+
+    INSERT INTO registros (
+        id, nome, data, periodo, tipo, entregas,
+        created_at, updated_at, chave_idempotencia
+    )
+    SELECT
+        id, nome, data, periodo, tipo, entregas,
+        created_at, updated_at, chave_idempotencia
+    FROM registros_sem_particao;
+
+    DROP TABLE registros_sem_particao;
+
+    -- Índices (criados em cada partição)
+    CREATE UNIQUE INDEX idx_registros_chave_data ON registros(chave_idempotencia, data);
+    CREATE INDEX idx_registros_data ON registros(data);
+    CREATE INDEX idx_registros_data_id ON registros(data, id);
+    CREATE INDEX idx_registros_nome ON registros(nome);
+    CREATE INDEX idx_registros_tipo ON registros(tipo);
+    CREATE INDEX idx_registros_created_at ON registros(created_at DESC);
+
+    -- Triggers (mesmas funções de schema.sql)
+    CREATE TRIGGER update_registros_updated_at
+        BEFORE UPDATE ON registros
+        FOR EACH ROW
+        EXECUTE FUNCTION update_updated_at_column();
+
+    CREATE TRIGGER registros_resumo_diario
+        AFTER INSERT OR UPDATE OR DELETE ON registros
+        FOR EACH ROW
+        EXECUTE FUNCTION atualizar_resumo_diario();
+
+    CREATE TRIGGER registros_registrar_motoboy
+        BEFORE INSERT OR UPDATE OF nome, data ON registros
+        FOR EACH ROW
+        EXECUTE FUNCTION registrar_motoboy();
+
+    -- Tempo real
+    ALTER TABLE registros REPLICA IDENTITY FULL;
+    ALTER TABLE registros_padrao REPLICA IDENTITY FULL;
+    IF EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime') THEN
+        ALTER PUBLICATION supabase_realtime SET (publish_via_partition_root = true);
+        ALTER PUBLICATION supabase_realtime ADD TABLE registros;
+    END IF;
+
+    COMMENT ON TABLE registros IS 'Registros diários de entregas dos motoboys (particionada por mês)';
+END $$;
+
+COMMIT;
+
+-- Conferir as partições com registros e quantos registros cada uma tem
+SELECT
+    tableoid::regclass AS particao,
+    MIN(data) AS primeiro_dia,
+    MAX(data) AS ultimo_dia,
+    COUNT(*) AS registros
+FROM registros
+GROUP BY tableoid
+ORDER BY MIN(data);
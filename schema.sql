@@ -6,23 +6,236 @@
 -- ================================================
 
 -- Tabela de Registros de Entregas
+-- Particionada por mês (registros_AAAA_MM): consultas por período só leem as
+-- partições do intervalo (partition pruning) e meses antigos podem ser
+-- arquivados em Parquet sem DELETE linha a linha (arquivamento.py).
+-- Bancos criados antes do particionamento: executar migracao_particionamento.sql
 CREATE TABLE IF NOT EXISTS registros (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     nome VARCHAR(255) NOT NULL,
     data DATE NOT NULL,
     periodo VARCHAR(50) NOT NULL CHECK (periodo IN ('Manhã', 'Noite')),
     tipo VARCHAR(50) NOT NULL CHECK (tipo IN ('Fixo', 'Freelancer')),
     entregas INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    chave_idempotencia VARCHAR(64),
+    -- Em tabela particionada a chave primária precisa incluir a coluna de partição
+    PRIMARY KEY (id, data)
+) PARTITION BY RANGE (data);
+
+-- Chave de idempotência para importações e gravações em lote (NULL nos registros manuais)
+-- Única junto com a data (a chave já identifica a data da linha de origem)
+ALTER TABLE registros ADD COLUMN IF NOT EXISTS chave_idempotencia VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_registros_chave_data ON registros(chave_idempotencia, data);
 
 -- Índices para melhor performance
 CREATE INDEX IF NOT EXISTS idx_registros_data ON registros(data);
+CREATE INDEX IF NOT EXISTS idx_registros_data_id ON registros(data, id);
 CREATE INDEX IF NOT EXISTS idx_registros_nome ON registros(nome);
 CREATE INDEX IF NOT EXISTS idx_registros_tipo ON registros(tipo);
 CREATE INDEX IF NOT EXISTS idx_registros_created_at ON registros(created_at DESC);
 
+-- Partições mensais de registros
+-- registros_padrao (DEFAULT) recebe datas sem partição própria (lançamentos
+-- muito antigos ou muito à frente); criar a partição do mês move essas linhas
+-- As funções de manutenção rodam como o dono das tabelas (SECURITY DEFINER,
+-- search_path fixo) e só a chave service_role pode executá-las (veja o fim
+-- desta seção); o app, com a chave anon, não chama nenhuma delas
+CREATE OR REPLACE FUNCTION criar_particao_registros(p_mes DATE)
+RETURNS VOID
+SECURITY DEFINER SET search_path = public, pg_temp
+AS $$
+DECLARE
+    v_inicio DATE := date_trunc('month', p_mes)::DATE;
+    v_fim DATE := (date_trunc('month', p_mes) + INTERVAL '1 month')::DATE;
+    v_nome TEXT := 'registros_' || to_char(p_mes, 'YYYY_MM');
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'registros'::regclass)
+       OR to_regclass(v_nome) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    -- Linhas do mês que caíram na partição padrão (o Postgres recusa criar
+    -- a partição enquanto elas estiverem lá); os triggers mantêm resumo_diario
+    DROP TABLE IF EXISTS pg_temp._registros_mover;
+    CREATE TEMP TABLE _registros_mover (LIKE registros);
+    WITH movidas AS (
+        DELETE FROM registros_padrao
+        WHERE data >= v_inicio AND data < v_fim
+        RETURNING *
+    )
+    INSERT INTO pg_temp._registros_mover SELECT * FROM movidas;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF registros FOR VALUES FROM (%L) TO (%L)',
+        v_nome, v_inicio, v_fim
+    );
+    EXECUTE format('ALTER TABLE %I REPLICA IDENTITY FULL', v_nome);
+
+    INSERT INTO registros SELECT * FROM pg_temp._registros_mover;
+    DROP TABLE pg_temp._registros_mover;
+END;
+$$ language 'plpgsql';
+
+-- Garante as partições do mês atual e dos próximos meses
+-- (agendada com pg_cron no fim desta seção; também chamada por arquivamento.py)
+CREATE OR REPLACE FUNCTION garantir_particoes_registros(p_meses_a_frente INTEGER DEFAULT 3)
+RETURNS VOID
+SECURITY DEFINER SET search_path = public, pg_temp
+AS $$
+BEGIN
+    FOR i IN 0..p_meses_a_frente LOOP
+        PERFORM criar_particao_registros((date_trunc('month', CURRENT_DATE) + make_interval(months => i))::DATE);
+    END LOOP;
+END;
+$$ language 'plpgsql';
+
+-- Remove um mês de registros já gravado em Parquet por arquivamento.py
+-- p_esperado: linhas gravadas no arquivo; se o mês mudou nesse meio tempo,
+-- nada é removido. A partição inteira sai com DROP (sem DELETE linha a
+-- linha); resumo_diario e folha_semanal do mês são preservados, então KPIs,
+-- folha e tendências continuam cobrindo o período arquivado
+CREATE OR REPLACE FUNCTION arquivar_mes_registros(p_mes DATE, p_esperado BIGINT)
+RETURNS BIGINT
+SECURITY DEFINER SET search_path = public, pg_temp
+AS $$
+DECLARE
+    v_inicio DATE := date_trunc('month', p_mes)::DATE;
+    v_fim DATE := (date_trunc('month', p_mes) + INTERVAL '1 month')::DATE;
+    v_nome TEXT := 'registros_' || to_char(p_mes, 'YYYY_MM');
+    v_particao BOOLEAN := to_regclass('registros_' || to_char(p_mes, 'YYYY_MM')) IS NOT NULL;
+    v_total BIGINT;
+    v_sem_particao BOOLEAN;
+BEGIN
+    -- Bloqueia novas escritas no mês enquanto confere e remove
+    IF v_particao THEN
+        EXECUTE format('LOCK TABLE %I IN EXCLUSIVE MODE', v_nome);
+    END IF;
+    IF to_regclass('registros_padrao') IS NOT NULL THEN
+        LOCK TABLE registros_padrao IN EXCLUSIVE MODE;
+    ELSE
+        LOCK TABLE registros IN EXCLUSIVE MODE;
+    END IF;
+
+    SELECT COUNT(*) INTO v_total FROM registros WHERE data >= v_inicio AND data < v_fim;
+    IF v_total <> p_esperado THEN
+        RAISE EXCEPTION 'Registros de % mudaram durante o arquivamento (% no banco, % no arquivo)',
+            to_char(v_inicio, 'YYYY-MM'), v_total, p_esperado;
+    END IF;
+
+    IF v_particao THEN
+        EXECUTE format('ALTER TABLE registros DETACH PARTITION %I', v_nome);
+        EXECUTE format('DROP TABLE %I', v_nome);
+    END IF;
+
+    -- Linhas do mês na partição padrão (ou tabela ainda sem partições):
+    -- o DELETE dispara os triggers, então o resumo é guardado e restaurado
+    SELECT EXISTS (SELECT 1 FROM registros WHERE data >= v_inicio AND data < v_fim)
+    INTO v_sem_particao;
+    IF v_sem_particao THEN
+        DROP TABLE IF EXISTS pg_temp._resumo_preservado;
+        CREATE TEMP TABLE _resumo_preservado AS
+        SELECT * FROM resumo_diario WHERE data >= v_inicio AND data < v_fim;
+
+        DELETE FROM registros WHERE data >= v_inicio AND data < v_fim;
+        DELETE FROM resumo_diario WHERE data >= v_inicio AND data < v_fim;
+        INSERT INTO resumo_diario SELECT * FROM pg_temp._resumo_preservado;
+        DROP TABLE pg_temp._resumo_preservado;
+    END IF;
+
+    RETURN v_total;
+END;
+$$ language 'plpgsql';
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'registros'::regclass) THEN
+        CREATE TABLE IF NOT EXISTS registros_padrao PARTITION OF registros DEFAULT;
+        ALTER TABLE registros_padrao REPLICA IDENTITY FULL;
+        PERFORM garantir_particoes_registros();
+    END IF;
+END $$;
+
+-- Manutenção de partições fora do alcance da chave anon (o Supabase concede
+-- EXECUTE em funções novas de public a anon e authenticated)
+REVOKE EXECUTE ON FUNCTION criar_particao_registros(DATE) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION garantir_particoes_registros(INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION arquivar_mes_registros(DATE, BIGINT) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION criar_particao_registros(DATE) FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION garantir_particoes_registros(INTEGER) FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION arquivar_mes_registros(DATE, BIGINT) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION garantir_particoes_registros(INTEGER) TO service_role;
+        GRANT EXECUTE ON FUNCTION arquivar_mes_registros(DATE, BIGINT) TO service_role;
+    END IF;
+END $$;
+
+-- Partição do mês seguinte criada todo dia, sem depender do arquivamento
+-- (sem partição própria, lançamentos novos acumulam em registros_padrao).
+-- Ative pg_cron em Database > Extensions antes de executar este script
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule(
+            'garantir-particoes-registros', '0 3 * * *',
+            'SELECT garantir_particoes_registros()'
+        );
+    END IF;
+END $$;
+
+-- Tabela de Motoboys (dimensão mantida automaticamente pelos registros)
+CREATE TABLE IF NOT EXISTS motoboys (
+    id BIGSERIAL PRIMARY KEY,
+    nome VARCHAR(255) NOT NULL UNIQUE,
+    ultimo_registro DATE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Índice para busca por prefixo (autocomplete)
+CREATE INDEX IF NOT EXISTS idx_motoboys_nome_prefixo ON motoboys(nome text_pattern_ops);
+
+-- Chave de identidade: nome sem acentos, em minúsculas e com espaços colapsados
+-- ("João", "joao " e "JOAO" são o mesmo motoboy). Mesma regra de
+-- utils.normalizar_chave_nome para o alfabeto do português
+CREATE OR REPLACE FUNCTION chave_nome(p_nome TEXT)
+RETURNS TEXT AS $$
+    SELECT lower(translate(
+        regexp_replace(btrim(p_nome), '\s+', ' ', 'g'),
+        'ÁÀÂÃÄÅáàâãäåÉÈÊËéèêëÍÌÎÏíìîïÓÒÔÕÖóòôõöÚÙÛÜúùûüÇçÑñÝýÿ',
+        'AAAAAAaaaaaaEEEEeeeeIIIIiiiiOOOOOoooooUUUUuuuuCcNnYyy'
+    ));
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE motoboys ADD COLUMN IF NOT EXISTS chave VARCHAR(255);
+UPDATE motoboys SET chave = chave_nome(nome) WHERE chave IS NULL;
+CREATE INDEX IF NOT EXISTS idx_motoboys_chave ON motoboys(chave);
+
+-- Grafias unificadas por mesclar_motoboys (nome antigo -> nome atual)
+-- Registros já arquivados em Parquet mantêm a grafia antiga; a leitura dos
+-- arquivos troca pelo nome atual (arquivamento.ler_registros)
+CREATE TABLE IF NOT EXISTS motoboys_mesclados (
+    nome VARCHAR(255) PRIMARY KEY,
+    destino VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Resumo diário (mantido por trigger): entregas somadas por dia/motoboy/período/tipo
+-- Relatórios e KPIs leem daqui, com custo proporcional a dias x motoboys
+CREATE TABLE IF NOT EXISTS resumo_diario (
+    data DATE NOT NULL,
+    nome VARCHAR(255) NOT NULL,
+    periodo VARCHAR(50) NOT NULL,
+    tipo VARCHAR(50) NOT NULL,
+    entregas BIGINT NOT NULL DEFAULT 0,
+    registros INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (data, nome, periodo, tipo)
+);
+
+CREATE INDEX IF NOT EXISTS idx_resumo_diario_nome ON resumo_diario(nome, data);
+
 -- Tabela de Configurações
 CREATE TABLE IF NOT EXISTS configuracoes (
     id BIGSERIAL PRIMARY KEY,
@@ -44,11 +257,422 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+DROP TRIGGER IF EXISTS update_registros_updated_at ON registros;
 CREATE TRIGGER update_registros_updated_at
     BEFORE UPDATE ON registros
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Trigger para manter resumo_diario a cada insert/update/delete em registros
+CREATE OR REPLACE FUNCTION atualizar_resumo_diario()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE resumo_diario
+        SET entregas = entregas - OLD.entregas,
+            registros = registros - 1
+        WHERE data = OLD.data AND nome = OLD.nome
+          AND periodo = OLD.periodo AND tipo = OLD.tipo;
+
+        DELETE FROM resumo_diario
+        WHERE data = OLD.data AND nome = OLD.nome
+          AND periodo = OLD.periodo AND tipo = OLD.tipo
+          AND registros <= 0;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros)
+        VALUES (NEW.data, NEW.nome, NEW.periodo, NEW.tipo, NEW.entregas, 1)
+        ON CONFLICT (data, nome, periodo, tipo) DO UPDATE
+            SET entregas = resumo_diario.entregas + EXCLUDED.entregas,
+                registros = resumo_diario.registros + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS registros_resumo_diario ON registros;
+CREATE TRIGGER registros_resumo_diario
+    AFTER INSERT OR UPDATE OR DELETE ON registros
+    FOR EACH ROW
+    EXECUTE FUNCTION atualizar_resumo_diario();
+
+-- Reconstrução completa (manutenção; idempotente)
+CREATE OR REPLACE FUNCTION reconstruir_resumo_diario()
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM resumo_diario;
+    INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros)
+    SELECT data, nome, periodo, tipo, SUM(entregas), COUNT(*)
+    FROM registros
+    GROUP BY data, nome, periodo, tipo;
+END;
+$$ language 'plpgsql';
+
+-- Popular resumo_diario na primeira execução
+INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros)
+SELECT data, nome, periodo, tipo, SUM(entregas), COUNT(*)
+FROM registros
+WHERE NOT EXISTS (SELECT 1 FROM resumo_diario)
+GROUP BY data, nome, periodo, tipo;
+
+-- Folha semanal: totais de cada motoboy por semana (segunda a domingo),
+-- mantidos por trigger a partir de resumo_diario. Uma escrita recalcula só
+-- os baldes (nome, semana) que tocou — o antigo e o novo quando data ou
+-- nome mudam — e os relatórios somam semanas em vez de dias.
+-- linhas/linhas_fixo (linhas de resumo_diario) definem o tipo Fixo/Freelancer/Misto
+CREATE TABLE IF NOT EXISTS folha_semanal (
+    nome VARCHAR(255) NOT NULL,
+    semana_inicio DATE NOT NULL,
+    dias_trabalhados INTEGER NOT NULL DEFAULT 0,
+    total_entregas BIGINT NOT NULL DEFAULT 0,
+    dias_fixo INTEGER NOT NULL DEFAULT 0,
+    entregas_fixo BIGINT NOT NULL DEFAULT 0,
+    linhas INTEGER NOT NULL DEFAULT 0,
+    linhas_fixo INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (nome, semana_inicio)
+);
+
+CREATE INDEX IF NOT EXISTS idx_folha_semanal_semana ON folha_semanal(semana_inicio);
+
+-- Recalcula um balde a partir de resumo_diario (até 7 dias x períodos x tipos)
+CREATE OR REPLACE FUNCTION recalcular_folha_semanal(p_nome VARCHAR, p_semana DATE)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM folha_semanal WHERE nome = p_nome AND semana_inicio = p_semana;
+
+    INSERT INTO folha_semanal (
+        nome, semana_inicio, dias_trabalhados, total_entregas,
+        dias_fixo, entregas_fixo, linhas, linhas_fixo
+    )
+    SELECT
+        p_nome,
+        p_semana,
+        COUNT(DISTINCT r.data),
+        COALESCE(SUM(r.entregas), 0),
+        COUNT(DISTINCT r.data) FILTER (WHERE r.tipo = 'Fixo'),
+        COALESCE(SUM(r.entregas) FILTER (WHERE r.tipo = 'Fixo'), 0),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE r.tipo = 'Fixo')
+    FROM resumo_diario r
+    WHERE r.nome = p_nome AND r.data BETWEEN p_semana AND p_semana + 6
+    HAVING COUNT(*) > 0;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION atualizar_folha_semanal()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM recalcular_folha_semanal(OLD.nome, date_trunc('week', OLD.data)::DATE);
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        PERFORM recalcular_folha_semanal(NEW.nome, date_trunc('week', NEW.data)::DATE);
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Linha que mudou de motoboy ou de semana: recalcular também o balde novo
+        IF NEW.nome IS DISTINCT FROM OLD.nome
+           OR date_trunc('week', NEW.data) <> date_trunc('week', OLD.data) THEN
+            PERFORM recalcular_folha_semanal(NEW.nome, date_trunc('week', NEW.data)::DATE);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS resumo_diario_folha_semanal ON resumo_diario;
+CREATE TRIGGER resumo_diario_folha_semanal
+    AFTER INSERT OR UPDATE OR DELETE ON resumo_diario
+    FOR EACH ROW
+    EXECUTE FUNCTION atualizar_folha_semanal();
+
+-- Reconstrução completa (manutenção; idempotente)
+CREATE OR REPLACE FUNCTION reconstruir_folha_semanal()
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM folha_semanal;
+    INSERT INTO folha_semanal (
+        nome, semana_inicio, dias_trabalhados, total_entregas,
+        dias_fixo, entregas_fixo, linhas, linhas_fixo
+    )
+    SELECT
+        r.nome,
+        date_trunc('week', r.data)::DATE,
+        COUNT(DISTINCT r.data),
+        COALESCE(SUM(r.entregas), 0),
+        COUNT(DISTINCT r.data) FILTER (WHERE r.tipo = 'Fixo'),
+        COALESCE(SUM(r.entregas) FILTER (WHERE r.tipo = 'Fixo'), 0),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE r.tipo = 'Fixo')
+    FROM resumo_diario r
+    GROUP BY 1, 2;
+END;
+$$ language 'plpgsql';
+
+-- Popular folha_semanal na primeira execução
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM folha_semanal) THEN
+        PERFORM reconstruir_folha_semanal();
+    END IF;
+END $$;
+
+-- Trigger para normalizar o nome e manter a tabela motoboys
+-- Um motoboy já cadastrado com outra grafia ("joao" para "João") é gravado
+-- com o nome cadastrado: registros, resumo e folha agrupam pela mesma pessoa
+CREATE OR REPLACE FUNCTION registrar_motoboy()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_chave TEXT;
+    v_nome VARCHAR;
+BEGIN
+    NEW.nome = regexp_replace(btrim(NEW.nome), '\s+', ' ', 'g');
+    v_chave = chave_nome(NEW.nome);
+
+    SELECT m.nome INTO v_nome
+    FROM motoboys m
+    WHERE m.chave = v_chave
+    ORDER BY m.id
+    LIMIT 1;
+    IF FOUND THEN
+        NEW.nome = v_nome;
+    END IF;
+
+    INSERT INTO motoboys (nome, chave, ultimo_registro)
+    VALUES (NEW.nome, v_chave, NEW.data)
+    ON CONFLICT (nome) DO UPDATE
+        SET ultimo_registro = GREATEST(motoboys.ultimo_registro, EXCLUDED.ultimo_registro);
+
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS registros_registrar_motoboy ON registros;
+CREATE TRIGGER registros_registrar_motoboy
+    BEFORE INSERT OR UPDATE OF nome, data ON registros
+    FOR EACH ROW
+    EXECUTE FUNCTION registrar_motoboy();
+
+-- Popular motoboys a partir dos registros existentes
+INSERT INTO motoboys (nome, chave, ultimo_registro)
+SELECT regexp_replace(btrim(nome), '\s+', ' ', 'g'), chave_nome(nome), MAX(data)
+FROM registros
+GROUP BY 1, 2
+ON CONFLICT (nome) DO NOTHING;
+
+-- Unifica motoboys duplicados (unificar_motoboys.py): registros e resumo das
+-- grafias de origem passam para o destino; resumo_diario também cobre os
+-- meses arquivados, que não têm mais registros no banco
+CREATE OR REPLACE FUNCTION mesclar_motoboys(p_origens TEXT[], p_destino TEXT)
+RETURNS BIGINT AS $$
+DECLARE
+    v_origens TEXT[] := array_remove(p_origens, p_destino);
+    v_total BIGINT;
+BEGIN
+    -- Sai da dimensão antes: registrar_motoboy não devolve a grafia antiga
+    DELETE FROM motoboys WHERE nome = ANY(v_origens);
+
+    UPDATE registros SET nome = p_destino WHERE nome = ANY(v_origens);
+    GET DIAGNOSTICS v_total = ROW_COUNT;
+
+    INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros)
+    SELECT data, p_destino, periodo, tipo, SUM(entregas), SUM(registros)
+    FROM resumo_diario
+    WHERE nome = ANY(v_origens)
+    GROUP BY data, periodo, tipo
+    ON CONFLICT (data, nome, periodo, tipo) DO UPDATE
+        SET entregas = resumo_diario.entregas + EXCLUDED.entregas,
+            registros = resumo_diario.registros + EXCLUDED.registros;
+    DELETE FROM resumo_diario WHERE nome = ANY(v_origens);
+
+    -- Grafias antigas (inclusive as já unificadas nas origens) passam a
+    -- apontar para o destino; o destino volta a ser um nome em uso
+    DELETE FROM motoboys_mesclados WHERE nome = p_destino;
+    UPDATE motoboys_mesclados SET destino = p_destino WHERE destino = ANY(v_origens);
+    INSERT INTO motoboys_mesclados (nome, destino)
+    SELECT unnest(v_origens), p_destino
+    ON CONFLICT (nome) DO UPDATE SET destino = EXCLUDED.destino;
+
+    RETURN v_total;
+END;
+$$ language 'plpgsql';
+
+-- Funções de agregação (executadas no servidor via supabase.rpc)
+-- Retornam uma linha por motoboy / uma linha de KPIs em vez dos registros brutos
+-- e leem de resumo_diario (não varrem registros)
+
+-- Consolidado por motoboy em um período (mesma base da query "total por motoboy")
+-- tipo: Fixo, Freelancer ou Misto; dias_fixo/entregas_fixo alimentam o cálculo
+-- do valor devido em folha.py (só registros Fixo geram diária e corridas)
+-- Soma os baldes de folha_semanal das semanas que tocam o período e subtrai
+-- os dias dessas semanas que ficam fora dele (no máximo 6 de cada ponta)
+DROP FUNCTION IF EXISTS relatorio_periodo(DATE, DATE);
+CREATE OR REPLACE FUNCTION relatorio_periodo(p_inicio DATE, p_fim DATE)
+RETURNS TABLE (
+    nome VARCHAR,
+    tipo VARCHAR,
+    dias_trabalhados BIGINT,
+    total_entregas BIGINT,
+    dias_fixo BIGINT,
+    entregas_fixo BIGINT
+) AS $$
+    WITH limites AS (
+        SELECT
+            date_trunc('week', p_inicio)::DATE AS primeira,
+            date_trunc('week', p_fim)::DATE + 6 AS ultima
+    ),
+    partes AS (
+        SELECT
+            f.nome,
+            f.dias_trabalhados::BIGINT AS dias,
+            f.total_entregas::BIGINT AS entregas,
+            f.dias_fixo::BIGINT AS dias_fixo,
+            f.entregas_fixo::BIGINT AS entregas_fixo,
+            f.linhas::BIGINT AS linhas,
+            f.linhas_fixo::BIGINT AS linhas_fixo
+        FROM folha_semanal f, limites l
+        WHERE f.semana_inicio BETWEEN l.primeira AND p_fim
+
+        UNION ALL
+
+        SELECT
+            r.nome,
+            -COUNT(DISTINCT r.data),
+            -COALESCE(SUM(r.entregas), 0)::BIGINT,
+            -COUNT(DISTINCT r.data) FILTER (WHERE r.tipo = 'Fixo'),
+            -COALESCE(SUM(r.entregas) FILTER (WHERE r.tipo = 'Fixo'), 0)::BIGINT,
+            -COUNT(*),
+            -COUNT(*) FILTER (WHERE r.tipo = 'Fixo')
+        FROM resumo_diario r, limites l
+        WHERE (r.data >= l.primeira AND r.data < p_inicio)
+           OR (r.data > p_fim AND r.data <= l.ultima)
+        GROUP BY r.nome
+    ),
+    totais AS (
+        SELECT
+            p.nome,
+            SUM(p.dias) AS dias,
+            SUM(p.entregas) AS entregas,
+            SUM(p.dias_fixo) AS dias_fixo,
+            SUM(p.entregas_fixo) AS entregas_fixo,
+            SUM(p.linhas) AS linhas,
+            SUM(p.linhas_fixo) AS linhas_fixo
+        FROM partes p
+        GROUP BY p.nome
+    )
+    SELECT
+        t.nome,
+        (CASE
+            WHEN t.linhas_fixo = t.linhas THEN 'Fixo'
+            WHEN t.linhas_fixo = 0 THEN 'Freelancer'
+            ELSE 'Misto'
+        END)::VARCHAR AS tipo,
+        t.dias::BIGINT AS dias_trabalhados,
+        t.entregas::BIGINT AS total_entregas,
+        t.dias_fixo::BIGINT AS dias_fixo,
+        t.entregas_fixo::BIGINT AS entregas_fixo
+    FROM totais t
+    WHERE t.linhas > 0 AND p_inicio <= p_fim
+    ORDER BY t.nome;
+$$ LANGUAGE sql STABLE;
+
+-- Totais do dia para os KPIs
+CREATE OR REPLACE FUNCTION kpis_dia(p_data DATE)
+RETURNS TABLE (
+    total_entregas BIGINT,
+    total_motoboys BIGINT
+) AS $$
+    SELECT
+        COALESCE(SUM(r.entregas), 0)::BIGINT AS total_entregas,
+        COUNT(DISTINCT chave_nome(r.nome)) AS total_motoboys
+    FROM resumo_diario r
+    WHERE r.data = p_data;
+$$ LANGUAGE sql STABLE;
+
+-- Séries de tendência reamostradas no servidor (dia/semana/mês/trimestre/ano)
+-- Uma linha por intervalo e grupo, em vez dos registros de cada turno:
+-- grupo = 'Total', o período (Manhã/Noite), o dia da semana (1=segunda ... 7=domingo)
+-- ou o motoboy (só os p_limite_grupos com mais entregas no intervalo)
+-- diarias = pares distintos (dia, motoboy), base do custo com diária
+DROP FUNCTION IF EXISTS serie_tendencia(DATE, DATE, TEXT, TEXT, INTEGER);
+CREATE OR REPLACE FUNCTION serie_tendencia(
+    p_inicio DATE,
+    p_fim DATE,
+    p_granularidade TEXT DEFAULT 'dia',
+    p_dimensao TEXT DEFAULT 'total',
+    p_limite_grupos INTEGER DEFAULT 5
+)
+RETURNS TABLE (
+    intervalo DATE,
+    grupo VARCHAR,
+    entregas BIGINT,
+    motoboys BIGINT,
+    diarias BIGINT,
+    turnos BIGINT
+) AS $$
+    WITH base AS (
+        SELECT
+            r.data,
+            r.nome,
+            r.entregas,
+            r.registros,
+            (CASE p_dimensao
+                WHEN 'periodo' THEN r.periodo
+                WHEN 'motoboy' THEN r.nome
+                WHEN 'dia_semana' THEN EXTRACT(ISODOW FROM r.data)::TEXT
+                ELSE 'Total'
+            END)::VARCHAR AS grupo
+        FROM resumo_diario r
+        WHERE r.data BETWEEN p_inicio AND p_fim
+    ),
+    principais AS (
+        SELECT b.grupo
+        FROM base b
+        GROUP BY b.grupo
+        ORDER BY SUM(b.entregas) DESC, b.grupo
+        LIMIT CASE WHEN p_dimensao = 'motoboy' THEN p_limite_grupos END
+    )
+    SELECT
+        date_trunc(
+            CASE p_granularidade
+                WHEN 'semana' THEN 'week'
+                WHEN 'mes' THEN 'month'
+                WHEN 'trimestre' THEN 'quarter'
+                WHEN 'ano' THEN 'year'
+                ELSE 'day'
+            END,
+            b.data
+        )::DATE AS intervalo,
+        b.grupo,
+        COALESCE(SUM(b.entregas), 0)::BIGINT AS entregas,
+        COUNT(DISTINCT b.nome) AS motoboys,
+        COUNT(DISTINCT (b.data, b.nome)) AS diarias,
+        COALESCE(SUM(b.registros), 0)::BIGINT AS turnos
+    FROM base b
+    JOIN principais p ON p.grupo = b.grupo
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$ LANGUAGE sql STABLE;
+
+-- Tempo real: publicar mudanças de registros no Supabase Realtime
+-- REPLICA IDENTITY FULL envia a linha anterior completa em UPDATE/DELETE
+-- (permite invalidar o dia antigo do registro nos outros terminais)
+-- Com registros particionada, as mudanças saem com o nome da tabela mãe
+-- (publish_via_partition_root), não de cada partição mensal
+ALTER TABLE registros REPLICA IDENTITY FULL;
+ALTER PUBLICATION supabase_realtime SET (publish_via_partition_root = true);
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_publication_tables
+        WHERE pubname = 'supabase_realtime' AND tablename = 'registros'
+    ) THEN
+        ALTER PUBLICATION supabase_realtime ADD TABLE registros;
+    END IF;
+END $$;
+
 -- Inserir configuração padrão (caso não exista)
 INSERT INTO configuracoes (valor_diaria, valor_corrida, ativa, created_at)
 SELECT 150.00, 5.00, TRUE, NOW()
@@ -57,17 +681,28 @@ WHERE NOT EXISTS (SELECT 1 FROM configuracoes WHERE ativa = TRUE);
 -- Comentários das tabelas
 COMMENT ON TABLE registros IS 'Registros diários de entregas dos motoboys';
 COMMENT ON TABLE configuracoes IS 'Configurações de valores (diária e corrida)';
+COMMENT ON TABLE resumo_diario IS 'Entregas somadas por dia, motoboy, período e tipo (mantida por trigger)';
+COMMENT ON TABLE folha_semanal IS 'Totais da folha por motoboy e semana (mantida por trigger a partir de resumo_diario)';
+COMMENT ON TABLE motoboys IS 'Motoboys distintos (nomes normalizados) para autocomplete';
 
 COMMENT ON COLUMN registros.nome IS 'Nome do motoboy';
 COMMENT ON COLUMN registros.data IS 'Data do registro';
 COMMENT ON COLUMN registros.periodo IS 'Período do dia (Manhã ou Noite)';
 COMMENT ON COLUMN registros.tipo IS 'Tipo de motoboy (Fixo ou Freelancer)';
 COMMENT ON COLUMN registros.entregas IS 'Número de entregas realizadas';
+COMMENT ON COLUMN registros.chave_idempotencia IS 'Identifica a linha de origem (importação) para evitar duplicidade';
+COMMENT ON FUNCTION arquivar_mes_registros(DATE, BIGINT) IS 'Remove um mês já arquivado em Parquet, preservando resumo_diario e folha_semanal';
 
 COMMENT ON COLUMN configuracoes.valor_diaria IS 'Valor da diária em reais';
 COMMENT ON COLUMN configuracoes.valor_corrida IS 'Valor por corrida em reais';
 COMMENT ON COLUMN configuracoes.ativa IS 'Indica se é a configuração ativa';
 
+COMMENT ON FUNCTION relatorio_periodo(DATE, DATE) IS 'Entregas e dias trabalhados por motoboy no período';
+COMMENT ON FUNCTION kpis_dia(DATE) IS 'Total de entregas e motoboys distintos do dia (por chave_nome)';
+COMMENT ON COLUMN motoboys.chave IS 'Nome sem acentos, em minúsculas e com espaços colapsados (identidade do motoboy)';
+COMMENT ON FUNCTION mesclar_motoboys(TEXT[], TEXT) IS 'Unifica grafias duplicadas de um motoboy em registros e resumo_diario';
+COMMENT ON FUNCTION serie_tendencia(DATE, DATE, TEXT, TEXT, INTEGER) IS 'Entregas, motoboys e diárias por intervalo e grupo (gráficos de tendência)';
+
 -- ================================================
 -- VERIFICAÇÃO DAS TABELAS CRIADAS
 -- ================================================
@@ -99,7 +734,7 @@ SELECT
     indexname,
     indexdef
 FROM pg_indexes
-WHERE tablename IN ('registros', 'configuracoes')
+WHERE tablename IN ('registros', 'configuracoes', 'motoboys', 'resumo_diario', 'folha_semanal')
 ORDER BY tablename, indexname;
 
 -- Verificar se há configuração ativa
@@ -125,6 +760,12 @@ WHERE data >= date_trunc('week', CURRENT_DATE)
 GROUP BY nome, tipo
 ORDER BY total_entregas DESC;
 
+-- Mesmo consolidado via função (usada pelo relatório semanal)
+SELECT * FROM relatorio_periodo(date_trunc('week', CURRENT_DATE)::date, CURRENT_DATE);
+
+-- KPIs de hoje
+SELECT * FROM kpis_dia(CURRENT_DATE);
+
 -- Ver histórico de configurações
 SELECT
     id,
@@ -138,8 +779,8 @@ ORDER BY created_at DESC;
 -- Backup dos registros (caso necessário)
 -- SELECT * FROM registros ORDER BY created_at;
 
--- Limpar registros antigos (CUIDADO!)
--- DELETE FROM registros WHERE data < '2025-01-01';
+-- Registros antigos: arquivar em Parquet em vez de apagar
+-- (python arquivamento.py --meses 12; resumo_diario e folha_semanal são mantidos)
 
 -- ================================================
 -- POLÍTICA DE RLS (Row Level Security)
@@ -0,0 +1,320 @@
+-- ================================================
+-- SCHEMA LOCAL (SQLite) - SISTEMA DE MOTOBOYS
+-- ================================================
+-- Mesmas tabelas de schema.sql, traduzidas para o
+-- motor embarcado usado por storage.SQLiteBackend.
+-- Executado automaticamente ao abrir o banco local.
+-- ================================================
+
+-- Tabela de Registros de Entregas
+CREATE TABLE IF NOT EXISTS registros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome VARCHAR(255) NOT NULL,
+    data DATE NOT NULL,
+    periodo VARCHAR(50) NOT NULL CHECK (periodo IN ('Manhã', 'Noite')),
+    tipo VARCHAR(50) NOT NULL CHECK (tipo IN ('Fixo', 'Freelancer')),
+    entregas INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    chave_idempotencia VARCHAR(64)
+);
+
+-- Chave de idempotência para importações e gravações em lote
+CREATE UNIQUE INDEX IF NOT EXISTS idx_registros_chave_idempotencia ON registros(chave_idempotencia);
+
+-- Índices para melhor performance
+CREATE INDEX IF NOT EXISTS idx_registros_data ON registros(data);
+CREATE INDEX IF NOT EXISTS idx_registros_data_id ON registros(data, id);
+CREATE INDEX IF NOT EXISTS idx_registros_nome ON registros(nome);
+CREATE INDEX IF NOT EXISTS idx_registros_tipo ON registros(tipo);
+CREATE INDEX IF NOT EXISTS idx_registros_created_at ON registros(created_at DESC);
+
+-- Tabela de Motoboys (dimensão mantida automaticamente pelos registros)
+CREATE TABLE IF NOT EXISTS motoboys (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome VARCHAR(255) NOT NULL UNIQUE,
+    chave VARCHAR(255),
+    ultimo_registro DATE,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Chave de identidade (nome sem acentos, minúsculas, espaços colapsados)
+-- chave_nome() é utils.normalizar_chave_nome, registrada por storage.SQLiteBackend
+CREATE INDEX IF NOT EXISTS idx_motoboys_chave ON motoboys(chave);
+
+-- Grafias unificadas por mesclar_motoboys (nome antigo -> nome atual)
+CREATE TABLE IF NOT EXISTS motoboys_mesclados (
+    nome VARCHAR(255) PRIMARY KEY,
+    destino VARCHAR(255) NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Resumo diário (mantido por trigger): entregas somadas por dia/motoboy/período/tipo
+CREATE TABLE IF NOT EXISTS resumo_diario (
+    data DATE NOT NULL,
+    nome VARCHAR(255) NOT NULL,
+    periodo VARCHAR(50) NOT NULL,
+    tipo VARCHAR(50) NOT NULL,
+    entregas INTEGER NOT NULL DEFAULT 0,
+    registros INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (data, nome, periodo, tipo)
+);
+
+CREATE INDEX IF NOT EXISTS idx_resumo_diario_nome ON resumo_diario(nome, data);
+
+-- Tabela de Configurações
+CREATE TABLE IF NOT EXISTS configuracoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    valor_diaria REAL NOT NULL DEFAULT 0.00,
+    valor_corrida REAL NOT NULL DEFAULT 0.00,
+    ativa BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Índice para buscar configuração ativa
+CREATE INDEX IF NOT EXISTS idx_configuracoes_ativa ON configuracoes(ativa, created_at DESC);
+
+-- Trigger para atualizar updated_at automaticamente
+CREATE TRIGGER IF NOT EXISTS update_registros_updated_at
+    AFTER UPDATE ON registros
+    FOR EACH ROW
+    WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE registros
+    SET updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+    WHERE id = NEW.id;
+END;
+
+-- Triggers para manter resumo_diario
+CREATE TRIGGER IF NOT EXISTS registros_resumo_diario_insert
+    AFTER INSERT ON registros
+    FOR EACH ROW
+BEGIN
+    INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros)
+    VALUES (NEW.data, NEW.nome, NEW.periodo, NEW.tipo, NEW.entregas, 1)
+    ON CONFLICT (data, nome, periodo, tipo) DO UPDATE
+        SET entregas = entregas + excluded.entregas,
+            registros = registros + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS registros_resumo_diario_update
+    AFTER UPDATE OF nome, data, periodo, tipo, entregas ON registros
+    FOR EACH ROW
+BEGIN
+    UPDATE resumo_diario
+    SET entregas = entregas - OLD.entregas,
+        registros = registros - 1
+    WHERE data = OLD.data AND nome = OLD.nome
+      AND periodo = OLD.periodo AND tipo = OLD.tipo;
+
+    DELETE FROM resumo_diario
+    WHERE data = OLD.data AND nome = OLD.nome
+      AND periodo = OLD.periodo AND tipo = OLD.tipo
+      AND registros <= 0;
+
+    INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros)
+    VALUES (NEW.data, NEW.nome, NEW.periodo, NEW.tipo, NEW.entregas, 1)
+    ON CONFLICT (data, nome, periodo, tipo) DO UPDATE
+        SET entregas = entregas + excluded.entregas,
+            registros = registros + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS registros_resumo_diario_delete
+    AFTER DELETE ON registros
+    FOR EACH ROW
+BEGIN
+    UPDATE resumo_diario
+    SET entregas = entregas - OLD.entregas,
+        registros = registros - 1
+    WHERE data = OLD.data AND nome = OLD.nome
+      AND periodo = OLD.periodo AND tipo = OLD.tipo;
+
+    DELETE FROM resumo_diario
+    WHERE data = OLD.data AND nome = OLD.nome
+      AND periodo = OLD.periodo AND tipo = OLD.tipo
+      AND registros <= 0;
+END;
+
+-- Popular resumo_diario na primeira execução
+INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros)
+SELECT data, nome, periodo, tipo, SUM(entregas), COUNT(*)
+FROM registros
+WHERE NOT EXISTS (SELECT 1 FROM resumo_diario)
+GROUP BY data, nome, periodo, tipo;
+
+-- Folha semanal (mantida por trigger a partir de resumo_diario): totais por
+-- motoboy e semana (segunda a domingo); cada escrita recalcula só os baldes
+-- (nome, semana) que tocou
+-- date(x, 'weekday 0', '-6 days') = segunda-feira da semana de x
+CREATE TABLE IF NOT EXISTS folha_semanal (
+    nome VARCHAR(255) NOT NULL,
+    semana_inicio DATE NOT NULL,
+    dias_trabalhados INTEGER NOT NULL DEFAULT 0,
+    total_entregas INTEGER NOT NULL DEFAULT 0,
+    dias_fixo INTEGER NOT NULL DEFAULT 0,
+    entregas_fixo INTEGER NOT NULL DEFAULT 0,
+    linhas INTEGER NOT NULL DEFAULT 0,
+    linhas_fixo INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (nome, semana_inicio)
+);
+
+CREATE INDEX IF NOT EXISTS idx_folha_semanal_semana ON folha_semanal(semana_inicio);
+
+CREATE TRIGGER IF NOT EXISTS resumo_diario_folha_semanal_insert
+AFTER INSERT ON resumo_diario
+FOR EACH ROW
+BEGIN
+    DELETE FROM folha_semanal
+    WHERE nome = NEW.nome AND semana_inicio = date(NEW.data, 'weekday 0', '-6 days');
+    INSERT INTO folha_semanal (
+        nome, semana_inicio, dias_trabalhados, total_entregas,
+        dias_fixo, entregas_fixo, linhas, linhas_fixo
+    )
+    SELECT
+        NEW.nome,
+        date(NEW.data, 'weekday 0', '-6 days'),
+        COUNT(DISTINCT data),
+        COALESCE(SUM(entregas), 0),
+        COUNT(DISTINCT CASE WHEN tipo = 'Fixo' THEN data END),
+        COALESCE(SUM(CASE WHEN tipo = 'Fixo' THEN entregas ELSE 0 END), 0),
+        COUNT(*),
+        SUM(CASE WHEN tipo = 'Fixo' THEN 1 ELSE 0 END)
+    FROM resumo_diario
+    WHERE nome = NEW.nome
+      AND data BETWEEN date(NEW.data, 'weekday 0', '-6 days') AND date(NEW.data, 'weekday 0')
+    HAVING COUNT(*) > 0;
+END;
+
+-- Recalcula o balde antigo e o novo (o mesmo, quando só as entregas mudam)
+CREATE TRIGGER IF NOT EXISTS resumo_diario_folha_semanal_update
+AFTER UPDATE ON resumo_diario
+FOR EACH ROW
+BEGIN
+    DELETE FROM folha_semanal
+    WHERE nome = OLD.nome AND semana_inicio = date(OLD.data, 'weekday 0', '-6 days');
+    INSERT INTO folha_semanal (
+        nome, semana_inicio, dias_trabalhados, total_entregas,
+        dias_fixo, entregas_fixo, linhas, linhas_fixo
+    )
+    SELECT
+        OLD.nome,
+        date(OLD.data, 'weekday 0', '-6 days'),
+        COUNT(DISTINCT data),
+        COALESCE(SUM(entregas), 0),
+        COUNT(DISTINCT CASE WHEN tipo = 'Fixo' THEN data END),
+        COALESCE(SUM(CASE WHEN tipo = 'Fixo' THEN entregas ELSE 0 END), 0),
+        COUNT(*),
+        SUM(CASE WHEN tipo = 'Fixo' THEN 1 ELSE 0 END)
+    FROM resumo_diario
+    WHERE nome = OLD.nome
+      AND data BETWEEN date(OLD.data, 'weekday 0', '-6 days') AND date(OLD.data, 'weekday 0')
+    HAVING COUNT(*) > 0;
+    DELETE FROM folha_semanal
+    WHERE nome = NEW.nome AND semana_inicio = date(NEW.data, 'weekday 0', '-6 days');
+    INSERT INTO folha_semanal (
+        nome, semana_inicio, dias_trabalhados, total_entregas,
+        dias_fixo, entregas_fixo, linhas, linhas_fixo
+    )
+    SELECT
+        NEW.nome,
+        date(NEW.data, 'weekday 0', '-6 days'),
+        COUNT(DISTINCT data),
+        COALESCE(SUM(entregas), 0),
+        COUNT(DISTINCT CASE WHEN tipo = 'Fixo' THEN data END),
+        COALESCE(SUM(CASE WHEN tipo = 'Fixo' THEN entregas ELSE 0 END), 0),
+        COUNT(*),
+        SUM(CASE WHEN tipo = 'Fixo' THEN 1 ELSE 0 END)
+    FROM resumo_diario
+    WHERE nome = NEW.nome
+      AND data BETWEEN date(NEW.data, 'weekday 0', '-6 days') AND date(NEW.data, 'weekday 0')
+    HAVING COUNT(*) > 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumo_diario_folha_semanal_delete
+AFTER DELETE ON resumo_diario
+FOR EACH ROW
+BEGIN
+    DELETE FROM folha_semanal
+    WHERE nome = OLD.nome AND semana_inicio = date(OLD.data, 'weekday 0', '-6 days');
+    INSERT INTO folha_semanal (
+        nome, semana_inicio, dias_trabalhados, total_entregas,
+        dias_fixo, entregas_fixo, linhas, linhas_fixo
+    )
+    SELECT
+        OLD.nome,
+        date(OLD.data, 'weekday 0', '-6 days'),
+        COUNT(DISTINCT data),
+        COALESCE(SUM(entregas), 0),
+        COUNT(DISTINCT CASE WHEN tipo = 'Fixo' THEN data END),
+        COALESCE(SUM(CASE WHEN tipo = 'Fixo' THEN entregas ELSE 0 END), 0),
+        COUNT(*),
+        SUM(CASE WHEN tipo = 'Fixo' THEN 1 ELSE 0 END)
+    FROM resumo_diario
+    WHERE nome = OLD.nome
+      AND data BETWEEN date(OLD.data, 'weekday 0', '-6 days') AND date(OLD.data, 'weekday 0')
+    HAVING COUNT(*) > 0;
+END;
+
+-- Popular folha_semanal na primeira execução
+INSERT INTO folha_semanal (
+    nome, semana_inicio, dias_trabalhados, total_entregas,
+    dias_fixo, entregas_fixo, linhas, linhas_fixo
+)
+SELECT
+    nome,
+    date(data, 'weekday 0', '-6 days'),
+    COUNT(DISTINCT data),
+    SUM(entregas),
+    COUNT(DISTINCT CASE WHEN tipo = 'Fixo' THEN data END),
+    SUM(CASE WHEN tipo = 'Fixo' THEN entregas ELSE 0 END),
+    COUNT(*),
+    SUM(CASE WHEN tipo = 'Fixo' THEN 1 ELSE 0 END)
+FROM resumo_diario
+WHERE NOT EXISTS (SELECT 1 FROM folha_semanal)
+GROUP BY nome, date(data, 'weekday 0', '-6 days');
+
+-- Triggers para manter a tabela motoboys
+-- (a normalização do nome é feita em database.py antes de gravar)
+CREATE TRIGGER IF NOT EXISTS registros_registrar_motoboy_insert
+    AFTER INSERT ON registros
+    FOR EACH ROW
+BEGIN
+    INSERT INTO motoboys (nome, ultimo_registro)
+    VALUES (NEW.nome, NEW.data)
+    ON CONFLICT (nome) DO UPDATE
+        SET ultimo_registro = MAX(COALESCE(ultimo_registro, excluded.ultimo_registro), excluded.ultimo_registro);
+END;
+
+CREATE TRIGGER IF NOT EXISTS registros_registrar_motoboy_update
+    AFTER UPDATE OF nome, data ON registros
+    FOR EACH ROW
+BEGIN
+    INSERT INTO motoboys (nome, ultimo_registro)
+    VALUES (NEW.nome, NEW.data)
+    ON CONFLICT (nome) DO UPDATE
+        SET ultimo_registro = MAX(COALESCE(ultimo_registro, excluded.ultimo_registro), excluded.ultimo_registro);
+END;
+
+-- Popular motoboys a partir dos registros existentes
+INSERT INTO motoboys (nome, ultimo_registro)
+SELECT nome, MAX(data)
+FROM registros
+WHERE true
+GROUP BY nome
+ON CONFLICT (nome) DO NOTHING;
+
+-- Chave de cada motoboy novo (os triggers acima só conhecem o nome)
+CREATE TRIGGER IF NOT EXISTS motoboys_chave_insert
+    AFTER INSERT ON motoboys
+    FOR EACH ROW
+    WHEN NEW.chave IS NULL
+BEGIN
+    UPDATE motoboys SET chave = chave_nome(NEW.nome) WHERE id = NEW.id;
+END;
+
+UPDATE motoboys SET chave = chave_nome(nome) WHERE chave IS NULL;
+
+-- Inserir configuração padrão (caso não exista)
+INSERT INTO configuracoes (valor_diaria, valor_corrida, ativa)
+SELECT 150.00, 5.00, TRUE
+WHERE NOT EXISTS (SELECT 1 FROM configuracoes WHERE ativa = TRUE);
@@ -0,0 +1,779 @@
+"""
+Backends de armazenamento do sistema de motoboys
+Supabase (produção) ou SQLite embarcado (local, testes e benchmarks)
+"""
+import sqlite3
+import threading
+from pathlib import Path
+
+import utils
+
+SCHEMA_LOCAL = Path(__file__).with_name("schema_local.sql")
+
+# Colunas adicionadas depois da criação inicial (migração de bancos locais antigos)
+COLUNAS_LOCAIS = {
+    "registros": {"chave_idempotencia": "VARCHAR(64)"},
+    "motoboys": {"chave": "VARCHAR(255)"},
+}
+
+
+# Início do intervalo de cada granularidade (equivalente a date_trunc; semana começa na segunda)
+INTERVALOS_SQLITE = {
+    "dia": "b.data",
+    "semana": "date(b.data, '-' || ((CAST(strftime('%w', b.data) AS INTEGER) + 6) % 7) || ' days')",
+    "mes": "strftime('%Y-%m-01', b.data)",
+    "trimestre": "printf('%s-%02d-01', strftime('%Y', b.data), (CAST(strftime('%m', b.data) AS INTEGER) - 1) / 3 * 3 + 1)",
+    "ano": "strftime('%Y-01-01', b.data)",
+}
+
+
+class StorageBackend:
+    """
+    Interface comum dos backends de armazenamento
+
+    Os métodos recebem e devolvem dicionários no mesmo formato das
+    linhas retornadas pelo Supabase (datas como string 'YYYY-MM-DD').
+    Erros são propagados como exceções para o chamador tratar.
+    """
+
+    nome = "base"
+
+    # ==================== REGISTROS ====================
+
+    def inserir_registro(self, dados):
+        raise NotImplementedError
+
+    def buscar_registro(self, registro_id):
+        raise NotImplementedError
+
+    def buscar_registros_dia(self, data):
+        raise NotImplementedError
+
+    def buscar_registros_periodo(self, data_inicio, data_fim):
+        raise NotImplementedError
+
+    def inserir_registros_lote(self, linhas):
+        """
+        Insere várias linhas em uma única ida ao banco, ignorando as que
+        já existem (mesma chave_idempotencia)
+
+        Returns:
+            Quantidade de linhas efetivamente inseridas
+        """
+        raise NotImplementedError
+
+    def buscar_pagina_registros(self, data_inicio, data_fim, apos=None, limite=1000):
+        """
+        Uma página de registros do período ordenada por (data, id)
+
+        Args:
+            apos: Tupla (data, id) do último registro da página anterior
+            limite: Tamanho da página
+        """
+        raise NotImplementedError
+
+    def atualizar_registro(self, registro_id, dados):
+        raise NotImplementedError
+
+    def excluir_registro(self, registro_id):
+        raise NotImplementedError
+
+    def buscar_nomes_motoboys(self):
+        """
+        Nomes da tabela motoboys (dimensão mantida por trigger), em ordem de
+        cadastro: com duas grafias da mesma chave, a mais antiga vem antes e
+        é a canônica, como no trigger registrar_motoboy
+        """
+        raise NotImplementedError
+
+    def mesclar_motoboys(self, origens, destino):
+        """
+        Unifica grafias de um mesmo motoboy: registros e resumo_diario das
+        origens passam para o destino, as origens saem de motoboys e ficam
+        em motoboys_mesclados apontando para o destino
+
+        Returns:
+            Quantidade de registros alterados
+        """
+        raise NotImplementedError
+
+    def buscar_nomes_mesclados(self):
+        """
+        Returns:
+            Dicionário {grafia antiga: nome atual} de motoboys_mesclados
+        """
+        raise NotImplementedError
+
+    # ==================== CONFIGURAÇÕES ====================
+
+    def buscar_configuracao_ativa(self):
+        raise NotImplementedError
+
+    def salvar_configuracao(self, dados):
+        raise NotImplementedError
+
+    # ==================== AGREGAÇÕES ====================
+
+    def relatorio_periodo(self, data_inicio, data_fim):
+        """
+        Uma linha por motoboy: nome, tipo, dias_trabalhados, total_entregas,
+        dias_fixo e entregas_fixo (mesmas colunas de folha.agregar_registros)
+        """
+        raise NotImplementedError
+
+    def kpis_dia(self, data):
+        """
+        Uma linha com total_entregas e total_motoboys do dia
+        (motoboys distintos pela chave do nome)
+        """
+        raise NotImplementedError
+
+    def serie_tendencia(self, data_inicio, data_fim, granularidade, dimensao, limite_grupos):
+        """
+        Série reamostrada de resumo_diario: uma linha por intervalo e grupo
+        com entregas, motoboys (distintos), diarias (pares dia/motoboy) e turnos
+
+        Args:
+            granularidade: dia, semana, mes, trimestre ou ano
+            dimensao: total, periodo, dia_semana (1=segunda ... 7=domingo) ou motoboy
+            limite_grupos: Máximo de motoboys (os com mais entregas) na dimensão motoboy
+        """
+        raise NotImplementedError
+
+    # ==================== ARQUIVAMENTO ====================
+
+    def garantir_particoes(self, meses_a_frente=3):
+        """
+        Cria as partições mensais do mês atual e dos próximos meses
+        (backends sem partições não fazem nada)
+        """
+
+    def arquivar_mes_registros(self, mes, esperado):
+        """
+        Remove os registros de um mês já gravados em Parquet, mantendo
+        resumo_diario e folha_semanal (KPIs, folha e tendências do mês)
+
+        Args:
+            mes: Primeiro dia do mês
+            esperado: Registros gravados no arquivo; se o mês tiver outra
+                quantidade no banco, nada é removido e a exceção é propagada
+
+        Returns:
+            Quantidade de registros removidos
+        """
+        raise NotImplementedError
+
+    # Arquivos Parquet dos meses arquivados (armazenamento durável do backend)
+
+    def enviar_arquivo(self, bucket, nome, conteudo):
+        """
+        Grava um arquivo no bucket; nunca sobrescreve um arquivo existente
+
+        Args:
+            bucket: Nome do bucket ([arquivamento] bucket)
+            nome: Nome do arquivo no bucket
+            conteudo: bytes
+        """
+        raise NotImplementedError
+
+    def baixar_arquivo(self, bucket, nome):
+        """
+        Returns:
+            bytes do arquivo
+        """
+        raise NotImplementedError
+
+    def listar_arquivos(self, bucket, prefixo=""):
+        """
+        Returns:
+            Lista com os nomes dos arquivos do bucket que começam com `prefixo`
+        """
+        raise NotImplementedError
+
+    def remover_arquivo(self, bucket, nome):
+        raise NotImplementedError
+
+
+class SupabaseBackend(StorageBackend):
+    """
+    Backend remoto via PostgREST (cliente supabase-py)
+    """
+
+    nome = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    def inserir_registro(self, dados):
+        response = self.client.table("registros").insert(dados).execute()
+        return response.data[0] if response.data else None
+
+    def inserir_registros_lote(self, linhas):
+        if not linhas:
+            return 0
+        response = self.client.table("registros")\
+            .upsert(linhas, on_conflict="chave_idempotencia,data", ignore_duplicates=True)\
+            .execute()
+
+        return len(response.data) if response.data else 0
+
+    def buscar_registro(self, registro_id):
+        response = self.client.table("registros")\
+            .select("*")\
+            .eq("id", registro_id)\
+            .limit(1)\
+            .execute()
+
+        return response.data[0] if response.data else None
+
+    def buscar_registros_dia(self, data):
+        response = self.client.table("registros")\
+            .select("*")\
+            .eq("data", str(data))\
+            .order("created_at", desc=True)\
+            .execute()
+
+        return response.data if response.data else []
+
+    def buscar_registros_periodo(self, data_inicio, data_fim):
+        response = self.client.table("registros")\
+            .select("*")\
+            .gte("data", str(data_inicio))\
+            .lte("data", str(data_fim))\
+            .order("data", desc=False)\
+            .execute()
+
+        return response.data if response.data else []
+
+    def buscar_pagina_registros(self, data_inicio, data_fim, apos=None, limite=1000):
+        consulta = self.client.table("registros")\
+            .select("*")\
+            .gte("data", str(data_inicio))\
+            .lte("data", str(data_fim))
+
+        if apos:
+            data_ultima, id_ultimo = apos
+            consulta = consulta.or_(
+                f"data.gt.{data_ultima},and(data.eq.{data_ultima},id.gt.{id_ultimo})"
+            )
+
+        response = consulta\
+            .order("data", desc=False)\
+            .order("id", desc=False)\
+            .limit(limite)\
+            .execute()
+
+        return response.data if response.data else []
+
+    def atualizar_registro(self, registro_id, dados):
+        response = self.client.table("registros")\
+            .update(dados)\
+            .eq("id", registro_id)\
+            .execute()
+
+        return response.data[0] if response.data else None
+
+    def excluir_registro(self, registro_id):
+        response = self.client.table("registros")\
+            .delete()\
+            .eq("id", registro_id)\
+            .execute()
+
+        return response.data[0] if response.data else None
+
+    def buscar_nomes_motoboys(self):
+        response = self.client.table("motoboys")\
+            .select("nome")\
+            .order("id")\
+            .execute()
+
+        if response.data:
+            return [r.get("nome") for r in response.data]
+        return []
+
+    def mesclar_motoboys(self, origens, destino):
+        response = self.client.rpc(
+            "mesclar_motoboys",
+            {"p_origens": list(origens), "p_destino": destino}
+        ).execute()
+
+        return response.data if response.data is not None else 0
+
+    def buscar_nomes_mesclados(self):
+        response = self.client.table("motoboys_mesclados")\
+            .select("nome, destino")\
+            .execute()
+
+        return {r["nome"]: r["destino"] for r in response.data or []}
+
+    def buscar_configuracao_ativa(self):
+        response = self.client.table("configuracoes")\
+            .select("*")\
+            .eq("ativa", True)\
+            .order("created_at", desc=True)\
+            .limit(1)\
+            .execute()
+
+        return response.data[0] if response.data else None
+
+    def salvar_configuracao(self, dados):
+        # Desativar todas as configurações anteriores
+        self.client.table("configuracoes")\
+            .update({"ativa": False})\
+            .eq("ativa", True)\
+            .execute()
+
+        # Inserir nova configuração ativa
+        response = self.client.table("configuracoes").insert(dados).execute()
+        return response.data[0] if response.data else None
+
+    def relatorio_periodo(self, data_inicio, data_fim):
+        response = self.client.rpc(
+            "relatorio_periodo",
+            {"p_inicio": str(data_inicio), "p_fim": str(data_fim)}
+        ).execute()
+
+        return response.data if response.data else []
+
+    def kpis_dia(self, data):
+        response = self.client.rpc("kpis_dia", {"p_data": str(data)}).execute()
+        return response.data[0] if response.data else None
+
+    def serie_tendencia(self, data_inicio, data_fim, granularidade, dimensao, limite_grupos):
+        response = self.client.rpc("serie_tendencia", {
+            "p_inicio": str(data_inicio),
+            "p_fim": str(data_fim),
+            "p_granularidade": granularidade,
+            "p_dimensao": dimensao,
+            "p_limite_grupos": limite_grupos,
+        }).execute()
+
+        return response.data if response.data else []
+
+    def garantir_particoes(self, meses_a_frente=3):
+        self.client.rpc("garantir_particoes_registros", {"p_meses_a_frente": meses_a_frente}).execute()
+
+    def arquivar_mes_registros(self, mes, esperado):
+        response = self.client.rpc(
+            "arquivar_mes_registros",
+            {"p_mes": str(mes), "p_esperado": esperado}
+        ).execute()
+
+        return response.data if response.data is not None else 0
+
+    # Supabase Storage: mesma conexão gerenciada (disjuntor e novas tentativas)
+
+    def _bucket(self, bucket, operacao, repetir=False):
+        return self.client.executar(
+            lambda cliente: operacao(cliente.storage.from_(bucket)),
+            repetir=repetir
+        )
+
+    def enviar_arquivo(self, bucket, nome, conteudo):
+        self._bucket(bucket, lambda arquivos: arquivos.upload(
+            nome, conteudo, {"content-type": "application/octet-stream", "upsert": "false"}
+        ))
+
+    def baixar_arquivo(self, bucket, nome):
+        return self._bucket(bucket, lambda arquivos: arquivos.download(nome), repetir=True)
+
+    def listar_arquivos(self, bucket, prefixo=""):
+        nomes = []
+        limite = 1000
+        while True:
+            inicio = len(nomes)
+            pagina = self._bucket(bucket, lambda arquivos: arquivos.list(
+                "", {"limit": limite, "offset": inicio, "search": prefixo}
+            ), repetir=True)
+            nomes.extend(item["name"] for item in pagina)
+            if len(pagina) < limite:
+                return [nome for nome in nomes if nome.startswith(prefixo)]
+
+    def remover_arquivo(self, bucket, nome):
+        self._bucket(bucket, lambda arquivos: arquivos.remove([nome]))
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Backend embarcado em SQLite com as mesmas tabelas de schema.sql
+
+    Usa uma única conexão protegida por lock, compartilhada entre as
+    sessões do Streamlit. Aceita ':memory:' para testes e benchmarks.
+    """
+
+    nome = "sqlite"
+
+    def __init__(self, caminho="motoboys.db"):
+        self.caminho = str(caminho)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.caminho, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # Usada pelos triggers e agregações de schema_local.sql
+        self.conn.create_function("chave_nome", 1, utils.normalizar_chave_nome, deterministic=True)
+        if self.caminho != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.criar_tabelas()
+
+    def criar_tabelas(self):
+        """
+        Aplica schema_local.sql (idempotente)
+        """
+        with self._lock:
+            for tabela, colunas in COLUNAS_LOCAIS.items():
+                existentes = {
+                    linha["name"]
+                    for linha in self.conn.execute(f"PRAGMA table_info({tabela})")
+                }
+                if not existentes:
+                    continue
+                for coluna, tipo in colunas.items():
+                    if coluna not in existentes:
+                        self.conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+            self.conn.executescript(SCHEMA_LOCAL.read_text(encoding="utf-8"))
+            self.conn.commit()
+
+    def _consultar(self, sql, parametros=()):
+        with self._lock:
+            cursor = self.conn.execute(sql, parametros)
+            return [dict(linha) for linha in cursor.fetchall()]
+
+    def _executar(self, sql, parametros=()):
+        with self._lock:
+            try:
+                cursor = self.conn.execute(sql, parametros)
+                linhas = [dict(linha) for linha in cursor.fetchall()]
+                self.conn.commit()
+                return linhas
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def _inserir(self, tabela, dados):
+        colunas = ", ".join(dados.keys())
+        marcadores = ", ".join("?" for _ in dados)
+        linhas = self._executar(
+            f"INSERT INTO {tabela} ({colunas}) VALUES ({marcadores}) RETURNING *",
+            tuple(dados.values())
+        )
+        return linhas[0] if linhas else None
+
+    def inserir_registro(self, dados):
+        return self._inserir("registros", dados)
+
+    def inserir_registros_lote(self, linhas):
+        if not linhas:
+            return 0
+        colunas = list(linhas[0].keys())
+        sql = (
+            f"INSERT INTO registros ({', '.join(colunas)}) "
+            f"VALUES ({', '.join('?' for _ in colunas)}) "
+            "ON CONFLICT (chave_idempotencia) DO NOTHING"
+        )
+        with self._lock:
+            try:
+                cursor = self.conn.executemany(sql, [tuple(linha[c] for c in colunas) for linha in linhas])
+                self.conn.commit()
+                return max(cursor.rowcount, 0)
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def buscar_registro(self, registro_id):
+        linhas = self._consultar("SELECT * FROM registros WHERE id = ?", (registro_id,))
+        return linhas[0] if linhas else None
+
+    def buscar_registros_dia(self, data):
+        return self._consultar(
+            "SELECT * FROM registros WHERE data = ? ORDER BY created_at DESC",
+            (str(data),)
+        )
+
+    def buscar_registros_periodo(self, data_inicio, data_fim):
+        return self._consultar(
+            "SELECT * FROM registros WHERE data >= ? AND data <= ? ORDER BY data",
+            (str(data_inicio), str(data_fim))
+        )
+
+    def buscar_pagina_registros(self, data_inicio, data_fim, apos=None, limite=1000):
+        if apos:
+            return self._consultar(
+                "SELECT * FROM registros WHERE data BETWEEN ? AND ? AND (data, id) > (?, ?) "
+                "ORDER BY data, id LIMIT ?",
+                (str(data_inicio), str(data_fim), str(apos[0]), apos[1], limite)
+            )
+        return self._consultar(
+            "SELECT * FROM registros WHERE data BETWEEN ? AND ? ORDER BY data, id LIMIT ?",
+            (str(data_inicio), str(data_fim), limite)
+        )
+
+    def atualizar_registro(self, registro_id, dados):
+        atribuicoes = ", ".join(f"{coluna} = ?" for coluna in dados)
+        linhas = self._executar(
+            f"UPDATE registros SET {atribuicoes} WHERE id = ? RETURNING *",
+            tuple(dados.values()) + (registro_id,)
+        )
+        return linhas[0] if linhas else None
+
+    def excluir_registro(self, registro_id):
+        linhas = self._executar(
+            "DELETE FROM registros WHERE id = ? RETURNING *",
+            (registro_id,)
+        )
+        return linhas[0] if linhas else None
+
+    def buscar_nomes_motoboys(self):
+        linhas = self._consultar("SELECT nome FROM motoboys ORDER BY id")
+        return [linha["nome"] for linha in linhas]
+
+    def mesclar_motoboys(self, origens, destino):
+        origens = [nome for nome in origens if nome != destino]
+        if not origens:
+            return 0
+        marcadores = ", ".join("?" for _ in origens)
+        with self._lock:
+            try:
+                self.conn.execute(f"DELETE FROM motoboys WHERE nome IN ({marcadores})", origens)
+                total = self.conn.execute(
+                    f"UPDATE registros SET nome = ? WHERE nome IN ({marcadores})",
+                    [destino, *origens]
+                ).rowcount
+                # Meses arquivados só existem em resumo_diario
+                self.conn.execute(
+                    f"""
+                    INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros)
+                    SELECT data, ?, periodo, tipo, SUM(entregas), SUM(registros)
+                    FROM resumo_diario
+                    WHERE nome IN ({marcadores})
+                    GROUP BY data, periodo, tipo
+                    ON CONFLICT (data, nome, periodo, tipo) DO UPDATE
+                        SET entregas = entregas + excluded.entregas,
+                            registros = registros + excluded.registros
+                    """,
+                    [destino, *origens]
+                )
+                self.conn.execute(f"DELETE FROM resumo_diario WHERE nome IN ({marcadores})", origens)
+                self.conn.execute("DELETE FROM motoboys_mesclados WHERE nome = ?", (destino,))
+                self.conn.execute(
+                    f"UPDATE motoboys_mesclados SET destino = ? WHERE destino IN ({marcadores})",
+                    [destino, *origens]
+                )
+                self.conn.executemany(
+                    "INSERT INTO motoboys_mesclados (nome, destino) VALUES (?, ?) "
+                    "ON CONFLICT (nome) DO UPDATE SET destino = excluded.destino",
+                    [(nome, destino) for nome in origens]
+                )
+                self.conn.commit()
+                return total
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def buscar_nomes_mesclados(self):
+        linhas = self._consultar("SELECT nome, destino FROM motoboys_mesclados")
+        return {linha["nome"]: linha["destino"] for linha in linhas}
+
+    def buscar_configuracao_ativa(self):
+        linhas = self._consultar(
+            "SELECT * FROM configuracoes WHERE ativa = TRUE "
+            "ORDER BY created_at DESC, id DESC LIMIT 1"
+        )
+        return linhas[0] if linhas else None
+
+    def salvar_configuracao(self, dados):
+        with self._lock:
+            try:
+                self.conn.execute("UPDATE configuracoes SET ativa = FALSE WHERE ativa = TRUE")
+                colunas = ", ".join(dados.keys())
+                marcadores = ", ".join("?" for _ in dados)
+                cursor = self.conn.execute(
+                    f"INSERT INTO configuracoes ({colunas}) VALUES ({marcadores}) RETURNING *",
+                    tuple(dados.values())
+                )
+                linha = cursor.fetchone()
+                self.conn.commit()
+                return dict(linha) if linha else None
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def relatorio_periodo(self, data_inicio, data_fim):
+        # Semanas inteiras de folha_semanal, menos os dias das semanas das
+        # pontas que ficam fora do período (mesma conta da função do Postgres)
+        if str(data_inicio) > str(data_fim):
+            return []
+        return self._consultar(
+            """
+            WITH limites AS (
+                SELECT
+                    date(:inicio, 'weekday 0', '-6 days') AS primeira,
+                    date(:fim, 'weekday 0') AS ultima
+            ),
+            partes AS (
+                SELECT
+                    f.nome,
+                    f.dias_trabalhados AS dias,
+                    f.total_entregas AS entregas,
+                    f.dias_fixo,
+                    f.entregas_fixo,
+                    f.linhas,
+                    f.linhas_fixo
+                FROM folha_semanal f, limites l
+                WHERE f.semana_inicio BETWEEN l.primeira AND :fim
+
+                UNION ALL
+
+                SELECT
+                    r.nome,
+                    -COUNT(DISTINCT r.data),
+                    -COALESCE(SUM(r.entregas), 0),
+                    -COUNT(DISTINCT CASE WHEN r.tipo = 'Fixo' THEN r.data END),
+                    -COALESCE(SUM(CASE WHEN r.tipo = 'Fixo' THEN r.entregas ELSE 0 END), 0),
+                    -COUNT(*),
+                    -SUM(r.tipo = 'Fixo')
+                FROM resumo_diario r, limites l
+                WHERE (r.data >= l.primeira AND r.data < :inicio)
+                   OR (r.data > :fim AND r.data <= l.ultima)
+                GROUP BY r.nome
+            ),
+            totais AS (
+                SELECT
+                    nome,
+                    SUM(dias) AS dias,
+                    SUM(entregas) AS entregas,
+                    SUM(dias_fixo) AS dias_fixo,
+                    SUM(entregas_fixo) AS entregas_fixo,
+                    SUM(linhas) AS linhas,
+                    SUM(linhas_fixo) AS linhas_fixo
+                FROM partes
+                GROUP BY nome
+            )
+            SELECT
+                nome,
+                CASE
+                    WHEN linhas_fixo = linhas THEN 'Fixo'
+                    WHEN linhas_fixo = 0 THEN 'Freelancer'
+                    ELSE 'Misto'
+                END AS tipo,
+                dias AS dias_trabalhados,
+                entregas AS total_entregas,
+                dias_fixo,
+                entregas_fixo
+            FROM totais
+            WHERE linhas > 0
+            ORDER BY nome
+            """,
+            {"inicio": str(data_inicio), "fim": str(data_fim)}
+        )
+
+    def kpis_dia(self, data):
+        linhas = self._consultar(
+            """
+            SELECT
+                COALESCE(SUM(entregas), 0) AS total_entregas,
+                COUNT(DISTINCT chave_nome(nome)) AS total_motoboys
+            FROM resumo_diario
+            WHERE data = ?
+            """,
+            (str(data),)
+        )
+        return linhas[0] if linhas else None
+
+    def serie_tendencia(self, data_inicio, data_fim, granularidade, dimensao, limite_grupos):
+        intervalo = INTERVALOS_SQLITE[granularidade]
+        return self._consultar(
+            f"""
+            WITH base AS (
+                SELECT *,
+                    CASE ?
+                        WHEN 'periodo' THEN periodo
+                        WHEN 'motoboy' THEN nome
+                        WHEN 'dia_semana' THEN CAST((CAST(strftime('%w', data) AS INTEGER) + 6) % 7 + 1 AS TEXT)
+                        ELSE 'Total'
+                    END AS grupo
+                FROM resumo_diario
+                WHERE data BETWEEN ? AND ?
+            ),
+            principais AS (
+                SELECT grupo FROM base
+                GROUP BY grupo
+                ORDER BY SUM(entregas) DESC, grupo
+                LIMIT ?
+            )
+            SELECT
+                {intervalo} AS intervalo,
+                b.grupo,
+                SUM(b.entregas) AS entregas,
+                COUNT(DISTINCT b.nome) AS motoboys,
+                COUNT(DISTINCT b.data || '|' || b.nome) AS diarias,
+                SUM(b.registros) AS turnos
+            FROM base b
+            JOIN principais p ON p.grupo = b.grupo
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            """,
+            (dimensao, str(data_inicio), str(data_fim), limite_grupos if dimensao == "motoboy" else -1)
+        )
+
+    def arquivar_mes_registros(self, mes, esperado):
+        # Sem partições: DELETE do mês, com o resumo guardado antes e restaurado
+        # depois (os triggers de resumo_diario recalculam folha_semanal)
+        inicio = str(mes)[:8] + "01"
+        with self._lock:
+            try:
+                limites = (inicio, inicio)
+                total = self.conn.execute(
+                    "SELECT COUNT(*) FROM registros WHERE data >= ? AND data < date(?, '+1 month')",
+                    limites
+                ).fetchone()[0]
+                if total != esperado:
+                    raise ValueError(
+                        f"Registros de {inicio[:7]} mudaram durante o arquivamento "
+                        f"({total} no banco, {esperado} no arquivo)"
+                    )
+                resumo = self.conn.execute(
+                    "SELECT * FROM resumo_diario WHERE data >= ? AND data < date(?, '+1 month')",
+                    limites
+                ).fetchall()
+                self.conn.execute(
+                    "DELETE FROM registros WHERE data >= ? AND data < date(?, '+1 month')",
+                    limites
+                )
+                self.conn.execute(
+                    "DELETE FROM resumo_diario WHERE data >= ? AND data < date(?, '+1 month')",
+                    limites
+                )
+                self.conn.executemany(
+                    "INSERT INTO resumo_diario (data, nome, periodo, tipo, entregas, registros) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(r["data"], r["nome"], r["periodo"], r["tipo"], r["entregas"], r["registros"]) for r in resumo]
+                )
+                self.conn.commit()
+                return total
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    # Bucket local: pasta com o nome do bucket ao lado do arquivo do banco
+    # (mesmo disco e mesmo backup dos registros que saíram do banco)
+
+    def _pasta_bucket(self, bucket):
+        if self.caminho == ":memory:":
+            raise ValueError("Banco em memória não tem onde guardar arquivos")
+        return Path(self.caminho).resolve().parent / bucket
+
+    def enviar_arquivo(self, bucket, nome, conteudo):
+        pasta = self._pasta_bucket(bucket)
+        pasta.mkdir(parents=True, exist_ok=True)
+        with open(pasta / nome, "xb") as arquivo:
+            arquivo.write(conteudo)
+
+    def baixar_arquivo(self, bucket, nome):
+        return (self._pasta_bucket(bucket) / nome).read_bytes()
+
+    def listar_arquivos(self, bucket, prefixo=""):
+        pasta = self._pasta_bucket(bucket)
+        return sorted(arquivo.name for arquivo in pasta.glob(f"{prefixo}*")) if pasta.is_dir() else []
+
+    def remover_arquivo(self, bucket, nome):
+        (self._pasta_bucket(bucket) / nome).unlink(missing_ok=True)
@@ -0,0 +1,271 @@
+"""
+Atualização em tempo real da lista "Registros de Hoje"
+Eventos de inserção/alteração/exclusão em registros são publicados em um
+barramento e aplicados como deltas a uma cópia da lista do dia em memória,
+sem baixar a lista inteira a cada mudança
+
+Origem dos eventos:
+    - Escritas feitas por este processo (database.py publica após gravar)
+    - Supabase Realtime (postgres_changes), para escritas de outros processos
+"""
+import asyncio
+import threading
+
+INSERT = "INSERT"
+UPDATE = "UPDATE"
+DELETE = "DELETE"
+RESSINCRONIZAR = "RESSINCRONIZAR"
+
+
+def evento(tipo, registro=None, anterior=None, origem="local"):
+    """
+    Monta um evento de mudança em registros
+
+    Args:
+        tipo: INSERT, UPDATE, DELETE ou RESSINCRONIZAR
+        registro: Linha após a mudança (INSERT/UPDATE)
+        anterior: Linha antes da mudança (UPDATE/DELETE), se conhecida
+        origem: "local" (escrita deste processo) ou "remoto" (Realtime)
+    """
+    return {"tipo": tipo, "registro": registro or None, "anterior": anterior or None, "origem": origem}
+
+
+def evento_de_payload(payload):
+    """
+    Converte o payload de postgres_changes do Supabase Realtime em evento
+
+    Com REPLICA IDENTITY FULL, old_record traz a linha completa em UPDATE/DELETE;
+    sem isso, só a chave primária (suficiente para remover pelo id).
+    """
+    dados = payload.get("data", payload)
+    return evento(dados.get("type"), dados.get("record"), dados.get("old_record"), origem="remoto")
+
+
+class Barramento:
+    """
+    Pub/sub em processo: cada evento publicado é entregue a todos os assinantes
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assinantes = []
+        self.publicados = 0
+
+    def assinar(self, callback):
+        """
+        Registra `callback(evento)`
+
+        Returns:
+            Função que cancela a assinatura
+        """
+        with self._lock:
+            self._assinantes.append(callback)
+
+        def cancelar():
+            with self._lock:
+                if callback in self._assinantes:
+                    self._assinantes.remove(callback)
+        return cancelar
+
+    def publicar(self, evento):
+        """
+        Entrega o evento aos assinantes (falha de um não impede os demais)
+        """
+        with self._lock:
+            assinantes = list(self._assinantes)
+            self.publicados += 1
+        for callback in assinantes:
+            try:
+                callback(evento)
+            except Exception:
+                pass
+
+
+class EspelhoDia:
+    """
+    Lista de registros de um dia mantida em memória a partir de deltas
+
+    Carregada uma vez do banco (carregar) e depois atualizada por aplicar().
+    Eventos que chegam durante a carga ficam pendentes e são reaplicados
+    sobre o resultado, para não perder mudanças concorrentes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carga = threading.Lock()
+        self._data = None
+        self._registros = {}
+        self._pendentes = None
+        self.versao = 0
+        self.deltas = 0
+
+    def carregado_para(self, data):
+        with self._lock:
+            return self._data == str(data) and self._pendentes is None
+
+    def carregar(self, data, buscar):
+        """
+        Substitui o conteúdo pela lista do dia retornada por `buscar()`
+
+        Args:
+            data: Dia espelhado
+            buscar: Função sem argumentos que consulta o banco
+        """
+        with self._carga:
+            if self.carregado_para(data):
+                return
+            with self._lock:
+                self._data = str(data)
+                self._pendentes = []
+            try:
+                registros = buscar()
+            except Exception:
+                with self._lock:
+                    self._data = None
+                    self._pendentes = None
+                raise
+
+            with self._lock:
+                self._registros = {r["id"]: dict(r) for r in registros if r.get("id") is not None}
+                pendentes, self._pendentes = self._pendentes, None
+                for pendente in pendentes:
+                    self._aplicar(pendente)
+                self.versao += 1
+
+    def descartar(self):
+        """
+        Força nova carga na próxima leitura (ex.: após reconexão)
+        """
+        with self._lock:
+            if self._pendentes is None:
+                self._data = None
+                self._registros = {}
+            self.versao += 1
+
+    def aplicar(self, evento):
+        """
+        Aplica um evento de mudança à lista (idempotente por id)
+
+        Returns:
+            True se a lista mudou
+        """
+        if evento.get("tipo") == RESSINCRONIZAR:
+            self.descartar()
+            return True
+
+        with self._lock:
+            if self._data is None:
+                return False
+            if self._pendentes is not None:
+                self._pendentes.append(evento)
+                return False
+            mudou = self._aplicar(evento)
+            if mudou:
+                self.versao += 1
+                self.deltas += 1
+            return mudou
+
+    def _aplicar(self, evento):
+        registro = evento.get("registro") or {}
+        anterior = evento.get("anterior") or {}
+        registro_id = registro.get("id", anterior.get("id"))
+        if registro_id is None:
+            return False
+
+        mudou = False
+        # Exclusão ou registro que saiu do dia espelhado
+        if registro_id in self._registros and (
+            evento.get("tipo") == DELETE or str(registro.get("data")) != self._data
+        ):
+            del self._registros[registro_id]
+            mudou = True
+
+        if evento.get("tipo") in (INSERT, UPDATE) and str(registro.get("data")) == self._data:
+            self._registros[registro_id] = dict(registro)
+            mudou = True
+        return mudou
+
+    def registros(self):
+        """
+        Registros do dia, mais recentes primeiro (mesma ordem do banco)
+        """
+        with self._lock:
+            return sorted(
+                self._registros.values(),
+                key=lambda r: str(r.get("created_at") or ""),
+                reverse=True
+            )
+
+
+class AssinanteSupabase:
+    """
+    Assina postgres_changes da tabela registros no Supabase Realtime
+
+    Roda em uma thread própria com seu próprio event loop (o cliente
+    realtime é assíncrono) e publica cada mudança no barramento. O cliente
+    reconecta sozinho; a cada nova inscrição publica RESSINCRONIZAR, pois
+    eventos podem ter sido perdidos enquanto a conexão estava fora.
+
+    Requer a tabela na publicação supabase_realtime (ver schema.sql).
+    """
+
+    def __init__(self, url, key, barramento, tabela="registros"):
+        self.url = url
+        self.key = key
+        self.barramento = barramento
+        self.tabela = tabela
+        self.inscrito = False
+        self.ultimo_erro = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=lambda: asyncio.run(self._escutar()),
+                name=f"tempo-real-{self.tabela}",
+                daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def _ao_mudar(self, payload):
+        self.barramento.publicar(evento_de_payload(payload))
+
+    def _ao_inscrever(self, estado, erro=None):
+        estado = getattr(estado, "value", estado)
+        if estado == "SUBSCRIBED":
+            self.inscrito = True
+            self.barramento.publicar(evento(RESSINCRONIZAR, origem="remoto"))
+        else:
+            self.inscrito = False
+            if erro:
+                self.ultimo_erro = str(erro)
+
+    async def _escutar(self):
+        from supabase import acreate_client
+
+        espera = 1
+        while not self._parar.is_set():
+            try:
+                cliente = await acreate_client(self.url, self.key)
+                canal = cliente.channel(f"{self.tabela}-mudancas")
+                canal.on_postgres_changes(
+                    "*", schema="public", table=self.tabela, callback=self._ao_mudar
+                )
+                await canal.subscribe(self._ao_inscrever)
+                espera = 1
+                while not self._parar.is_set():
+                    await asyncio.sleep(1)
+                await cliente.remove_all_channels()
+            except Exception as e:
+                self.inscrito = False
+                self.ultimo_erro = str(e)
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, 60)
+
+    def estado(self):
+        return {"inscrito": self.inscrito, "ultimo_erro": self.ultimo_erro}
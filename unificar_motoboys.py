@@ -0,0 +1,88 @@
+"""
+Unificação de motoboys cadastrados com grafias diferentes
+Nomes com a mesma chave ("João", "joao ") são unificados na grafia mais
+completa (indice_nomes.escolher_nome); nomes só parecidos ("Joao" e
+"João Silva") são listados e unificados um par de cada vez, pois podem ser
+pessoas diferentes.
+
+Uso (linha de comando):
+    python unificar_motoboys.py                           # só lista
+    python unificar_motoboys.py --aplicar                 # unifica os de mesma chave
+    python unificar_motoboys.py --unificar "Joao" "João Silva"
+    python unificar_motoboys.py --sqlite motoboys.db --aplicar
+"""
+import argparse
+
+import indice_nomes
+
+
+def planejar(nomes, minimo=indice_nomes.SEMELHANCA_MINIMA):
+    """
+    Returns:
+        Tupla (unificacoes, semelhantes): unificacoes é uma lista de
+        (origens, destino) para os grupos de mesma chave; semelhantes, os
+        pares parecidos de indice_nomes.agrupar_duplicados
+    """
+    grupos = indice_nomes.agrupar_duplicados(nomes, minimo)
+    unificacoes = []
+    for grupo in grupos["iguais"]:
+        destino = indice_nomes.escolher_nome(grupo)
+        unificacoes.append(([nome for nome in grupo if nome != destino], destino))
+    return unificacoes, grupos["semelhantes"]
+
+
+def unificar_iguais(backend, minimo=indice_nomes.SEMELHANCA_MINIMA):
+    """
+    Unifica todos os grupos de mesma chave
+
+    Returns:
+        Lista de (origens, destino, registros alterados)
+    """
+    unificacoes, _ = planejar(backend.buscar_nomes_motoboys(), minimo)
+    return [
+        (origens, destino, backend.mesclar_motoboys(origens, destino))
+        for origens, destino in unificacoes
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Unifica motoboys cadastrados com grafias diferentes")
+    parser.add_argument("--aplicar", action="store_true", help="Unificar os nomes de mesma chave")
+    parser.add_argument("--unificar", nargs=2, metavar=("ORIGEM", "DESTINO"), help="Unificar um par específico")
+    parser.add_argument("--minimo", type=float, default=indice_nomes.SEMELHANCA_MINIMA,
+                        help="Semelhança mínima dos pares listados (0 a 1)")
+    parser.add_argument("--sqlite", help="Usar um banco SQLite local em vez do backend configurado")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        import storage
+        backend = storage.SQLiteBackend(args.sqlite)
+    else:
+        import database as db
+        backend = db.get_backend()
+        if not backend:
+            print("❌ Backend de armazenamento indisponível (verifique os secrets)")
+            return 1
+
+    if args.unificar:
+        origem, destino = args.unificar
+        total = backend.mesclar_motoboys([origem], destino)
+        print(f"✅ {origem} -> {destino}: {total} registros")
+        return 0
+
+    unificacoes, semelhantes = planejar(backend.buscar_nomes_motoboys(), args.minimo)
+    for origens, destino in unificacoes:
+        if args.aplicar:
+            total = backend.mesclar_motoboys(origens, destino)
+            print(f"✅ {', '.join(origens)} -> {destino}: {total} registros")
+        else:
+            print(f"= {', '.join(origens)} -> {destino}")
+    for nome_a, nome_b, valor in semelhantes:
+        print(f"~ {nome_a} / {nome_b} ({valor:.0%})")
+    if unificacoes and not args.aplicar:
+        print("Use --aplicar para unificar os nomes de mesma chave")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
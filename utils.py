@@ -3,6 +3,8 @@ Utilitários para formatação de moeda e cálculos
 """
 from datetime import datetime, timedelta
 import locale
+import unicodedata
+import folha
 
 # Configurar locale para formato brasileiro
 try:
@@ -130,16 +132,121 @@ def calcular_media_entregas_moto(total_entregas, qtd_motoboys):
         return 0.0
 
 
-def get_inicio_semana():
+def get_inicio_semana(data=None):
     """
     Retorna a data de início da semana (segunda-feira)
 
+    Args:
+        data: Data de referência (padrão: hoje)
+
+    Returns:
+        Data da segunda-feira da semana
+    """
+    referencia = para_data(data) if data is not None else datetime.now().date()
+    return referencia - timedelta(days=referencia.weekday())
+
+
+def get_limites_mes(ano, mes):
+    """
+    Retorna o primeiro e o último dia de um mês
+
+    Args:
+        ano: Ano
+        mes: Mês (1 a 12)
+
+    Returns:
+        Tupla (data_inicio, data_fim)
+    """
+    inicio = datetime(ano, mes, 1).date()
+    proximo = datetime(ano + (mes == 12), mes % 12 + 1, 1).date()
+    return inicio, proximo - timedelta(days=1)
+
+
+def get_inicio_trimestre(data=None):
+    """
+    Retorna o primeiro dia do trimestre
+
+    Args:
+        data: Data de referência (padrão: hoje)
+
+    Returns:
+        Data do início do trimestre
+    """
+    referencia = para_data(data) if data is not None else datetime.now().date()
+    return referencia.replace(month=(referencia.month - 1) // 3 * 3 + 1, day=1)
+
+
+PERIODOS_PREDEFINIDOS = ["Semana atual", "Mês atual", "Trimestre atual", "Últimos 30 dias", "Personalizado"]
+
+
+def get_periodo_predefinido(nome):
+    """
+    Converte um período predefinido em intervalo de datas (até hoje)
+
+    Args:
+        nome: Um dos PERIODOS_PREDEFINIDOS (exceto "Personalizado")
+
+    Returns:
+        Tupla (data_inicio, data_fim)
+    """
+    hoje = get_data_hoje()
+    if nome == "Semana atual":
+        return get_inicio_semana(hoje), hoje
+    if nome == "Mês atual":
+        return hoje.replace(day=1), hoje
+    if nome == "Trimestre atual":
+        return get_inicio_trimestre(hoje), hoje
+    if nome == "Últimos 30 dias":
+        return hoje - timedelta(days=29), hoje
+    raise ValueError(f"Período desconhecido: {nome}")
+
+
+# Granularidades das séries de tendência (reamostragem feita no servidor)
+GRANULARIDADES = ["dia", "semana", "mes", "trimestre", "ano"]
+
+DIAS_SEMANA = {"1": "Seg", "2": "Ter", "3": "Qua", "4": "Qui", "5": "Sex", "6": "Sáb", "7": "Dom"}
+
+
+def contar_intervalos(data_inicio, data_fim, granularidade):
+    """
+    Quantidade de pontos de uma série entre duas datas
+
+    Args:
+        data_inicio: Data de início
+        data_fim: Data de fim
+        granularidade: Uma das GRANULARIDADES
+
     Returns:
-        Data da segunda-feira da semana atual
+        Número de dias, semanas, meses, trimestres ou anos cobertos
+    """
+    inicio, fim = para_data(data_inicio), para_data(data_fim)
+    if granularidade == "dia":
+        return (fim - inicio).days + 1
+    if granularidade == "semana":
+        return (get_inicio_semana(fim) - get_inicio_semana(inicio)).days // 7 + 1
+    meses = (fim.year - inicio.year) * 12 + fim.month - inicio.month
+    if granularidade == "mes":
+        return meses + 1
+    if granularidade == "trimestre":
+        return (fim.year - inicio.year) * 4 + (fim.month - 1) // 3 - (inicio.month - 1) // 3 + 1
+    return fim.year - inicio.year + 1
+
+
+def para_data(valor):
     """
-    hoje = datetime.now()
-    inicio_semana = hoje - timedelta(days=hoje.weekday())
-    return inicio_semana.date()
+    Converte string 'YYYY-MM-DD' (formato do banco) ou datetime para date
+
+    Args:
+        valor: date, datetime ou string ISO
+
+    Returns:
+        Objeto date
+    """
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, str):
+        return datetime.strptime(valor[:10], '%Y-%m-%d').date()
+    return valor
 
 
 def get_data_hoje():
@@ -152,6 +259,36 @@ def get_data_hoje():
     return datetime.now().date()
 
 
+def normalizar_nome(nome):
+    """
+    Normaliza nome de motoboy: remove espaços nas pontas e colapsa espaços internos
+
+    Args:
+        nome: Nome digitado
+
+    Returns:
+        Nome normalizado (string vazia se None)
+    """
+    if nome is None:
+        return ""
+    return " ".join(str(nome).split())
+
+
+def normalizar_chave_nome(nome):
+    """
+    Chave de identidade do motoboy: sem acentos, sem diferenciar maiúsculas
+    e com espaços colapsados ("João  Silva" e "joao silva" são a mesma pessoa)
+
+    Args:
+        nome: Nome digitado
+
+    Returns:
+        Chave normalizada (string vazia se None)
+    """
+    texto = unicodedata.normalize("NFKD", normalizar_nome(nome))
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+
+
 def formatar_data_br(data):
     """
     Formata data no padrão brasileiro DD/MM/YYYY
@@ -173,7 +310,8 @@ def formatar_data_br(data):
 def calcular_valor_devido_motoboy(registros, valor_diaria, valor_corrida):
     """
     Calcula o valor devido para um motoboy específico
-    Regra: Fixo recebe diária + corridas; Freelancer já foi pago
+    Regra (folha.py): cada dia Fixo paga diária e cada entrega Fixo paga corrida;
+    registros Freelancer já foram pagos
 
     Args:
         registros: Lista de registros do motoboy
@@ -184,27 +322,10 @@ def calcular_valor_devido_motoboy(registros, valor_diaria, valor_corrida):
         Valor total devido
     """
     try:
-        valor_total = 0.0
-        dias_trabalhados = set()
-        total_entregas = 0
-
-        for registro in registros:
-            tipo = registro.get('tipo', 'Fixo')
-
-            if tipo == 'Fixo':
-                # Contar dias únicos para diária
-                data = registro.get('data')
-                if data:
-                    dias_trabalhados.add(data)
-
-                # Somar entregas para corridas
-                entregas = registro.get('entregas', 0)
-                total_entregas += entregas
-
-        # Calcular valor devido apenas para fixos
-        if len(registros) > 0 and registros[0].get('tipo') == 'Fixo':
-            valor_total = (len(dias_trabalhados) * valor_diaria) + (total_entregas * valor_corrida)
+        if not registros:
+            return 0.0
 
-        return valor_total
+        valores = folha.calcular_folha(registros, valor_diaria, valor_corrida)
+        return float(valores["valor_devido"].sum())
     except:
         return 0.0
@@ -36,3 +36,10 @@ SELECT
     rowsecurity
 FROM pg_tables
 WHERE tablename IN ('registros', 'configuracoes');
+
+-- Ver funções de agregação
+SELECT
+    routine_name,
+    data_type
+FROM information_schema.routines
+WHERE routine_name IN ('relatorio_periodo', 'kpis_dia');